@@ -1,4 +1,6 @@
 import os
+import re
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,19 +16,122 @@ class Config:
     if not DATABASE_URL:
         raise ValueError("❌ DATABASE_URL not found in environment variables")
     
+    # Database pool
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", "300"))  # seconds
+    DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))  # seconds
+    DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))  # seconds
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # 0 behind pgbouncer
+    DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "v-telegram-bot")
+    
+    # Query profiling
+    SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "0.2"))  # seconds
+    SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0"))  # fraction of slow queries to EXPLAIN
+    SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "10"))
+    UPDATE_QUERY_WARN = int(os.getenv("UPDATE_QUERY_WARN", "15"))  # queries per update before logging a warning
+    
+    # Update delivery: polling | webhook
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")  # e.g. http://127.0.0.1:8081/bot for a local Bot API
+    
+    # Webhook
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL, e.g. https://bot.example.com
+    WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # shared by all instances; 1-256 of A-Z a-z 0-9 _ -
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("❌ WEBHOOK_URL is required when BOT_MODE=webhook")
+    # بدون secret هر کسی به WEBHOOK_PATH دسترسی داشته باشد می‌تواند آپدیت جعلی (مثلا از طرف ادمین) بفرستد
+    if BOT_MODE == "webhook" and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", WEBHOOK_SECRET or ""):
+        raise ValueError("❌ WEBHOOK_SECRET (1-256 chars of A-Z, a-z, 0-9, _ and -) is required when BOT_MODE=webhook")
+    
+    # Prometheus metrics (separate port, also served in polling mode); unauthenticated, so off
+    # by default and bound to localhost unless METRICS_LISTEN says otherwise
+    METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # e.g. 9091; 0 disables
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+    METRICS_QUEUE_DEPTH_TTL = float(os.getenv("METRICS_QUEUE_DEPTH_TTL", "15"))  # seconds between COUNT(*) queries
+    
+    # Update processing
+    MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+    ADMIN_UPDATE_SLOTS = int(os.getenv("ADMIN_UPDATE_SLOTS", "8"))
+    
+    # Multi-worker mode: ingress writes updates to the update_queue table, every instance consumes it
+    UPDATE_QUEUE_ENABLED = os.getenv("UPDATE_QUEUE_ENABLED", "false").lower() in ("1", "true", "yes")
+    INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+    UPDATE_QUEUE_BATCH_SIZE = int(os.getenv("UPDATE_QUEUE_BATCH_SIZE", "32"))  # in-flight updates per worker
+    UPDATE_QUEUE_POLL_INTERVAL = float(os.getenv("UPDATE_QUEUE_POLL_INTERVAL", "1"))  # seconds, NOTIFY wakes earlier
+    UPDATE_QUEUE_LEASE = float(os.getenv("UPDATE_QUEUE_LEASE", "120"))  # seconds before a claimed update is retried
+    UPDATE_QUEUE_MAX_ATTEMPTS = int(os.getenv("UPDATE_QUEUE_MAX_ATTEMPTS", "5"))
+    UPDATE_QUEUE_RETENTION = float(os.getenv("UPDATE_QUEUE_RETENTION", "86400"))  # seconds processed ids are kept for dedup
+    LEADER_CHECK_INTERVAL = float(os.getenv("LEADER_CHECK_INTERVAL", "5"))  # seconds
+    
     # Admin
     ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x]
+    ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "300"))  # seconds
+    PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "60"))  # seconds
+    PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    ADMIN_NOTIFY_CONCURRENCY = int(os.getenv("ADMIN_NOTIFY_CONCURRENCY", "10"))
+    ADMIN_NOTIFY_TIMEOUT = float(os.getenv("ADMIN_NOTIFY_TIMEOUT", "10"))  # seconds per admin
+    
+    # User profile write-behind
+    USER_WRITE_BATCH_SIZE = int(os.getenv("USER_WRITE_BATCH_SIZE", "500"))
+    USER_WRITE_FLUSH_INTERVAL = float(os.getenv("USER_WRITE_FLUSH_INTERVAL", "5"))  # seconds
+    USER_FINGERPRINT_CACHE_SIZE = int(os.getenv("USER_FINGERPRINT_CACHE_SIZE", "100000"))
+    
+    # Wallet
+    WALLET_HISTORY_SIZE = int(os.getenv("WALLET_HISTORY_SIZE", "10"))
+    WALLET_SNAPSHOT_INTERVAL = float(os.getenv("WALLET_SNAPSHOT_INTERVAL", "3600"))  # seconds
+    WALLET_MAX_TOPUP = int(os.getenv("WALLET_MAX_TOPUP", "50000000"))  # toman per top-up
     
     # Payment
     CARD_NUMBER = os.getenv("CARD_NUMBER", "6037-9972-1234-5678")
     
-    # Plans
+    # Plans (seed for the plans table on first run; edited from the admin panel afterwards)
     PLANS = {
         "1month": {"name": "یک ماهه", "price": 29000, "duration": 30},
         "3month": {"name": "سه ماهه", "price": 79000, "duration": 90},
         "1year": {"name": "یک ساله", "price": 199000, "duration": 365}
     }
     
+    # Conversation state persistence
+    PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "10"))  # seconds
+    PERSISTENCE_CACHE_SIZE = int(os.getenv("PERSISTENCE_CACHE_SIZE", "50000"))  # loaded users/chats kept in memory
+    
+    # Admin order browser
+    ORDER_PAGE_SIZE = int(os.getenv("ORDER_PAGE_SIZE", "10"))
+    
+    # Audit log
+    AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "500"))
+    AUDIT_LOG_FLUSH_INTERVAL = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL", "1"))  # seconds
+    AUDIT_LOG_MAX_PENDING = int(os.getenv("AUDIT_LOG_MAX_PENDING", "10000"))  # events kept in memory during DB outages
+    AUDIT_LOG_MAX_ATTEMPTS = int(os.getenv("AUDIT_LOG_MAX_ATTEMPTS", "10"))  # then written record by record, bad ones dropped
+    LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "12"))  # monthly partitions older than this are dropped
+    LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", "2"))  # future monthly partitions created in advance
+    
+    # Order review claims
+    ORDER_CLAIM_LEASE = float(os.getenv("ORDER_CLAIM_LEASE", "900"))  # seconds an admin holds a claimed order
+    ORDER_CLAIM_RELEASE_INTERVAL = float(os.getenv("ORDER_CLAIM_RELEASE_INTERVAL", "30"))  # seconds
+    
+    # Outbound Bot API rate limits
+    RATE_LIMIT_OVERALL = float(os.getenv("RATE_LIMIT_OVERALL", "30"))  # messages per second
+    RATE_LIMIT_PRIVATE_CHAT = float(os.getenv("RATE_LIMIT_PRIVATE_CHAT", "1"))  # per chat per second
+    RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE", "20"))
+    RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+    
+    # Broadcast (kept below RATE_LIMIT_OVERALL to leave room for interactive traffic)
+    BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))  # messages per second
+    BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "200"))
+    BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+    BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))  # seconds
+    BROADCAST_RESUME_INTERVAL = float(os.getenv("BROADCAST_RESUME_INTERVAL", "60"))  # leader rescans running broadcasts
+    
+    # Data export
+    EXPORT_MAX_DOCUMENT_SIZE = 50 * 1024 * 1024  # Bot API upload limit
+    
     # File Storage
     UPLOAD_FOLDER = "uploads"
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from app.config import config
+from .models import Admin
+
+logger = logging.getLogger(__name__)
+
+class AdminCache:
+    """کش ادمین‌ها در حافظه با invalidation بین نمونه‌ها از طریق LISTEN/NOTIFY"""
+
+    CHANNEL = "admins_changed"
+
+    def __init__(self, db, ttl: float = 300):
+        self.db = db
+        self.ttl = ttl
+        self._admins: Dict[int, Admin] = {}
+        self._loaded_at: Optional[float] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self):
+        """گوش دادن به تغییرات جدول admins در سایر نمونه‌ها"""
+        await self.db.add_listener(self.CHANNEL, self._on_notify)
+
+    def _on_notify(self, payload: Optional[str]):
+        logger.debug(f"Admin cache invalidated by notify: {payload}")
+        self.invalidate()
+
+    def invalidate(self):
+        """باطل کردن کش تا بارگذاری مجدد در درخواست بعدی"""
+        self._generation += 1
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            generation = self._generation
+            loaded = await self.db.get_all_admins()
+            if loaded is None:
+                # snapshot قبلی حفظ و تازه علامت زده نمی‌شود تا درخواست بعدی دوباره تلاش کند
+                if not self._admins:
+                    self._admins = self._with_config_admins({})
+                return
+            self._admins = self._with_config_admins({admin.admin_id: admin for admin in loaded})
+            # اگر در حین بارگذاری invalidate شده باشیم، داده را تازه حساب نمی‌کنیم
+            if generation == self._generation:
+                self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _with_config_admins(admins: Dict[int, Admin]) -> Dict[int, Admin]:
+        """ادمین‌های ADMIN_IDS همیشه فعال‌اند؛ سطح دسترسی فقط از جدول admins می‌آید"""
+        for admin_id in config.ADMIN_IDS:
+            existing = admins.get(admin_id)
+            admins[admin_id] = Admin(
+                admin_id=admin_id,
+                username=existing.username if existing else "",
+                first_name=existing.first_name if existing else "",
+                level=existing.level if existing else "admin",
+                is_active=True,
+                created_at=existing.created_at if existing else None,
+                created_by=existing.created_by if existing else None
+            )
+        return admins
+
+    def is_admin_cached(self, user_id: int) -> bool:
+        """بررسی بدون I/O بر اساس آخرین داده بارگذاری‌شده (برای مسیرهای همگام)"""
+        admin = self._admins.get(user_id)
+        if admin is not None:
+            return admin.is_active
+        return user_id in config.ADMIN_IDS
+
+    async def get(self, admin_id: int) -> Optional[Admin]:
+        """دریافت ادمین از کش"""
+        await self._ensure_loaded()
+        return self._admins.get(admin_id)
+
+    async def is_admin(self, user_id: int) -> bool:
+        """بررسی ادمین فعال بودن کاربر"""
+        admin = await self.get(user_id)
+        return bool(admin and admin.is_active)
+
+    async def is_super_admin(self, user_id: int) -> bool:
+        """بررسی Super Admin بودن کاربر"""
+        admin = await self.get(user_id)
+        return bool(admin and admin.is_active and admin.level == 'super_admin')
+
+    async def active_admin_ids(self) -> List[int]:
+        """شناسه تمام ادمین‌های فعال (config و دیتابیس)"""
+        await self._ensure_loaded()
+        return [admin_id for admin_id, admin in self._admins.items() if admin.is_active]
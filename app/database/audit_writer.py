@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (user_id، action، target_id، details، زمان ثبت با time.monotonic)
+# created_at هنگام نوشتن از ساعت دیتابیس منهای سن رویداد ساخته می‌شود، همان ساعتی که
+# پارتیشن‌های ماهانه با آن ساخته می‌شوند
+AuditRecord = Tuple[int, str, Optional[int], Optional[str], float]
+
+class AuditLogWriter:
+    """نوشتن ناهمگام لاگ فعالیت ادمین‌ها
+    
+    هندلرها رویداد را فقط در صف حافظه قرار می‌دهند و یک task پس‌زمینه آن‌ها را
+    به صورت دسته‌ای با COPY می‌نویسد. زمان رویداد هنگام ثبت در صف گرفته می‌شود.
+    اگر صف پر شود (مثلا در قطعی طولانی دیتابیس) رویدادهای جدید دور ریخته می‌شوند.
+    دسته‌ای که max_attempts بار (با backoff) رد شود رکورد به رکورد نوشته می‌شود و
+    رکوردهای مشکل‌دار در لاگ برنامه ثبت و کنار گذاشته می‌شوند تا بقیه صف متوقف نماند.
+    """
+
+    def __init__(self, db, batch_size: int = 500, flush_interval: float = 1, max_pending: int = 10_000,
+                 max_attempts: int = 10):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending: Deque[AuditRecord] = deque()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.written = 0
+        self.dropped = 0
+        self.dead = 0
+        # تلاش‌های ناموفق پشت سر هم برای دسته ابتدای صف
+        self._failures = 0
+
+    def start(self):
+        """شروع flush دوره‌ای در پس‌زمینه"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """توقف و flush نهایی صف"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def submit(self, user_id: int, action: str, target_id: Optional[int], details: Optional[str]):
+        """ثبت رویداد بدون I/O"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"⚠️ Audit log queue full, dropped {self.dropped} events so far")
+            return
+        self._pending.append((user_id, action, target_id, details, time.monotonic()))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """نوشتن رویدادهای صف در دسته‌های batch_size تایی"""
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if await self.db.copy_logs(batch):
+                    self._failures = 0
+                    self.written += len(batch)
+                    continue
+                
+                self._failures += 1
+                if self._failures < self.max_attempts:
+                    # برگرداندن به ابتدای صف با حفظ ترتیب؛ در دور بعد دوباره تلاش می‌شود
+                    self._pending.extendleft(reversed(batch))
+                    return
+                self._failures = 0
+                await self._write_individually(batch)
+
+    async def _write_individually(self, batch: List[AuditRecord]):
+        """نوشتن دسته رد‌شده رکورد به رکورد؛ رکوردهای ناموفق فقط در لاگ برنامه می‌مانند"""
+        for record in batch:
+            if await self.db.copy_logs([record]):
+                self.written += 1
+            else:
+                self.dead += 1
+                logger.error(f"❌ Audit log record dropped after {self.max_attempts} attempts: {record[:4]!r}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': len(self._pending),
+            'written': self.written,
+            'dropped': self.dropped,
+            'dead': self.dead
+        }
+
+    async def _run(self):
+        while True:
+            if self._failures:
+                # بعد از خطا صف پر بیدارمان نمی‌کند؛ backoff نمایی تا 60 ثانیه
+                await asyncio.sleep(min(self.flush_interval * 2 ** self._failures, 60))
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"خطا در flush لاگ‌ها: {e}")
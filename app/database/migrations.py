@@ -0,0 +1,498 @@
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# کلید advisory lock تا فقط یک نمونه در هر لحظه migration اجرا کند
+MIGRATION_LOCK_ID = 727_001
+
+# هر migration یک بار و به ترتیب نسخه اجرا می‌شود. migration های 1 تا 3 همان
+# DDL قبلی init_db هستند و روی دیتابیس‌های موجود هم بدون خطا اجرا می‌شوند.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username VARCHAR(255),
+            first_name VARCHAR(255) NOT NULL,
+            last_name VARCHAR(255),
+            balance INTEGER DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS admins (
+            admin_id BIGINT PRIMARY KEY,
+            username VARCHAR(255) NOT NULL,
+            first_name VARCHAR(255) NOT NULL,
+            level VARCHAR(20) DEFAULT 'admin',
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_by BIGINT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(user_id),
+            plan_type VARCHAR(50) NOT NULL,
+            amount INTEGER NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            receipt_file_id VARCHAR(500),
+            vpn_config TEXT,
+            vpn_config_text TEXT,
+            config_type VARCHAR(10) DEFAULT 'file',
+            admin_notes TEXT,
+            processed_by BIGINT REFERENCES admins(admin_id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(user_id),
+            amount INTEGER NOT NULL,
+            type VARCHAR(20) NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS logs (
+            log_id SERIAL PRIMARY KEY,
+            user_id BIGINT,
+            action VARCHAR(255) NOT NULL,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    ]),
+    (2, "stats counters", [
+        # شمارنده‌های آمار که با trigger در همان تراکنش نوشتن بروز می‌شوند
+        """
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            key VARCHAR(255) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION bump_stats_counter(counter_key TEXT, delta BIGINT) RETURNS void AS $$
+        BEGIN
+            INSERT INTO stats_counters (key, value) VALUES (counter_key, delta)
+            ON CONFLICT (key) DO UPDATE SET value = stats_counters.value + EXCLUDED.value;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION users_stats_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM bump_stats_counter('users_total', 1);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM bump_stats_counter('users_total', -1);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE FUNCTION orders_stats_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                IF OLD.status = 'waiting' THEN
+                    PERFORM bump_stats_counter('orders_waiting', -1);
+                ELSIF OLD.status = 'completed' THEN
+                    PERFORM bump_stats_counter('completed:' || OLD.plan_type, -1);
+                    PERFORM bump_stats_counter('revenue:' || OLD.plan_type, -OLD.amount);
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                IF NEW.status = 'waiting' THEN
+                    PERFORM bump_stats_counter('orders_waiting', 1);
+                ELSIF NEW.status = 'completed' THEN
+                    PERFORM bump_stats_counter('completed:' || NEW.plan_type, 1);
+                    PERFORM bump_stats_counter('revenue:' || NEW.plan_type, NEW.amount);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS users_stats ON users",
+        """
+        CREATE TRIGGER users_stats AFTER INSERT OR DELETE ON users
+        FOR EACH ROW EXECUTE FUNCTION users_stats_trigger()
+        """,
+        "DROP TRIGGER IF EXISTS orders_stats ON orders",
+        """
+        CREATE TRIGGER orders_stats AFTER INSERT OR DELETE OR UPDATE OF status, plan_type, amount ON orders
+        FOR EACH ROW EXECUTE FUNCTION orders_stats_trigger()
+        """,
+        # مقداردهی اولیه شمارنده‌ها از داده‌های موجود، فقط یک بار
+        """
+        INSERT INTO stats_counters (key, value)
+        SELECT key, value FROM (
+            SELECT 'users_total' AS key, COUNT(*) AS value FROM users
+            UNION ALL
+            SELECT 'orders_waiting', COUNT(*) FROM orders WHERE status = 'waiting'
+            UNION ALL
+            SELECT 'completed:' || plan_type, COUNT(*) FROM orders WHERE status = 'completed' GROUP BY plan_type
+            UNION ALL
+            SELECT 'revenue:' || plan_type, SUM(amount) FROM orders WHERE status = 'completed' GROUP BY plan_type
+        ) seed
+        WHERE NOT EXISTS (SELECT 1 FROM stats_counters)
+        """
+    ]),
+    (3, "broadcasts", [
+        """
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            broadcast_id SERIAL PRIMARY KEY,
+            admin_id BIGINT NOT NULL,
+            message_text TEXT NOT NULL,
+            status VARCHAR(20) DEFAULT 'running',
+            last_user_id BIGINT DEFAULT 0,
+            sent_count INTEGER DEFAULT 0,
+            failed_count INTEGER DEFAULT 0,
+            blocked_count INTEGER DEFAULT 0,
+            total_count INTEGER DEFAULT 0,
+            progress_chat_id BIGINT,
+            progress_message_id BIGINT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            broadcast_id INTEGER REFERENCES broadcasts(broadcast_id) ON DELETE CASCADE,
+            user_id BIGINT NOT NULL,
+            status VARCHAR(20) DEFAULT 'pending',
+            error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (broadcast_id, user_id)
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_pending
+        ON broadcast_deliveries (broadcast_id, user_id) WHERE status = 'pending'
+        """
+    ]),
+    (4, "hot path indexes", [
+        # get_user_orders: WHERE user_id = $1 ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at DESC)",
+        # get_pending_orders: WHERE status = 'waiting' ORDER BY created_at
+        "CREATE INDEX IF NOT EXISTS idx_orders_waiting_created ON orders (created_at) WHERE status = 'waiting'",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_created ON logs (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_user_created ON logs (user_id, created_at DESC)"
+    ]),
+    (5, "order browser keyset indexes", [
+        # get_orders_page: (created_at, order_id) < ($n, $m) ORDER BY created_at DESC, order_id DESC
+        "CREATE INDEX IF NOT EXISTS idx_orders_created_id ON orders (created_at DESC, order_id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_created_id ON orders (status, created_at DESC, order_id DESC)"
+    ]),
+    (6, "conversation state persistence", [
+        """
+        CREATE TABLE IF NOT EXISTS bot_state (
+            scope VARCHAR(10) NOT NULL,
+            entity_id BIGINT NOT NULL,
+            data JSONB NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (scope, entity_id)
+        )
+        """
+    ]),
+    (7, "plan catalog", [
+        """
+        CREATE TABLE IF NOT EXISTS plans (
+            plan_id VARCHAR(50) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            price INTEGER NOT NULL CHECK (price >= 0),
+            duration INTEGER NOT NULL CHECK (duration > 0),
+            sort_order INTEGER DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    ]),
+    (8, "shared update queue", [
+        # partition_key = کاربر (یا چت) آپدیت؛ NULL یعنی بدون محدودیت ترتیب
+        """
+        CREATE TABLE IF NOT EXISTS update_queue (
+            update_id BIGINT PRIMARY KEY,
+            partition_key BIGINT,
+            payload JSONB NOT NULL,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            locked_by VARCHAR(255),
+            locked_until TIMESTAMP,
+            attempts INTEGER DEFAULT 0,
+            processed_at TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_update_queue_pending ON update_queue (update_id) WHERE processed_at IS NULL",
+        """
+        CREATE INDEX IF NOT EXISTS idx_update_queue_partition_pending
+        ON update_queue (partition_key, update_id) WHERE processed_at IS NULL
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_update_queue_processed ON update_queue (processed_at) WHERE processed_at IS NOT NULL",
+        """
+        CREATE TABLE IF NOT EXISTS update_queue_dead (
+            update_id BIGINT PRIMARY KEY,
+            partition_key BIGINT,
+            payload JSONB NOT NULL,
+            attempts INTEGER NOT NULL,
+            received_at TIMESTAMP,
+            failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # بیدار کردن workerها؛ اعلان‌های یکسان یک تراکنش توسط Postgres ادغام می‌شوند
+        """
+        CREATE OR REPLACE FUNCTION update_queue_notify_trigger() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('updates_queued', '');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS update_queue_notify ON update_queue",
+        """
+        CREATE TRIGGER update_queue_notify AFTER INSERT ON update_queue
+        FOR EACH STATEMENT EXECUTE FUNCTION update_queue_notify_trigger()
+        """
+    ]),
+    (9, "order claims", [
+        # ادمین‌های تعریف‌شده در ADMIN_IDS لزوما در جدول admins نیستند
+        "ALTER TABLE orders DROP CONSTRAINT IF EXISTS orders_processed_by_fkey",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS claimed_by BIGINT",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS claim_expires_at TIMESTAMP",
+        # آزادسازی lease های منقضی: WHERE status = 'processing' AND claim_expires_at < now
+        "CREATE INDEX IF NOT EXISTS idx_orders_processing_expires ON orders (claim_expires_at) WHERE status = 'processing'",
+        """
+        CREATE TABLE IF NOT EXISTS order_notifications (
+            order_id INTEGER REFERENCES orders(order_id) ON DELETE CASCADE,
+            admin_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            PRIMARY KEY (order_id, admin_id)
+        )
+        """,
+        # سفارش در حال بررسی هنوز جزو سفارشات در انتظار شمرده می‌شود
+        """
+        CREATE OR REPLACE FUNCTION orders_stats_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                IF OLD.status IN ('waiting', 'processing') THEN
+                    PERFORM bump_stats_counter('orders_waiting', -1);
+                ELSIF OLD.status = 'completed' THEN
+                    PERFORM bump_stats_counter('completed:' || OLD.plan_type, -1);
+                    PERFORM bump_stats_counter('revenue:' || OLD.plan_type, -OLD.amount);
+                END IF;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                IF NEW.status IN ('waiting', 'processing') THEN
+                    PERFORM bump_stats_counter('orders_waiting', 1);
+                ELSIF NEW.status = 'completed' THEN
+                    PERFORM bump_stats_counter('completed:' || NEW.plan_type, 1);
+                    PERFORM bump_stats_counter('revenue:' || NEW.plan_type, NEW.amount);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ]),
+    (10, "partitioned audit log", [
+        # جدول قبلی یک پارتیشن (تا ابتدای ماه بعد) از جدول جدید می‌شود
+        "ALTER TABLE logs RENAME TO logs_legacy",
+        "ALTER TABLE logs_legacy ADD COLUMN IF NOT EXISTS target_id BIGINT",
+        "ALTER SEQUENCE logs_log_id_seq AS BIGINT",
+        "ALTER TABLE logs_legacy ALTER COLUMN log_id TYPE BIGINT",
+        "UPDATE logs_legacy SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL",
+        "ALTER TABLE logs_legacy ALTER COLUMN created_at SET NOT NULL",
+        """
+        CREATE TABLE logs (
+            log_id BIGINT NOT NULL DEFAULT nextval('logs_log_id_seq'),
+            user_id BIGINT,
+            action VARCHAR(255) NOT NULL,
+            target_id BIGINT,
+            details TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (log_id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """,
+        # با حذف پارتیشن قدیمی sequence نباید حذف شود
+        "ALTER SEQUENCE logs_log_id_seq OWNED BY logs.log_id",
+        # get_audit_trail: WHERE target_id = $1 ORDER BY created_at DESC / فعالیت‌های یک ادمین
+        "CREATE INDEX IF NOT EXISTS idx_logs_actor ON logs (user_id, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_logs_target ON logs (target_id, created_at DESC) WHERE target_id IS NOT NULL",
+        """
+        DO $$
+        BEGIN
+            EXECUTE format(
+                'ALTER TABLE logs ATTACH PARTITION logs_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+                date_trunc('month', LOCALTIMESTAMP) + interval '1 month'
+            );
+        END
+        $$
+        """,
+        # فقط برای وقتی که پارتیشن ماه جاری به موقع ساخته نشده باشد
+        "CREATE TABLE IF NOT EXISTS logs_default PARTITION OF logs DEFAULT"
+    ]),
+    (11, "wallet ledger", [
+        "UPDATE users SET balance = 0 WHERE balance IS NULL",
+        "ALTER TABLE users ALTER COLUMN balance SET NOT NULL",
+        "ALTER TABLE users ADD CONSTRAINT users_balance_non_negative CHECK (balance >= 0)",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS order_id INTEGER REFERENCES orders(order_id)",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS balance_after INTEGER",
+        # snapshot_balances: WHERE created_at >= $1
+        "CREATE INDEX IF NOT EXISTS idx_transactions_created ON transactions (created_at)",
+        # آخرین موجودی ثبت‌شده هر کاربر؛ بازسازی یا بررسی موجودی فقط به تراکنش‌های بعد از آن نیاز دارد
+        """
+        CREATE TABLE IF NOT EXISTS balance_snapshots (
+            user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+            transaction_id INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION transactions_append_only_trigger() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'transactions is an append-only ledger';
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS transactions_append_only ON transactions",
+        """
+        CREATE TRIGGER transactions_append_only BEFORE UPDATE OR DELETE ON transactions
+        FOR EACH ROW EXECUTE FUNCTION transactions_append_only_trigger()
+        """
+    ]),
+    (12, "per-user order counters", [
+        # شمارنده‌های سفارش هر کاربر برای پروفایل، در همان تراکنش تغییر سفارش
+        """
+        CREATE TABLE IF NOT EXISTS user_order_stats (
+            user_id BIGINT PRIMARY KEY,
+            orders_total INTEGER NOT NULL DEFAULT 0,
+            orders_pending INTEGER NOT NULL DEFAULT 0,
+            orders_completed INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE OR REPLACE FUNCTION bump_user_order_stats(uid BIGINT, total INTEGER, pending INTEGER,
+                                                         completed INTEGER) RETURNS void AS $$
+        BEGIN
+            INSERT INTO user_order_stats (user_id, orders_total, orders_pending, orders_completed)
+            VALUES (uid, total, pending, completed)
+            ON CONFLICT (user_id) DO UPDATE SET
+                orders_total = user_order_stats.orders_total + EXCLUDED.orders_total,
+                orders_pending = user_order_stats.orders_pending + EXCLUDED.orders_pending,
+                orders_completed = user_order_stats.orders_completed + EXCLUDED.orders_completed;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # waiting <-> processing (برداشتن و آزاد کردن سفارش) شمارنده‌ها را تغییر نمی‌دهد
+        """
+        CREATE OR REPLACE FUNCTION user_order_stats_trigger() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND (OLD.status, OLD.user_id) IS NOT DISTINCT FROM (NEW.status, NEW.user_id) THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+                PERFORM bump_user_order_stats(
+                    OLD.user_id, -1,
+                    -(OLD.status IN ('waiting', 'processing'))::int,
+                    -(OLD.status = 'completed')::int
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+                PERFORM bump_user_order_stats(
+                    NEW.user_id, 1,
+                    (NEW.status IN ('waiting', 'processing'))::int,
+                    (NEW.status = 'completed')::int
+                );
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('profile_changed', OLD.user_id::text);
+            ELSE
+                PERFORM pg_notify('profile_changed', NEW.user_id::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS user_order_stats ON orders",
+        """
+        CREATE TRIGGER user_order_stats AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON orders
+        FOR EACH ROW EXECUTE FUNCTION user_order_stats_trigger()
+        """,
+        # تغییر موجودی یا نام کاربر هم کش پروفایل سایر نمونه‌ها را باطل می‌کند
+        """
+        CREATE OR REPLACE FUNCTION profile_changed_trigger() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('profile_changed', NEW.user_id::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS users_profile_changed ON users",
+        """
+        CREATE TRIGGER users_profile_changed AFTER UPDATE OF balance, username, first_name ON users
+        FOR EACH ROW
+        WHEN ((OLD.balance, OLD.username, OLD.first_name) IS DISTINCT FROM (NEW.balance, NEW.username, NEW.first_name))
+        EXECUTE FUNCTION profile_changed_trigger()
+        """,
+        """
+        INSERT INTO user_order_stats (user_id, orders_total, orders_pending, orders_completed)
+        SELECT user_id, COUNT(*),
+               COUNT(*) FILTER (WHERE status IN ('waiting', 'processing')),
+               COUNT(*) FILTER (WHERE status = 'completed')
+        FROM orders
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+async def _current_version(conn) -> int:
+    if await conn.fetchval("SELECT to_regclass('schema_version')") is None:
+        return 0
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+
+async def migrate(pool) -> int:
+    """اعمال migration های اجرا نشده؛ در شروع گرم هیچ DDL ای اجرا نمی‌شود"""
+    async with pool.acquire() as conn:
+        current = await _current_version(conn)
+        if current >= LATEST_VERSION:
+            return current
+        
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # ممکن است نمونه دیگری در حین انتظار برای lock migration را انجام داده باشد
+            current = await _current_version(conn)
+            for version, name, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                async with conn.transaction():
+                    for statement in statements:
+                        await conn.execute(statement)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                        version, name
+                    )
+                logger.info(f"✅ Applied migration {version}: {name}")
+                current = version
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+        return current
@@ -1,9 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import ClassVar, Dict, Optional
 
-@dataclass
+# مدل‌ها slots دارند و مستقیما از asyncpg.Record ساخته می‌شوند: Model(*row)
+# COLUMNS هر مدل دقیقا به ترتیب فیلدهای آن است و در SELECT ها استفاده می‌شود.
+
+@dataclass(slots=True)
 class User:
+    COLUMNS: ClassVar[str] = "user_id, username, first_name, last_name, balance, is_active, created_at, updated_at"
+    
     user_id: int
     username: Optional[str]
     first_name: str
@@ -13,8 +18,10 @@ class User:
     created_at: datetime = None
     updated_at: datetime = None
 
-@dataclass
+@dataclass(slots=True)
 class Admin:
+    COLUMNS: ClassVar[str] = "admin_id, username, first_name, level, is_active, created_at, created_by"
+    
     admin_id: int
     username: str
     first_name: str
@@ -23,8 +30,13 @@ class Admin:
     created_at: datetime = None
     created_by: int = None
 
-@dataclass
+@dataclass(slots=True)
 class Order:
+    COLUMNS: ClassVar[str] = (
+        "order_id, user_id, plan_type, amount, status, receipt_file_id, vpn_config, vpn_config_text, "
+        "config_type, admin_notes, processed_by, created_at, updated_at, claimed_by, claim_expires_at"
+    )
+    
     order_id: int
     user_id: int
     plan_type: str
@@ -38,12 +50,115 @@ class Order:
     processed_by: Optional[int] = None
     created_at: datetime = None
     updated_at: datetime = None
+    claimed_by: Optional[int] = None
+    claim_expires_at: datetime = None
 
-@dataclass
+@dataclass(slots=True)
+class OrderSummary:
+    """ستون‌های لازم برای لیست سفارشات"""
+    COLUMNS: ClassVar[str] = "order_id, plan_type, amount, status, created_at"
+    
+    order_id: int
+    plan_type: str
+    amount: int
+    status: str
+    created_at: datetime
+
+@dataclass(slots=True)
+class OrderWithUser:
+    """سفارش همراه با خلاصه اطلاعات کاربر (JOIN)"""
+    COLUMNS: ClassVar[str] = (
+        "o.order_id, o.user_id, o.plan_type, o.amount, o.status, o.receipt_file_id, o.created_at, "
+        "u.username, u.first_name, o.claimed_by"
+    )
+    
+    order_id: int
+    user_id: int
+    plan_type: str
+    amount: int
+    status: str
+    receipt_file_id: Optional[str]
+    created_at: datetime
+    username: Optional[str]
+    first_name: str
+    claimed_by: Optional[int] = None
+
+@dataclass(slots=True)
 class Transaction:
+    COLUMNS: ClassVar[str] = "transaction_id, user_id, amount, type, description, created_at, order_id, balance_after"
+    
     transaction_id: int
     user_id: int
     amount: int
     type: str
     description: str
     created_at: datetime = None
+    order_id: Optional[int] = None
+    balance_after: Optional[int] = None
+
+@dataclass(slots=True)
+class ProfileSummary:
+    """اطلاعات صفحه پروفایل: کاربر به همراه شمارنده‌های سفارش او (یک کوئری)"""
+    COLUMNS: ClassVar[str] = (
+        "u.user_id, u.username, u.first_name, u.balance, "
+        "COALESCE(s.orders_total, 0), COALESCE(s.orders_pending, 0), COALESCE(s.orders_completed, 0)"
+    )
+    
+    user_id: int
+    username: Optional[str]
+    first_name: str
+    balance: int = 0
+    orders_total: int = 0
+    orders_pending: int = 0
+    orders_completed: int = 0
+
+@dataclass(slots=True)
+class Stats:
+    total_users: int = 0
+    pending_orders: int = 0
+    completed_by_plan: Dict[str, int] = field(default_factory=dict)
+    revenue_by_plan: Dict[str, int] = field(default_factory=dict)
+
+@dataclass(slots=True)
+class Broadcast:
+    COLUMNS: ClassVar[str] = (
+        "broadcast_id, admin_id, message_text, status, last_user_id, sent_count, failed_count, "
+        "blocked_count, total_count, progress_chat_id, progress_message_id, created_at, finished_at"
+    )
+    
+    broadcast_id: int
+    admin_id: int
+    message_text: str
+    status: str = "running"
+    last_user_id: int = 0
+    sent_count: int = 0
+    failed_count: int = 0
+    blocked_count: int = 0
+    total_count: int = 0
+    progress_chat_id: Optional[int] = None
+    progress_message_id: Optional[int] = None
+    created_at: datetime = None
+    finished_at: datetime = None
+
+@dataclass(slots=True)
+class Plan:
+    COLUMNS: ClassVar[str] = "plan_id, name, price, duration, sort_order, is_active, updated_at"
+    
+    plan_id: str
+    name: str
+    price: int
+    duration: int
+    sort_order: int = 0
+    is_active: bool = True
+    updated_at: datetime = None
+
+@dataclass(slots=True)
+class LogEntry:
+    COLUMNS: ClassVar[str] = "log_id, user_id, action, target_id, details, created_at"
+    
+    log_id: int
+    user_id: Optional[int]
+    action: str
+    target_id: Optional[int]
+    details: Optional[str]
+    created_at: datetime
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+StateKey = Tuple[str, int]
+
+class PostgresPersistence(BasePersistence):
+    """persistence برای user_data و chat_data روی pool موجود asyncpg
+    
+    داده هر کاربر/چت در اولین آپدیت او (refresh_*) بارگذاری می‌شود، نه همه در شروع.
+    فقط داده‌هایی که نسبت به آخرین نسخه ذخیره‌شده تغییر کرده‌اند علامت dirty می‌خورند
+    و با هم در یک دستور upsert می‌شوند. bot_data (شامل اتصال دیتابیس) ذخیره نمی‌شود.
+    
+    با shared=True (چند worker روی صف مشترک) داده در هر آپدیت از دیتابیس خوانده
+    می‌شود، چون آپدیت قبلی همان کاربر ممکن است روی نمونه دیگری پردازش شده باشد.
+    
+    وضعیت بارگذاری و snapshot حداکثر cache_size کاربر/چت اخیر نگه داشته می‌شود (LRU)؛
+    کلیدهایی که تغییر ذخیره‌نشده دارند حذف نمی‌شوند.
+    """
+
+    def __init__(self, db, update_interval: float = 10, flush_delay: float = 0.5, cache_size: int = 50_000,
+                 shared: bool = False):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db
+        self.flush_delay = flush_delay
+        self.shared = shared
+        self.cache_size = cache_size
+        # ترتیب استفاده برای LRU
+        self._loaded: "OrderedDict[StateKey, None]" = OrderedDict()
+        self._snapshots: Dict[StateKey, str] = {}
+        self._dirty: Dict[StateKey, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def _serialize(data) -> str:
+        return json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+
+    async def _refresh(self, key: StateKey, data: Dict):
+        # تغییرات محلی ذخیره‌نشده از نسخه دیتابیس جدیدترند
+        if key in self._loaded and (not self.shared or key in self._dirty):
+            self._loaded.move_to_end(key)
+            return
+        stored = await self.db.load_state(*key)
+        if stored is None:
+            # خطا در خواندن؛ در آپدیت بعدی دوباره تلاش می‌شود
+            return
+        if self.shared:
+            data.clear()
+            data.update(stored)
+        else:
+            for name, value in stored.items():
+                data.setdefault(name, value)
+        if stored:
+            self._snapshots[key] = self._serialize(stored)
+        else:
+            self._snapshots.pop(key, None)
+        self._loaded[key] = None
+        self._loaded.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        """حذف قدیمی‌ترین کلیدهای بدون تغییر ذخیره‌نشده تا اندازه cache_size"""
+        for _ in range(len(self._loaded) - self.cache_size):
+            key, _ = self._loaded.popitem(last=False)
+            if key in self._dirty:
+                # بعد از flush در دور بعد حذف می‌شود
+                self._loaded[key] = None
+                continue
+            self._snapshots.pop(key, None)
+
+    def _mark_dirty(self, key: StateKey, data: Dict):
+        serialized = self._serialize(data)
+        if self._snapshots.get(key, "{}") == serialized:
+            self._dirty.pop(key, None)
+            return
+        self._dirty[key] = serialized
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # PTB همه update_* یک دوره را با هم صدا می‌زند؛ کمی صبر تا همه در یک دسته بروند
+        await asyncio.sleep(self.flush_delay)
+        await self.flush()
+
+    # --- user / chat data ---
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict):
+        await self._refresh(('user', user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict):
+        await self._refresh(('chat', chat_id), chat_data)
+
+    async def update_user_data(self, user_id: int, data: Dict):
+        self._mark_dirty(('user', user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict):
+        self._mark_dirty(('chat', chat_id), data)
+
+    async def drop_user_data(self, user_id: int):
+        await self._drop(('user', user_id))
+
+    async def drop_chat_data(self, chat_id: int):
+        await self._drop(('chat', chat_id))
+
+    async def _drop(self, key: StateKey):
+        self._dirty.pop(key, None)
+        self._snapshots.pop(key, None)
+        self._loaded.pop(key, None)
+        await self.db.save_states([], [key])
+
+    # --- داده‌هایی که ذخیره نمی‌شوند ---
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def refresh_bot_data(self, bot_data: Dict):
+        pass
+
+    async def update_bot_data(self, data: Dict):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def flush(self):
+        """نوشتن همه داده‌های dirty در یک دسته"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            
+            upserts = [(scope, entity_id, data) for (scope, entity_id), data in batch.items() if data != "{}"]
+            deletes = [key for key, data in batch.items() if data == "{}"]
+            if not await self.db.save_states(upserts, deletes):
+                for key, data in batch.items():
+                    self._dirty.setdefault(key, data)
+                return
+            
+            # کلیدهایی که در این فاصله از LRU حذف شده‌اند در بارگذاری بعدی دوباره خوانده می‌شوند
+            self._snapshots.update((key, data) for key, data in batch.items() if key in self._loaded)
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .models import ProfileSummary
+
+logger = logging.getLogger(__name__)
+
+class ProfileCache:
+    """کش LRU با TTL کوتاه برای پروفایل کاربران
+
+    نوشتن‌های همین نمونه مستقیما invalidate می‌کنند و نوشتن‌های سایر نمونه‌ها
+    (یا trigger های دیتابیس) از طریق NOTIFY روی CHANNEL با شناسه کاربر.
+    """
+
+    CHANNEL = "profile_changed"
+
+    def __init__(self, db, ttl: float = 60, max_size: int = 10000):
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, ProfileSummary]]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def subscribe(self):
+        """گوش دادن به تغییرات پروفایل در سایر نمونه‌ها"""
+        await self.db.add_listener(self.CHANNEL, self._on_notify)
+
+    def _on_notify(self, payload: Optional[str]):
+        # بعد از قطع اتصال listener ممکن است اعلانی از دست رفته باشد
+        if payload is None:
+            self.clear()
+            return
+        try:
+            self.invalidate(int(payload))
+        except ValueError:
+            logger.debug(f"Ignoring profile notify payload: {payload!r}")
+
+    def invalidate(self, user_id: int):
+        """حذف پروفایل کاربر؛ بارگذاری در حال انجام هم در کش ذخیره نمی‌شود"""
+        self._entries.pop(user_id, None)
+        self._loading.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._loading.clear()
+
+    async def get(self, user_id: int) -> Optional[ProfileSummary]:
+        """پروفایل از کش، یا یک بار بارگذاری برای درخواست‌های همزمان همان کاربر"""
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        loading = self._loading.get(user_id)
+        if loading is None:
+            self.misses += 1
+            # بارگذاری در task جدا انجام می‌شود تا لغو یک درخواست، منتظرهای دیگر را لغو نکند
+            loading = asyncio.ensure_future(self.db.load_profile_summary(user_id))
+            self._loading[user_id] = loading
+            loading.add_done_callback(lambda task: self._store(user_id, task))
+        return await asyncio.shield(loading)
+
+    def _store(self, user_id: int, task: asyncio.Future):
+        # اگر در حین بارگذاری invalidate شده باشیم، نتیجه را ذخیره نمی‌کنیم
+        if self._loading.get(user_id) is not task:
+            return
+        del self._loading[user_id]
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            return
+        self._entries[user_id] = (time.monotonic(), task.result())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
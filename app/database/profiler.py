@@ -0,0 +1,250 @@
+import asyncio
+import contextvars
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from app.utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# عملیات repository در حال اجرا؛ در DatabaseRepository هنگام زمان‌سنجی هر متد تنظیم می‌شود
+current_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_operation", default=None)
+
+# شمارنده کوئری‌های آپدیت در حال پردازش (Counter بر اساس نام عملیات)
+_update_queries: contextvars.ContextVar[Optional[Counter]] = contextvars.ContextVar("update_queries", default=None)
+
+# فقط SELECT های بدون قفل و اثر جانبی با ANALYZE دوباره اجرا می‌شوند؛ بقیه فقط EXPLAIN
+READ_ONLY_STATEMENT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+SIDE_EFFECTS = re.compile(r"\bFOR\s+UPDATE\b|\bpg_notify\b|\bpg_advisory|\bnextval\b", re.IGNORECASE)
+
+# تعداد ردیف در وضعیت execute: "UPDATE 3"، "INSERT 0 5"، ...
+STATUS_ROWS = re.compile(r"(\d+)$")
+
+# بازه تعداد کوئری به ازای هر آپدیت
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+@dataclass(slots=True)
+class StatementStats:
+    """آمار یک عبارت (نام عملیات repository) از شروع برنامه"""
+    name: str
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    rows: int = 0
+    slow: int = 0
+    errors: int = 0
+    slowest_query: Optional[str] = None
+    plan: Optional[str] = None
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+class QueryProfiler:
+    """لایه profiling کوئری‌های repository
+
+    هر کوئری (با نام عملیات repository در حال اجرا) زمان‌سنجی می‌شود؛ کوئری‌های
+    کندتر از slow_threshold با مدت و تعداد ردیف لاگ می‌شوند و به احتمال
+    explain_sample_rate برنامه اجرای آن‌ها روی اتصال جدا گرفته می‌شود.
+    تعداد کوئری‌های هر آپدیت هم برای پیدا کردن الگوهای N+1 شمرده می‌شود.
+    """
+
+    def __init__(self, db, slow_threshold: float = 0.2, explain_sample_rate: float = 0.0,
+                 update_query_warn: int = 15):
+        self.db = db
+        self.slow_threshold = slow_threshold
+        self.explain_sample_rate = explain_sample_rate
+        self.update_query_warn = update_query_warn
+        self.statements: Dict[str, StatementStats] = {}
+        self.queries_per_update = Histogram(QUERY_COUNT_BUCKETS)
+        self.slow_queries = 0
+        self._explaining = False
+
+    def wrap(self, conn) -> "ProfiledConnection":
+        return ProfiledConnection(conn, self)
+
+    def record(self, query: str, args: tuple, elapsed: float, rows: int, failed: bool = False):
+        name = current_operation.get() or "unknown"
+        stats = self.statements.get(name)
+        if stats is None:
+            stats = self.statements[name] = StatementStats(name)
+        stats.count += 1
+        stats.total += elapsed
+        stats.rows += rows
+        if failed:
+            stats.errors += 1
+        if elapsed > stats.max:
+            stats.max = elapsed
+            stats.slowest_query = query
+
+        counter = _update_queries.get()
+        if counter is not None:
+            counter[name] += 1
+
+        if elapsed >= self.slow_threshold:
+            stats.slow += 1
+            self.slow_queries += 1
+            logger.warning(f"🐢 Slow query {name}: {elapsed * 1000:.1f}ms, {rows} rows")
+            if (self.explain_sample_rate > 0 and not self._explaining
+                    and random.random() < self.explain_sample_rate):
+                self._explaining = True
+                asyncio.get_running_loop().create_task(self._explain(stats, query, args))
+
+    async def _explain(self, stats: StatementStats, query: str, args: tuple):
+        """گرفتن برنامه اجرا روی اتصال جدا؛ ANALYZE داخل تراکنشی که rollback می‌شود"""
+        analyze = READ_ONLY_STATEMENT.match(query) and not SIDE_EFFECTS.search(query)
+        options = "(ANALYZE, BUFFERS)" if analyze else ""
+        try:
+            # اتصال خام pool تا خود EXPLAIN در آمار شمرده نشود
+            async with self.db.pool.acquire() as conn:
+                async with conn.transaction():
+                    rows = await conn.fetch(f"EXPLAIN {options} {query}", *args)
+                    plan = "\n".join(row[0] for row in rows)
+                    if analyze:
+                        raise _Rollback()
+        except _Rollback:
+            pass
+        except Exception as e:
+            logger.error(f"خطا در گرفتن EXPLAIN برای {stats.name}: {e}")
+            return
+        finally:
+            self._explaining = False
+        stats.plan = plan
+        logger.warning(f"🐢 Plan for {stats.name}:\n{plan}")
+
+    @contextmanager
+    def track_update(self, update: object):
+        """شمارش کوئری‌های یک آپدیت (و taskهایی که در حین آن ساخته می‌شوند)"""
+        counter = Counter()
+        token = _update_queries.set(counter)
+        try:
+            yield counter
+        finally:
+            _update_queries.reset(token)
+            total = sum(counter.values())
+            self.queries_per_update.observe(total)
+            if total > self.update_query_warn:
+                update_id = getattr(update, 'update_id', None)
+                top = ", ".join(f"{name}×{count}" for name, count in counter.most_common(5))
+                logger.warning(f"⚠️ Update {update_id} ran {total} queries: {top}")
+
+    def top(self, limit: int = 10) -> List[StatementStats]:
+        """کندترین عبارات بر اساس بیشترین مدت"""
+        return sorted(self.statements.values(), key=lambda s: s.max, reverse=True)[:limit]
+
+class _Rollback(Exception):
+    pass
+
+def _status_rows(status: str) -> int:
+    match = STATUS_ROWS.search(status or "")
+    return int(match.group(1)) if match else 0
+
+class ProfiledConnection:
+    """پوشش اتصال asyncpg که کوئری‌ها را به QueryProfiler گزارش می‌دهد؛ بقیه متدها (transaction و ...) مستقیم به اتصال می‌روند"""
+
+    __slots__ = ("_conn", "_profiler")
+
+    def __init__(self, conn, profiler: QueryProfiler):
+        self._conn = conn
+        self._profiler = profiler
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    async def _run(self, method, query: str, args: tuple, kwargs: dict, count_rows):
+        start = time.perf_counter()
+        try:
+            result = await method(query, *args, **kwargs)
+        except Exception:
+            self._profiler.record(query, args, time.perf_counter() - start, 0, failed=True)
+            raise
+        self._profiler.record(query, args, time.perf_counter() - start, count_rows(result))
+        return result
+
+    async def execute(self, query: str, *args, **kwargs):
+        return await self._run(self._conn.execute, query, args, kwargs, _status_rows)
+
+    async def fetch(self, query: str, *args, **kwargs):
+        return await self._run(self._conn.fetch, query, args, kwargs, len)
+
+    async def fetchrow(self, query: str, *args, **kwargs):
+        return await self._run(self._conn.fetchrow, query, args, kwargs, lambda row: int(row is not None))
+
+    async def fetchval(self, query: str, *args, **kwargs):
+        return await self._run(self._conn.fetchval, query, args, kwargs, lambda value: int(value is not None))
+
+    async def executemany(self, command: str, args, **kwargs):
+        args = list(args)
+        # EXPLAIN نمونه با پارامترهای ردیف اول
+        sample = tuple(args[0]) if args else ()
+        start = time.perf_counter()
+        try:
+            result = await self._conn.executemany(command, args, **kwargs)
+        except Exception:
+            self._profiler.record(command, sample, time.perf_counter() - start, 0, failed=True)
+            raise
+        self._profiler.record(command, sample, time.perf_counter() - start, len(args))
+        return result
+
+    async def copy_from_query(self, query: str, *args, **kwargs):
+        return await self._run(self._conn.copy_from_query, query, args, kwargs, _status_rows)
+
+    def cursor(self, query: str, *args, **kwargs) -> "ProfiledCursorFactory":
+        return ProfiledCursorFactory(self._conn.cursor(query, *args, **kwargs), self._profiler, query, args)
+
+    async def copy_records_to_table(self, table_name: str, *, records, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await self._conn.copy_records_to_table(table_name, records=records, **kwargs)
+        except Exception:
+            self._profiler.record(f"COPY {table_name}", (), time.perf_counter() - start, 0, failed=True)
+            raise
+        self._profiler.record(f"COPY {table_name}", (), time.perf_counter() - start, _status_rows(result))
+        return result
+
+class ProfiledCursorFactory:
+    """پوشش cursor اتصال؛ با async for کل پیمایش (شامل زمان مصرف‌کننده بین ردیف‌ها) و با await فقط باز کردن cursor ثبت می‌شود"""
+
+    __slots__ = ("_factory", "_profiler", "_query", "_args")
+
+    def __init__(self, factory, profiler: QueryProfiler, query: str, args: tuple):
+        self._factory = factory
+        self._profiler = profiler
+        self._query = query
+        self._args = args
+
+    def __aiter__(self):
+        # با break زودهنگام، ثبت هنگام بسته شدن generator توسط event loop انجام می‌شود
+        return self._iterate()
+
+    async def _iterate(self):
+        start = time.perf_counter()
+        rows = 0
+        failed = False
+        try:
+            async for record in self._factory:
+                rows += 1
+                yield record
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._profiler.record(self._query, self._args, time.perf_counter() - start, rows, failed=failed)
+
+    def __await__(self):
+        return self._open().__await__()
+
+    async def _open(self):
+        start = time.perf_counter()
+        try:
+            cursor = await self._factory
+        except Exception:
+            self._profiler.record(self._query, self._args, time.perf_counter() - start, 0, failed=True)
+            raise
+        self._profiler.record(self._query, self._args, time.perf_counter() - start, 0)
+        return cursor
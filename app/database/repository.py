@@ -1,98 +1,254 @@
+import asyncio
 import asyncpg
+import functools
+import inspect
+import json
 import logging
-from typing import List, Optional
-from .models import User, Admin, Order, Transaction
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from app.config import config
+from .models import (
+    User, Admin, Order, OrderSummary, OrderWithUser, Transaction, Stats, Broadcast, Plan, LogEntry, ProfileSummary
+)
+from .admin_cache import AdminCache
+from .profile_cache import ProfileCache
+from .user_writer import UserWriteBehind
+from .audit_writer import AuditLogWriter, AuditRecord
+from .profiler import QueryProfiler, current_operation
+from .migrations import migrate
+from app.utils.metrics import CounterFamily, Histogram, HistogramFamily
 
 logger = logging.getLogger(__name__)
 
+# جداول قابل خروجی گرفتن: نام جدول -> (ستون‌ها، کلید ترتیب)
+EXPORT_TABLES = {
+    'users': (User.COLUMNS, 'user_id'),
+    'orders': (Order.COLUMNS, 'order_id'),
+    'transactions': (Transaction.COLUMNS, 'transaction_id'),
+    'logs': (LogEntry.COLUMNS, 'log_id')
+}
+
+# کانال اعلان تغییر پلن‌ها بین نمونه‌ها
+PLANS_CHANNEL = "plans_changed"
+
+# پیام گروهی ثبت‌شده روی یک نمونه که رهبر باید ارسالش کند
+BROADCASTS_CHANNEL = "broadcast_started"
+
+# حداکثر شناسه در هر payload اعلان غیرفعال شدن کاربران (محدودیت 8000 بایت NOTIFY)
+DEACTIVATED_NOTIFY_CHUNK = 300
+
+# مرزهای پارتیشن در خروجی pg_get_expr: FOR VALUES FROM ('...') TO ('...')
+LOG_PARTITION_BOUNDS = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+def _parse_partition_bound(value: str) -> Optional[datetime]:
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
 class DatabaseRepository:
     def __init__(self, database_url: str):
         self.database_url = database_url
         self.pool = None
+        self.listener_conn = None
+        self._listeners: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._reconnect_task = None
+        self.admin_cache = AdminCache(self, ttl=config.ADMIN_CACHE_TTL)
+        self.profile_cache = ProfileCache(self, ttl=config.PROFILE_CACHE_TTL, max_size=config.PROFILE_CACHE_SIZE)
+        self.audit_writer = AuditLogWriter(
+            self,
+            batch_size=config.AUDIT_LOG_BATCH_SIZE,
+            flush_interval=config.AUDIT_LOG_FLUSH_INTERVAL,
+            max_pending=config.AUDIT_LOG_MAX_PENDING,
+            max_attempts=config.AUDIT_LOG_MAX_ATTEMPTS
+        )
+        
+        # آمار pool
+        self.acquire_wait = Histogram()
+        self.acquire_timeouts = 0
+        self.connections_in_use = 0
+        
+        self.profiler = QueryProfiler(
+            self,
+            slow_threshold=config.SLOW_QUERY_THRESHOLD,
+            explain_sample_rate=config.SLOW_QUERY_EXPLAIN_SAMPLE,
+            update_query_warn=config.UPDATE_QUERY_WARN
+        )
+        
+        # زمان هر عملیات repository (با احتساب انتظار برای اتصال)
+        self.operation_duration = HistogramFamily()
+        self.operation_errors = CounterFamily()
     
     async def connect(self):
         """ایجاد connection pool"""
         try:
-            self.pool = await asyncpg.create_pool(self.database_url)
+            self.pool = await asyncpg.create_pool(
+                self.database_url,
+                min_size=config.DB_POOL_MIN_SIZE,
+                max_size=config.DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=config.DB_POOL_MAX_INACTIVE_LIFETIME,
+                command_timeout=config.DB_COMMAND_TIMEOUT,
+                statement_cache_size=config.DB_STATEMENT_CACHE_SIZE,
+                server_settings={'application_name': config.DB_APPLICATION_NAME},
+                init=self._init_connection
+            )
             await self.init_db()
+            await self.admin_cache.subscribe()
+            await self.profile_cache.subscribe()
+            self.audit_writer.start()
             logger.info("✅ Database connected successfully")
         except Exception as e:
             logger.error(f"❌ Database connection failed: {e}")
             raise
     
-    async def init_db(self):
-        """ایجاد جداول دیتابیس"""
-        commands = [
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id BIGINT PRIMARY KEY,
-                username VARCHAR(255),
-                first_name VARCHAR(255) NOT NULL,
-                last_name VARCHAR(255),
-                balance INTEGER DEFAULT 0,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS admins (
-                admin_id BIGINT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL,
-                first_name VARCHAR(255) NOT NULL,
-                level VARCHAR(20) DEFAULT 'admin',
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                created_by BIGINT
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS orders (
-                order_id SERIAL PRIMARY KEY,
-                user_id BIGINT REFERENCES users(user_id),
-                plan_type VARCHAR(50) NOT NULL,
-                amount INTEGER NOT NULL,
-                status VARCHAR(20) DEFAULT 'pending',
-                receipt_file_id VARCHAR(500),
-                vpn_config TEXT,
-                vpn_config_text TEXT,
-                config_type VARCHAR(10) DEFAULT 'file',
-                admin_notes TEXT,
-                processed_by BIGINT REFERENCES admins(admin_id),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id SERIAL PRIMARY KEY,
-                user_id BIGINT REFERENCES users(user_id),
-                amount INTEGER NOT NULL,
-                type VARCHAR(20) NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS logs (
-                log_id SERIAL PRIMARY KEY,
-                user_id BIGINT,
-                action VARCHAR(255) NOT NULL,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        ]
+    @staticmethod
+    async def _init_connection(conn):
+        """تنظیمات هر اتصال جدید pool"""
+        for type_name in ('json', 'jsonb'):
+            await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+    
+    @asynccontextmanager
+    async def _acquire(self):
+        """گرفتن اتصال از pool با ثبت زمان انتظار و timeout ها"""
+        start = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=config.DB_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        self.acquire_wait.observe(time.perf_counter() - start)
+        self.connections_in_use += 1
+        try:
+            yield self.profiler.wrap(conn)
+        finally:
+            self.connections_in_use -= 1
+            await self.pool.release(conn)
+    
+    def pool_stats(self) -> Dict:
+        """آمار لحظه‌ای pool اتصال‌ها"""
+        if self.pool is None:
+            return {}
+        return {
+            'size': self.pool.get_size(),
+            'idle': self.pool.get_idle_size(),
+            'in_use': self.connections_in_use,
+            'min_size': self.pool.get_min_size(),
+            'max_size': self.pool.get_max_size(),
+            'acquire_timeouts': self.acquire_timeouts,
+            'acquire_wait': self.acquire_wait.snapshot()
+        }
+    
+    async def close(self):
+        """بستن اتصال‌های دیتابیس"""
+        if self.pool:
+            await self.audit_writer.stop()
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        if self.listener_conn and not self.listener_conn.is_closed():
+            await self.listener_conn.close()
+        self.listener_conn = None
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+    
+    async def open_connection(self):
+        """اتصال اختصاصی خارج از pool (برای قفل‌های سطح session که نباید با اتصال به pool برگردند)"""
+        return await asyncpg.connect(
+            self.database_url,
+            command_timeout=config.DB_COMMAND_TIMEOUT,
+            server_settings={'application_name': config.DB_APPLICATION_NAME}
+        )
+    
+    async def add_listener(self, channel: str, callback: Callable[[Optional[str]], None]):
+        """ثبت listener برای یک کانال NOTIFY روی اتصال اختصاصی
         
-        async with self.pool.acquire() as conn:
-            for command in commands:
-                await conn.execute(command)
-        logger.info("✅ Database tables created successfully")
+        callback با payload اعلان صدا زده می‌شود، و با None در صورتی که
+        اتصال قطع شده و ممکن است اعلان‌هایی از دست رفته باشد.
+        """
+        first = channel not in self._listeners
+        self._listeners.setdefault(channel, []).append(callback)
+        if self.listener_conn is None:
+            await self._open_listener_conn()
+        elif first:
+            await self.listener_conn.add_listener(channel, self._dispatch_notify)
+    
+    async def _open_listener_conn(self):
+        # اتصال‌های pool هنگام بازگشت reset می‌شوند، پس LISTEN روی اتصال جدا انجام می‌شود
+        self.listener_conn = await asyncpg.connect(self.database_url)
+        self.listener_conn.add_termination_listener(self._on_listener_terminated)
+        for channel in self._listeners:
+            await self.listener_conn.add_listener(channel, self._dispatch_notify)
+    
+    def _dispatch_notify(self, connection, pid, channel, payload):
+        for callback in self._listeners.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"خطا در پردازش اعلان {channel}: {e}")
+    
+    def _on_listener_terminated(self, connection):
+        logger.warning("⚠️ Listener connection lost, reconnecting")
+        self.listener_conn = None
+        if self.pool is not None and self._reconnect_task is None:
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect_listeners())
+    
+    async def _reconnect_listeners(self):
+        delay = 1
+        try:
+            while self.listener_conn is None:
+                try:
+                    await self._open_listener_conn()
+                except Exception as e:
+                    logger.error(f"خطا در اتصال مجدد listener: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 60)
+                    continue
+                # اعلان‌های زمان قطعی از دست رفته‌اند، همه کش‌ها باید بارگذاری مجدد شوند
+                for channel in self._listeners:
+                    self._dispatch_notify(None, None, channel, None)
+        finally:
+            self._reconnect_task = None
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """unit of work: اجرای چند عملیات روی یک اتصال و در یک تراکنش
+        
+        اتصال برگردانده‌شده را به پارامتر tx متدهای repository بدهید؛ آن متدها
+        در این حالت خطا را بالا می‌دهند تا کل تراکنش rollback شود.
+        
+            async with db.transaction() as tx:
+                order_id = await db.create_order(order, tx=tx)
+                await db.update_order_receipt(order_id, file_id, tx=tx)
+        """
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                yield conn
+    
+    @asynccontextmanager
+    async def _connection(self, tx=None):
+        """اتصال تراکنش جاری در صورت وجود، وگرنه یک اتصال از pool"""
+        if tx is not None:
+            yield tx
+        else:
+            async with self._acquire() as acquired:
+                yield acquired
+    
+    async def init_db(self):
+        """اعمال migration های دیتابیس"""
+        version = await migrate(self.pool)
+        logger.info(f"✅ Database schema at version {version}")
     
     async def add_user(self, user: User) -> bool:
         """افزودن کاربر جدید"""
         try:
-            async with self.pool.acquire() as conn:
+            async with self._acquire() as conn:
                 await conn.execute("""
                     INSERT INTO users (user_id, username, first_name, last_name)
                     VALUES ($1, $2, $3, $4)
@@ -107,34 +263,104 @@ class DatabaseRepository:
             logger.error(f"خطا در افزودن کاربر: {e}")
             return False
     
-    async def get_user(self, user_id: int) -> Optional[User]:
+    async def upsert_users(self, users: List[User], tx=None) -> bool:
+        """upsert دسته‌ای کاربران در یک دستور؛ ردیف‌های بدون تغییر بازنویسی نمی‌شوند"""
+        try:
+            async with self._connection(tx) as conn:
+                await conn.execute("""
+                    INSERT INTO users (user_id, username, first_name, last_name)
+                    SELECT * FROM unnest($1::bigint[], $2::varchar[], $3::varchar[], $4::varchar[])
+                    ON CONFLICT (user_id) DO UPDATE SET
+                    username = EXCLUDED.username,
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    is_active = TRUE,
+                    updated_at = CURRENT_TIMESTAMP
+                    WHERE (users.username, users.first_name, users.last_name, users.is_active)
+                        IS DISTINCT FROM (EXCLUDED.username, EXCLUDED.first_name, EXCLUDED.last_name, TRUE)
+                """,
+                    [u.user_id for u in users],
+                    [u.username for u in users],
+                    [u.first_name for u in users],
+                    [u.last_name for u in users])
+            for u in users:
+                self.profile_cache.invalidate(u.user_id)
+            return True
+        except Exception as e:
+            if tx is not None:
+                raise
+            logger.error(f"خطا در ثبت دسته‌ای کاربران: {e}")
+            return False
+    
+    async def get_user(self, user_id: int, tx=None) -> Optional[User]:
         """دریافت اطلاعات کاربر"""
         try:
-            async with self.pool.acquire() as conn:
-                row = await conn.fetchrow("SELECT * FROM users WHERE user_id = $1", user_id)
-                return User(**dict(row)) if row else None
+            async with self._connection(tx) as conn:
+                row = await conn.fetchrow(f"SELECT {User.COLUMNS} FROM users WHERE user_id = $1", user_id)
+                return User(*row) if row else None
         except Exception as e:
+            if tx is not None:
+                raise
             logger.error(f"خطا در دریافت کاربر: {e}")
             return None
     
-    async def create_order(self, order: Order) -> Optional[int]:
+    async def get_profile_summary(self, user_id: int) -> Optional[ProfileSummary]:
+        """پروفایل کاربر (از کش)"""
+        try:
+            return await self.profile_cache.get(user_id)
+        except Exception as e:
+            logger.error(f"خطا در دریافت پروفایل: {e}")
+            return None
+    
+    async def load_profile_summary(self, user_id: int) -> Optional[ProfileSummary]:
+        """اطلاعات کاربر و شمارنده‌های سفارش او در یک کوئری (بدون شمارش سفارش‌ها)"""
+        async with self._acquire() as conn:
+            row = await conn.fetchrow(f"""
+                SELECT {ProfileSummary.COLUMNS}
+                FROM users u
+                LEFT JOIN user_order_stats s ON s.user_id = u.user_id
+                WHERE u.user_id = $1
+            """, user_id)
+            return ProfileSummary(*row) if row else None
+    
+    async def create_order(self, order: Order, tx=None) -> Optional[int]:
         """ایجاد سفارش جدید"""
         try:
-            async with self.pool.acquire() as conn:
+            async with self._connection(tx) as conn:
                 order_id = await conn.fetchval("""
                     INSERT INTO orders (user_id, plan_type, amount)
                     VALUES ($1, $2, $3)
                     RETURNING order_id
                 """, order.user_id, order.plan_type, order.amount)
+                self.profile_cache.invalidate(order.user_id)
+                return order_id
+        except Exception as e:
+            if tx is not None:
+                raise
+            logger.error(f"خطا در ایجاد سفارش: {e}")
+            return None
+    
+    async def create_order_with_receipt(self, order: Order, receipt_file_id: str, tx=None) -> Optional[int]:
+        """ایجاد سفارش همراه با رسید، مستقیما با وضعیت waiting و در یک دستور"""
+        try:
+            async with self._connection(tx) as conn:
+                order_id = await conn.fetchval("""
+                    INSERT INTO orders (user_id, plan_type, amount, status, receipt_file_id)
+                    VALUES ($1, $2, $3, 'waiting', $4)
+                    RETURNING order_id
+                """, order.user_id, order.plan_type, order.amount, receipt_file_id)
+                self.profile_cache.invalidate(order.user_id)
                 return order_id
         except Exception as e:
+            if tx is not None:
+                raise
             logger.error(f"خطا در ایجاد سفارش: {e}")
             return None
     
-    async def update_order_receipt(self, order_id: int, receipt_file_id: str) -> bool:
+    async def update_order_receipt(self, order_id: int, receipt_file_id: str, tx=None) -> bool:
         """بروزرسانی رسید پرداخت"""
         try:
-            async with self.pool.acquire() as conn:
+            async with self._connection(tx) as conn:
                 await conn.execute("""
                     UPDATE orders 
                     SET receipt_file_id = $1, status = 'waiting', updated_at = CURRENT_TIMESTAMP
@@ -142,121 +368,979 @@ class DatabaseRepository:
                 """, receipt_file_id, order_id)
                 return True
         except Exception as e:
+            if tx is not None:
+                raise
             logger.error(f"خطا در بروزرسانی سفارش: {e}")
             return False
     
-    async def update_order_config(self, order_id: int, config_text: str, config_type: str, processed_by: int) -> bool:
-        """بروزرسانی کانفیگ سفارش"""
+    async def update_order_config(self, order_id: int, config_text: str, config_type: str, processed_by: int,
+                                  tx=None) -> bool:
+        """بروزرسانی کانفیگ و تکمیل سفارش؛ False اگر سفارش در اختیار این ادمین نباشد"""
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
+            async with self._connection(tx) as conn:
+                # فقط ادمینی که سفارش را برداشته می‌تواند آن را تکمیل کند
+                user_id = await conn.fetchval("""
                     UPDATE orders 
                     SET vpn_config_text = $1, config_type = $2, 
                         processed_by = $3, status = 'completed',
+                        claimed_by = NULL, claim_expires_at = NULL,
                         updated_at = CURRENT_TIMESTAMP
-                    WHERE order_id = $4
+                    WHERE order_id = $4 AND status = 'processing' AND claimed_by = $3
+                    RETURNING user_id
                 """, config_text, config_type, processed_by, order_id)
+                if user_id is None:
+                    return False
+                self.profile_cache.invalidate(user_id)
                 return True
         except Exception as e:
+            if tx is not None:
+                raise
             logger.error(f"خطا در بروزرسانی کانفیگ سفارش: {e}")
             return False
     
-    async def get_order(self, order_id: int) -> Optional[Order]:
+    async def get_order(self, order_id: int, tx=None) -> Optional[Order]:
         """دریافت اطلاعات سفارش"""
         try:
-            async with self.pool.acquire() as conn:
-                row = await conn.fetchrow("SELECT * FROM orders WHERE order_id = $1", order_id)
-                return Order(**dict(row)) if row else None
+            async with self._connection(tx) as conn:
+                row = await conn.fetchrow(f"SELECT {Order.COLUMNS} FROM orders WHERE order_id = $1", order_id)
+                return Order(*row) if row else None
         except Exception as e:
+            if tx is not None:
+                raise
             logger.error(f"خطا در دریافت سفارش: {e}")
             return None
     
-    async def get_user_orders(self, user_id: int, limit: int = 10) -> List[Order]:
+    async def get_user_orders(self, user_id: int, limit: int = 10) -> List[OrderSummary]:
         """دریافت سفارشات کاربر"""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT * FROM orders 
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {OrderSummary.COLUMNS} FROM orders 
                     WHERE user_id = $1 
                     ORDER BY created_at DESC 
                     LIMIT $2
                 """, user_id, limit)
-                return [Order(**dict(row)) for row in rows]
+                return [OrderSummary(*row) for row in rows]
         except Exception as e:
             logger.error(f"خطا در دریافت سفارشات کاربر: {e}")
             return []
     
-    async def get_pending_orders(self) -> List[Order]:
-        """دریافت سفارشات در انتظار"""
+    async def get_pending_orders(self, limit: int = 100) -> List[OrderWithUser]:
+        """دریافت سفارشات در انتظار همراه با اطلاعات کاربر"""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("""
-                    SELECT o.*, u.username, u.first_name 
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {OrderWithUser.COLUMNS}
                     FROM orders o 
                     JOIN users u ON o.user_id = u.user_id 
                     WHERE o.status = 'waiting'
                     ORDER BY o.created_at DESC
-                """)
-                return [Order(**dict(row)) for row in rows]
+                    LIMIT $1
+                """, limit)
+                return [OrderWithUser(*row) for row in rows]
         except Exception as e:
             logger.error(f"خطا در دریافت سفارشات pending: {e}")
             return []
     
+    async def get_order_with_user(self, order_id: int) -> Optional[OrderWithUser]:
+        """دریافت سفارش همراه با اطلاعات کاربر"""
+        try:
+            async with self._acquire() as conn:
+                row = await conn.fetchrow(f"""
+                    SELECT {OrderWithUser.COLUMNS}
+                    FROM orders o
+                    JOIN users u ON o.user_id = u.user_id
+                    WHERE o.order_id = $1
+                """, order_id)
+                return OrderWithUser(*row) if row else None
+        except Exception as e:
+            logger.error(f"خطا در دریافت سفارش: {e}")
+            return None
+    
+    async def claim_order(self, order_id: int, admin_id: int, lease: float) -> Optional[OrderWithUser]:
+        """برداشتن اتمیک سفارش برای بررسی (یا تمدید lease همان ادمین)
+        
+        None یعنی سفارش در انتظار نیست یا ادمین دیگری lease معتبر آن را دارد.
+        """
+        try:
+            async with self._acquire() as conn:
+                row = await conn.fetchrow(f"""
+                    WITH claimed AS (
+                        UPDATE orders SET
+                            status = 'processing',
+                            claimed_by = $2,
+                            claim_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3),
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE order_id = $1
+                        AND (status = 'waiting' OR (status = 'processing'
+                             AND (claimed_by = $2 OR claim_expires_at < CURRENT_TIMESTAMP)))
+                        RETURNING *
+                    )
+                    SELECT {OrderWithUser.COLUMNS}
+                    FROM claimed o
+                    JOIN users u ON o.user_id = u.user_id
+                """, order_id, admin_id, lease)
+                return OrderWithUser(*row) if row else None
+        except Exception as e:
+            logger.error(f"خطا در برداشتن سفارش: {e}")
+            return None
+    
+    async def claim_next_order(self, admin_id: int, lease: float) -> Optional[OrderWithUser]:
+        """برداشتن قدیمی‌ترین سفارش در انتظار؛ ادمین‌های همزمان با SKIP LOCKED سفارش‌های متفاوت می‌گیرند"""
+        try:
+            async with self._acquire() as conn:
+                row = await conn.fetchrow(f"""
+                    WITH next AS (
+                        SELECT order_id FROM orders
+                        WHERE status = 'waiting'
+                        ORDER BY created_at, order_id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    ), claimed AS (
+                        UPDATE orders o SET
+                            status = 'processing',
+                            claimed_by = $1,
+                            claim_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $2),
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM next
+                        WHERE o.order_id = next.order_id
+                        RETURNING o.*
+                    )
+                    SELECT {OrderWithUser.COLUMNS}
+                    FROM claimed o
+                    JOIN users u ON o.user_id = u.user_id
+                """, admin_id, lease)
+                return OrderWithUser(*row) if row else None
+        except Exception as e:
+            logger.error(f"خطا در برداشتن سفارش بعدی: {e}")
+            return None
+    
+    async def release_order(self, order_id: int, admin_id: int) -> bool:
+        """برگرداندن سفارش برداشته‌شده به صف انتظار"""
+        try:
+            async with self._acquire() as conn:
+                result = await conn.execute("""
+                    UPDATE orders SET status = 'waiting', claimed_by = NULL, claim_expires_at = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE order_id = $1 AND status = 'processing' AND claimed_by = $2
+                """, order_id, admin_id)
+                return result != "UPDATE 0"
+        except Exception as e:
+            logger.error(f"خطا در آزاد کردن سفارش: {e}")
+            return False
+    
+    async def release_expired_claims(self) -> Optional[List[int]]:
+        """برگرداندن سفارش‌هایی که lease آن‌ها تمام شده به صف انتظار"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch("""
+                    UPDATE orders SET status = 'waiting', claimed_by = NULL, claim_expires_at = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'processing' AND claim_expires_at < CURRENT_TIMESTAMP
+                    RETURNING order_id
+                """)
+                return [row['order_id'] for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در آزادسازی سفارش‌های منقضی: {e}")
+            return None
+    
+    async def save_order_notifications(self, order_id: int, messages: List[Tuple[int, int]]) -> bool:
+        """ثبت پیام‌های اطلاع‌رسانی سفارش (admin_id، message_id) برای ویرایش‌های بعدی"""
+        try:
+            async with self._acquire() as conn:
+                await conn.execute("""
+                    INSERT INTO order_notifications (order_id, admin_id, message_id)
+                    SELECT $1, admin_id, message_id
+                    FROM unnest($2::bigint[], $3::bigint[]) AS t(admin_id, message_id)
+                    ON CONFLICT (order_id, admin_id) DO UPDATE SET message_id = EXCLUDED.message_id
+                """, order_id, [m[0] for m in messages], [m[1] for m in messages])
+            return True
+        except Exception as e:
+            logger.error(f"خطا در ثبت پیام‌های سفارش: {e}")
+            return False
+    
+    async def get_order_notifications(self, order_id: int) -> List[Tuple[int, int]]:
+        """پیام‌های اطلاع‌رسانی ارسال‌شده برای یک سفارش"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT admin_id, message_id FROM order_notifications WHERE order_id = $1", order_id
+                )
+                return [(row['admin_id'], row['message_id']) for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در دریافت پیام‌های سفارش: {e}")
+            return []
+    
+    async def get_orders_page(self, status: Optional[str], cursor: Optional[Tuple[datetime, int]] = None,
+                              direction: str = "next", limit: int = 10) -> Tuple[List[OrderSummary], bool]:
+        """یک صفحه از سفارشات (جدیدترین اول) با صفحه‌بندی keyset روی (created_at, order_id)
+        
+        direction=next صفحه قدیمی‌تر از cursor و direction=prev صفحه جدیدتر از آن را
+        برمی‌گرداند. مقدار دوم نشان می‌دهد در همان جهت صفحه دیگری وجود دارد یا نه.
+        """
+        conditions = []
+        args = []
+        if status is not None:
+            args.append(status)
+            conditions.append(f"status = ${len(args)}")
+        if cursor is not None:
+            args.extend(cursor)
+            op = "<" if direction == "next" else ">"
+            conditions.append(f"(created_at, order_id) {op} (${len(args) - 1}, ${len(args)})")
+        order = "DESC" if direction == "next" else "ASC"
+        args.append(limit + 1)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {OrderSummary.COLUMNS} FROM orders
+                    {where}
+                    ORDER BY created_at {order}, order_id {order}
+                    LIMIT ${len(args)}
+                """, *args)
+        except Exception as e:
+            logger.error(f"خطا در دریافت صفحه سفارشات: {e}")
+            return [], False
+        
+        has_more = len(rows) > limit
+        orders = [OrderSummary(*row) for row in rows[:limit]]
+        if direction != "next":
+            orders.reverse()
+        return orders, has_more
+    
+    async def apply_ledger_entry(self, user_id: int, amount: int, type: str, description: str,
+                                 order_id: Optional[int] = None, tx=None) -> Optional[Transaction]:
+        """ثبت تراکنش کیف پول و تغییر موجودی در یک دستور
+        
+        UPDATE شرطی روی ردیف کاربر (قفل همان یک ردیف) و INSERT در دفتر با موجودی
+        بعد از تراکنش در یک CTE اجرا می‌شوند. None یعنی موجودی کافی نیست یا کاربر
+        وجود ندارد؛ هیچ read-modify-write و رقابتی بین درخواست‌های همزمان نیست.
+        """
+        try:
+            async with self._connection(tx) as conn:
+                row = await conn.fetchrow(f"""
+                    WITH updated AS (
+                        UPDATE users SET balance = balance + $2, updated_at = CURRENT_TIMESTAMP
+                        WHERE user_id = $1 AND balance + $2 >= 0
+                        RETURNING user_id, balance
+                    )
+                    INSERT INTO transactions (user_id, amount, type, description, order_id, balance_after)
+                    SELECT user_id, $2, $3, $4, $5, balance FROM updated
+                    RETURNING {Transaction.COLUMNS}
+                """, user_id, amount, type, description, order_id)
+                if row is None:
+                    return None
+                self.profile_cache.invalidate(user_id)
+                return Transaction(*row)
+        except Exception as e:
+            if tx is not None:
+                raise
+            logger.error(f"خطا در ثبت تراکنش کیف پول: {e}")
+            return None
+    
+    async def purchase_with_balance(self, user_id: int, plan_type: str, amount: int,
+                                    description: str) -> Union[Tuple[int, int], bool, None]:
+        """خرید از کیف پول: کسر موجودی، ایجاد سفارش و ثبت در دفتر در یک دستور
+        
+        خروجی (order_id، موجودی جدید)؛ False اگر موجودی کافی نباشد و None در صورت خطا.
+        """
+        try:
+            async with self._acquire() as conn:
+                row = await conn.fetchrow("""
+                    WITH debited AS (
+                        UPDATE users SET balance = balance - $3, updated_at = CURRENT_TIMESTAMP
+                        WHERE user_id = $1 AND balance >= $3
+                        RETURNING user_id, balance
+                    ), new_order AS (
+                        INSERT INTO orders (user_id, plan_type, amount, status)
+                        SELECT user_id, $2, $3, 'waiting' FROM debited
+                        RETURNING order_id, user_id
+                    ), ledger AS (
+                        INSERT INTO transactions (user_id, amount, type, description, order_id, balance_after)
+                        SELECT d.user_id, -$3, 'purchase', $4, o.order_id, d.balance
+                        FROM debited d
+                        JOIN new_order o ON o.user_id = d.user_id
+                        RETURNING order_id, balance_after
+                    )
+                    SELECT order_id, balance_after FROM ledger
+                """, user_id, plan_type, amount, description)
+                if row is None:
+                    return False
+                self.profile_cache.invalidate(user_id)
+                return row['order_id'], row['balance_after']
+        except Exception as e:
+            logger.error(f"خطا در خرید از کیف پول: {e}")
+            return None
+    
+    async def get_wallet_history(self, user_id: int, limit: int = 10) -> List[Transaction]:
+        """آخرین تراکنش‌های کیف پول (موجودی هر ردیف در balance_after است، بدون SUM)"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {Transaction.COLUMNS} FROM transactions
+                    WHERE user_id = $1
+                    ORDER BY created_at DESC, transaction_id DESC
+                    LIMIT $2
+                """, user_id, limit)
+                return [Transaction(*row) for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در دریافت تراکنش‌ها: {e}")
+            return []
+    
+    async def snapshot_balances(self, lookback: Optional[float] = None) -> Optional[int]:
+        """ثبت آخرین موجودی کاربرانی که در lookback ثانیه اخیر تراکنش داشته‌اند (None: همه)
+        
+        تراکنش‌های هر کاربر به خاطر قفل ردیف او به ترتیب شماره commit می‌شوند، پس
+        آخرین ردیف هر کاربر موجودی نهایی اوست.
+        """
+        try:
+            async with self._acquire() as conn:
+                result = await conn.execute("""
+                    INSERT INTO balance_snapshots (user_id, transaction_id, balance)
+                    SELECT DISTINCT ON (t.user_id) t.user_id, t.transaction_id, t.balance_after
+                    FROM transactions t
+                    WHERE ($1::float8 IS NULL OR t.created_at >= CURRENT_TIMESTAMP - make_interval(secs => $1))
+                    AND t.balance_after IS NOT NULL
+                    ORDER BY t.user_id, t.transaction_id DESC
+                    ON CONFLICT (user_id) DO UPDATE SET
+                    transaction_id = EXCLUDED.transaction_id,
+                    balance = EXCLUDED.balance,
+                    taken_at = CURRENT_TIMESTAMP
+                    WHERE balance_snapshots.transaction_id < EXCLUDED.transaction_id
+                """, lookback)
+                return int(result.split()[-1])
+        except Exception as e:
+            logger.error(f"خطا در ثبت snapshot موجودی‌ها: {e}")
+            return None
+    
+    async def reconcile_balances(self, limit: int = 100) -> Optional[List[Tuple[int, int, int]]]:
+        """کاربرانی که موجودی آن‌ها با snapshot به علاوه تراکنش‌های بعد از آن نمی‌خواند
+        
+        خروجی (user_id، موجودی users، موجودی مورد انتظار از دفتر)؛ یک دستور و یک
+        snapshot از دیتابیس، پس تراکنش‌های همزمان اختلاف کاذب ایجاد نمی‌کنند.
+        """
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT s.user_id, u.balance, s.balance + COALESCE(SUM(t.amount), 0) AS expected
+                    FROM balance_snapshots s
+                    JOIN users u ON u.user_id = s.user_id
+                    LEFT JOIN transactions t ON t.user_id = s.user_id AND t.transaction_id > s.transaction_id
+                    GROUP BY s.user_id, s.balance, u.balance
+                    HAVING u.balance <> s.balance + COALESCE(SUM(t.amount), 0)
+                    ORDER BY s.user_id
+                    LIMIT $1
+                """, limit)
+                return [(row['user_id'], row['balance'], row['expected']) for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در تطبیق موجودی‌ها: {e}")
+            return None
+    
+    async def get_stats(self) -> Optional[Stats]:
+        """دریافت آمار از شمارنده‌های تجمیعی (بدون اسکن جداول)"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch("SELECT key, value FROM stats_counters")
+        except Exception as e:
+            logger.error(f"خطا در دریافت آمار: {e}")
+            return None
+        
+        stats = Stats()
+        for row in rows:
+            key, value = row['key'], row['value']
+            if key == 'users_total':
+                stats.total_users = value
+            elif key == 'orders_waiting':
+                stats.pending_orders = value
+            elif key.startswith('completed:'):
+                stats.completed_by_plan[key[len('completed:'):]] = value
+            elif key.startswith('revenue:'):
+                stats.revenue_by_plan[key[len('revenue:'):]] = value
+        return stats
+    
     async def get_all_users(self) -> List[User]:
         """دریافت تمام کاربران"""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("SELECT * FROM users ORDER BY created_at DESC")
-                return [User(**dict(row)) for row in rows]
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"SELECT {User.COLUMNS} FROM users ORDER BY created_at DESC")
+                return [User(*row) for row in rows]
         except Exception as e:
             logger.error(f"خطا در دریافت کاربران: {e}")
             return []
     
+    async def export_table_csv(self, table: str, output: Callable[[bytes], Awaitable[None]]):
+        """خروجی CSV یک جدول به صورت جریانی با COPY ... TO STDOUT
+        
+        output برای هر قطعه داده صدا زده می‌شود؛ خطاها بالا داده می‌شوند.
+        """
+        columns, order_by = EXPORT_TABLES[table]
+        async with self._acquire() as conn:
+            await conn.copy_from_query(
+                f"SELECT {columns} FROM {table} ORDER BY {order_by}",
+                output=output, format='csv', header=True
+            )
+    
+    async def export_table_jsonl(self, table: str, output: Callable[[bytes], Awaitable[None]],
+                                 batch_size: int = 1000):
+        """خروجی JSONL یک جدول با server-side cursor (حافظه ثابت)"""
+        columns, order_by = EXPORT_TABLES[table]
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                lines = []
+                async for row in conn.cursor(
+                    f"SELECT row_to_json(t)::text FROM (SELECT {columns} FROM {table} ORDER BY {order_by}) t",
+                    prefetch=batch_size
+                ):
+                    lines.append(row[0])
+                    if len(lines) >= batch_size:
+                        await output(("\n".join(lines) + "\n").encode())
+                        lines = []
+                if lines:
+                    await output(("\n".join(lines) + "\n").encode())
+    
+    async def load_state(self, scope: str, entity_id: int) -> Optional[Dict]:
+        """خواندن وضعیت ذخیره‌شده کاربر/چت؛ {} اگر وجود نداشته باشد و None در صورت خطا"""
+        try:
+            async with self._acquire() as conn:
+                data = await conn.fetchval(
+                    "SELECT data FROM bot_state WHERE scope = $1 AND entity_id = $2",
+                    scope, entity_id
+                )
+                return data if data is not None else {}
+        except Exception as e:
+            logger.error(f"خطا در خواندن وضعیت {scope} {entity_id}: {e}")
+            return None
+    
+    async def save_states(self, upserts: List[Tuple[str, int, str]], deletes: List[Tuple[str, int]]) -> bool:
+        """upsert دسته‌ای وضعیت‌ها (JSON متنی) و حذف وضعیت‌های خالی در یک تراکنش"""
+        try:
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    if upserts:
+                        await conn.execute("""
+                            INSERT INTO bot_state (scope, entity_id, data, updated_at)
+                            SELECT scope, entity_id, data::jsonb, CURRENT_TIMESTAMP
+                            FROM unnest($1::varchar[], $2::bigint[], $3::text[]) AS t(scope, entity_id, data)
+                            ON CONFLICT (scope, entity_id) DO UPDATE SET
+                            data = EXCLUDED.data,
+                            updated_at = EXCLUDED.updated_at
+                        """, [u[0] for u in upserts], [u[1] for u in upserts], [u[2] for u in upserts])
+                    if deletes:
+                        await conn.execute("""
+                            DELETE FROM bot_state
+                            WHERE (scope, entity_id) IN (
+                                SELECT * FROM unnest($1::varchar[], $2::bigint[])
+                            )
+                        """, [d[0] for d in deletes], [d[1] for d in deletes])
+            return True
+        except Exception as e:
+            logger.error(f"خطا در ذخیره وضعیت‌ها: {e}")
+            return False
+    
+    async def enqueue_updates(self, updates: List[Tuple[int, Optional[int], str]]) -> bool:
+        """ثبت آپدیت‌های خام (update_id، کلید پارتیشن، JSON متنی) در صف مشترک
+        
+        update_id کلید اصلی است، پس آپدیت تکراری (تحویل مجدد webhook یا poller
+        جدید بعد از تعویض leader) نادیده گرفته می‌شود.
+        """
+        try:
+            async with self._acquire() as conn:
+                await conn.execute("""
+                    INSERT INTO update_queue (update_id, partition_key, payload)
+                    SELECT update_id, partition_key, payload::jsonb
+                    FROM unnest($1::bigint[], $2::bigint[], $3::text[]) AS t(update_id, partition_key, payload)
+                    ON CONFLICT (update_id) DO NOTHING
+                """, [u[0] for u in updates], [u[1] for u in updates], [u[2] for u in updates])
+            return True
+        except Exception as e:
+            logger.error(f"خطا در ثبت آپدیت‌ها در صف: {e}")
+            return False
+    
+    async def claim_updates(self, worker_id: str, limit: int, lease: float,
+                            max_attempts: int) -> Optional[List[Tuple[int, Dict]]]:
+        """برداشتن آپدیت‌های آماده با SKIP LOCKED
+        
+        فقط قدیمی‌ترین آپدیت پردازش‌نشده هر کاربر قابل برداشتن است، پس آپدیت‌های
+        یک کاربر در کل خوشه یکی‌یکی و به ترتیب پردازش می‌شوند.
+        """
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch("""
+                    WITH claimable AS (
+                        SELECT q.update_id FROM update_queue q
+                        WHERE q.processed_at IS NULL
+                        AND (q.locked_until IS NULL OR q.locked_until < CURRENT_TIMESTAMP)
+                        AND q.attempts < $4
+                        AND NOT EXISTS (
+                            SELECT 1 FROM update_queue prev
+                            WHERE prev.partition_key = q.partition_key
+                            AND prev.update_id < q.update_id
+                            AND prev.processed_at IS NULL
+                        )
+                        ORDER BY q.update_id
+                        LIMIT $2
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE update_queue q SET
+                        locked_by = $1,
+                        locked_until = CURRENT_TIMESTAMP + make_interval(secs => $3),
+                        attempts = q.attempts + 1
+                    FROM claimable c
+                    WHERE q.update_id = c.update_id
+                    RETURNING q.update_id, q.payload
+                """, worker_id, limit, lease, max_attempts)
+                return [(row['update_id'], row['payload']) for row in sorted(rows, key=lambda r: r['update_id'])]
+        except Exception as e:
+            logger.error(f"خطا در برداشتن آپدیت‌ها از صف: {e}")
+            return None
+    
+    async def ack_update(self, update_id: int, worker_id: str) -> bool:
+        """علامت‌گذاری آپدیت به عنوان پردازش‌شده (اگر lease هنوز متعلق به این worker باشد)"""
+        try:
+            async with self._acquire() as conn:
+                result = await conn.execute("""
+                    UPDATE update_queue SET processed_at = CURRENT_TIMESTAMP, locked_by = NULL, locked_until = NULL
+                    WHERE update_id = $1 AND locked_by = $2 AND processed_at IS NULL
+                """, update_id, worker_id)
+                return result != "UPDATE 0"
+        except Exception as e:
+            logger.error(f"خطا در تایید آپدیت {update_id}: {e}")
+            return False
+    
+    async def reap_update_queue(self, max_attempts: int, retention: float) -> Optional[Tuple[int, int]]:
+        """انتقال آپدیت‌های شکست‌خورده به update_queue_dead و حذف آپدیت‌های پردازش‌شده قدیمی
+        
+        آپدیت‌هایی که lease آن‌ها منقضی شده ولی هنوز تلاش باقی دارند نیازی به کاری
+        ندارند؛ claim_updates آن‌ها را دوباره برمی‌دارد.
+        """
+        try:
+            async with self._acquire() as conn:
+                dead = await conn.fetchval("""
+                    WITH dead AS (
+                        DELETE FROM update_queue
+                        WHERE processed_at IS NULL AND attempts >= $1 AND locked_until < CURRENT_TIMESTAMP
+                        RETURNING update_id, partition_key, payload, attempts, received_at
+                    ), moved AS (
+                        INSERT INTO update_queue_dead (update_id, partition_key, payload, attempts, received_at)
+                        SELECT update_id, partition_key, payload, attempts, received_at FROM dead
+                        ON CONFLICT (update_id) DO NOTHING
+                        RETURNING 1
+                    )
+                    SELECT COUNT(*) FROM moved
+                """, max_attempts)
+                purged = await conn.execute("""
+                    DELETE FROM update_queue
+                    WHERE processed_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+                """, retention)
+                return dead, int(purged.split()[-1])
+        except Exception as e:
+            logger.error(f"خطا در نگهداری صف آپدیت‌ها: {e}")
+            return None
+    
+    async def update_queue_depth(self) -> Optional[int]:
+        """تعداد آپدیت‌های پردازش‌نشده صف مشترک"""
+        try:
+            async with self._acquire() as conn:
+                return await conn.fetchval("SELECT COUNT(*) FROM update_queue WHERE processed_at IS NULL")
+        except Exception as e:
+            logger.error(f"خطا در دریافت عمق صف: {e}")
+            return None
+    
+    async def create_broadcast(self, admin_id: int, message_text: str) -> Optional[int]:
+        """ایجاد پیام گروهی جدید"""
+        try:
+            async with self._acquire() as conn:
+                return await conn.fetchval("""
+                    INSERT INTO broadcasts (admin_id, message_text, total_count)
+                    VALUES ($1, $2, COALESCE((SELECT value FROM stats_counters WHERE key = 'users_total'), 0))
+                    RETURNING broadcast_id
+                """, admin_id, message_text)
+        except Exception as e:
+            logger.error(f"خطا در ایجاد پیام گروهی: {e}")
+            return None
+    
+    async def get_broadcast(self, broadcast_id: int) -> Optional[Broadcast]:
+        """دریافت اطلاعات پیام گروهی"""
+        try:
+            async with self._acquire() as conn:
+                row = await conn.fetchrow(f"SELECT {Broadcast.COLUMNS} FROM broadcasts WHERE broadcast_id = $1", broadcast_id)
+                return Broadcast(*row) if row else None
+        except Exception as e:
+            logger.error(f"خطا در دریافت پیام گروهی: {e}")
+            return None
+    
+    async def get_running_broadcasts(self) -> List[Broadcast]:
+        """پیام‌های گروهی نیمه‌کاره (برای ادامه بعد از ری‌استارت)"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"SELECT {Broadcast.COLUMNS} FROM broadcasts WHERE status = 'running' ORDER BY broadcast_id")
+                return [Broadcast(*row) for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در دریافت پیام‌های گروهی: {e}")
+            return []
+    
+    async def set_broadcast_progress_message(self, broadcast_id: int, chat_id: int, message_id: int) -> bool:
+        """ذخیره پیام گزارش پیشرفت"""
+        try:
+            async with self._acquire() as conn:
+                await conn.execute("""
+                    UPDATE broadcasts SET progress_chat_id = $2, progress_message_id = $3
+                    WHERE broadcast_id = $1
+                """, broadcast_id, chat_id, message_id)
+                return True
+        except Exception as e:
+            logger.error(f"خطا در ذخیره پیام پیشرفت: {e}")
+            return False
+    
+    async def notify_broadcast_started(self, broadcast_id: int) -> bool:
+        """اطلاع به رهبر برای شروع ارسال پیام گروهی"""
+        try:
+            async with self._acquire() as conn:
+                await conn.execute("SELECT pg_notify($1, $2)", BROADCASTS_CHANNEL, str(broadcast_id))
+                return True
+        except Exception as e:
+            logger.error(f"خطا در اعلان پیام گروهی: {e}")
+            return False
+    
+    async def claim_broadcast_batch(self, broadcast_id: int, batch_size: int) -> Optional[List[int]]:
+        """رزرو دسته بعدی گیرندگان با صفحه‌بندی keyset روی user_id
+        
+        گیرندگان با وضعیت pending ثبت و cursor جلو برده می‌شود، همه در یک دستور؛
+        اگر پیام گروهی دیگر running نباشد لیست خالی برمی‌گردد.
+        """
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch("""
+                    WITH b AS (
+                        SELECT last_user_id FROM broadcasts
+                        WHERE broadcast_id = $1 AND status = 'running'
+                        FOR UPDATE
+                    ), batch AS (
+                        SELECT u.user_id FROM users u, b
+                        WHERE u.user_id > b.last_user_id AND u.is_active
+                        ORDER BY u.user_id
+                        LIMIT $2
+                    ), ins AS (
+                        INSERT INTO broadcast_deliveries (broadcast_id, user_id)
+                        SELECT $1, user_id FROM batch
+                        ON CONFLICT DO NOTHING
+                    ), cursor_update AS (
+                        UPDATE broadcasts SET last_user_id = (SELECT MAX(user_id) FROM batch)
+                        WHERE broadcast_id = $1 AND EXISTS (SELECT 1 FROM batch)
+                    )
+                    SELECT user_id FROM batch ORDER BY user_id
+                """, broadcast_id, batch_size)
+                return [row['user_id'] for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در رزرو گیرندگان پیام گروهی: {e}")
+            return None
+    
+    async def get_pending_broadcast_deliveries(self, broadcast_id: int) -> List[int]:
+        """گیرندگانی که رزرو شده‌اند ولی نتیجه ارسالشان ثبت نشده"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch("""
+                    SELECT user_id FROM broadcast_deliveries
+                    WHERE broadcast_id = $1 AND status = 'pending'
+                    ORDER BY user_id
+                """, broadcast_id)
+                return [row['user_id'] for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در دریافت گیرندگان pending: {e}")
+            return []
+    
+    async def record_broadcast_deliveries(self, broadcast_id: int,
+                                          results: List[Tuple[int, str, Optional[str]]]) -> bool:
+        """ثبت نتیجه ارسال یک دسته و غیرفعال کردن کاربرانی که ربات را بلاک کرده‌اند"""
+        sent = sum(1 for _, status, _ in results if status == 'sent')
+        blocked = [user_id for user_id, status, _ in results if status == 'blocked']
+        failed = len(results) - sent - len(blocked)
+        try:
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany("""
+                        UPDATE broadcast_deliveries
+                        SET status = $3, error = $4, updated_at = CURRENT_TIMESTAMP
+                        WHERE broadcast_id = $1 AND user_id = $2
+                    """, [(broadcast_id, user_id, status, error) for user_id, status, error in results])
+                    await conn.execute("""
+                        UPDATE broadcasts
+                        SET sent_count = sent_count + $2, failed_count = failed_count + $3,
+                            blocked_count = blocked_count + $4
+                        WHERE broadcast_id = $1
+                    """, broadcast_id, sent, failed, len(blocked))
+                    if blocked:
+                        await conn.execute("""
+                            UPDATE users SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
+                            WHERE user_id = ANY($1::bigint[])
+                        """, blocked)
+                        # fingerprint این کاربران در UserWriteBehind همه نمونه‌ها حذف می‌شود
+                        for i in range(0, len(blocked), DEACTIVATED_NOTIFY_CHUNK):
+                            await conn.execute(
+                                "SELECT pg_notify($1, $2)", UserWriteBehind.CHANNEL,
+                                ",".join(map(str, blocked[i:i + DEACTIVATED_NOTIFY_CHUNK]))
+                            )
+                return True
+        except Exception as e:
+            logger.error(f"خطا در ثبت نتیجه پیام گروهی: {e}")
+            return False
+    
+    async def finish_broadcast(self, broadcast_id: int, status: str) -> bool:
+        """پایان پیام گروهی (completed یا cancelled)"""
+        try:
+            async with self._acquire() as conn:
+                result = await conn.execute("""
+                    UPDATE broadcasts SET status = $2, finished_at = CURRENT_TIMESTAMP
+                    WHERE broadcast_id = $1 AND status = 'running'
+                """, broadcast_id, status)
+                return result != "UPDATE 0"
+        except Exception as e:
+            logger.error(f"خطا در پایان پیام گروهی: {e}")
+            return False
+    
+    async def get_plans(self, include_inactive: bool = False) -> Optional[List[Plan]]:
+        """دریافت پلن‌ها به ترتیب نمایش"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {Plan.COLUMNS} FROM plans
+                    WHERE is_active OR $1
+                    ORDER BY sort_order, price, plan_id
+                """, include_inactive)
+                return [Plan(*row) for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در دریافت پلن‌ها: {e}")
+            return None
+    
+    async def seed_plans(self, plans: List[Plan]) -> bool:
+        """پر کردن جدول پلن‌ها فقط در صورت خالی بودن (اولین اجرا)"""
+        try:
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    result = await conn.execute("""
+                        INSERT INTO plans (plan_id, name, price, duration, sort_order)
+                        SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::int[], $4::int[], $5::int[])
+                        WHERE NOT EXISTS (SELECT 1 FROM plans)
+                        ON CONFLICT (plan_id) DO NOTHING
+                    """,
+                        [plan.plan_id for plan in plans],
+                        [plan.name for plan in plans],
+                        [plan.price for plan in plans],
+                        [plan.duration for plan in plans],
+                        [plan.sort_order for plan in plans]
+                    )
+                    if result != "INSERT 0 0":
+                        await conn.execute("SELECT pg_notify($1, $2)", PLANS_CHANNEL, "seed")
+                return True
+        except Exception as e:
+            logger.error(f"خطا در مقداردهی اولیه پلن‌ها: {e}")
+            return False
+    
+    async def save_plan(self, plan: Plan) -> bool:
+        """افزودن یا ویرایش پلن و اعلان به سایر نمونه‌ها"""
+        try:
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        INSERT INTO plans (plan_id, name, price, duration, sort_order)
+                        VALUES ($1, $2, $3, $4, $5)
+                        ON CONFLICT (plan_id) DO UPDATE SET
+                        name = EXCLUDED.name,
+                        price = EXCLUDED.price,
+                        duration = EXCLUDED.duration,
+                        is_active = TRUE,
+                        updated_at = CURRENT_TIMESTAMP
+                    """, plan.plan_id, plan.name, plan.price, plan.duration, plan.sort_order)
+                    await conn.execute("SELECT pg_notify($1, $2)", PLANS_CHANNEL, plan.plan_id)
+                return True
+        except Exception as e:
+            logger.error(f"خطا در ذخیره پلن: {e}")
+            return False
+    
+    async def set_plan_active(self, plan_id: str, is_active: bool) -> bool:
+        """فعال/غیرفعال کردن پلن؛ سفارشات قبلی دست نمی‌خورند"""
+        try:
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    result = await conn.execute("""
+                        UPDATE plans SET is_active = $2, updated_at = CURRENT_TIMESTAMP
+                        WHERE plan_id = $1 AND is_active IS DISTINCT FROM $2
+                    """, plan_id, is_active)
+                    if result == "UPDATE 0":
+                        return False
+                    await conn.execute("SELECT pg_notify($1, $2)", PLANS_CHANNEL, plan_id)
+                return True
+        except Exception as e:
+            logger.error(f"خطا در تغییر وضعیت پلن: {e}")
+            return False
+    
     async def add_admin(self, admin: Admin) -> bool:
         """افزودن ادمین جدید"""
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO admins (admin_id, username, first_name, level, created_by)
-                    VALUES ($1, $2, $3, $4, $5)
-                    ON CONFLICT (admin_id) DO UPDATE SET
-                    username = EXCLUDED.username,
-                    first_name = EXCLUDED.first_name,
-                    level = EXCLUDED.level,
-                    is_active = TRUE
-                """, admin.admin_id, admin.username, admin.first_name, admin.level, admin.created_by)
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        INSERT INTO admins (admin_id, username, first_name, level, created_by)
+                        VALUES ($1, $2, $3, $4, $5)
+                        ON CONFLICT (admin_id) DO UPDATE SET
+                        username = EXCLUDED.username,
+                        first_name = EXCLUDED.first_name,
+                        level = EXCLUDED.level,
+                        is_active = TRUE
+                    """, admin.admin_id, admin.username, admin.first_name, admin.level, admin.created_by)
+                    await self._notify_admins_changed(conn, admin.admin_id)
                 return True
         except Exception as e:
             logger.error(f"خطا در افزودن ادمین: {e}")
             return False
+        finally:
+            self.admin_cache.invalidate()
+    
+    async def _notify_admins_changed(self, conn, admin_id: int):
+        """اعلان تغییر ادمین به سایر نمونه‌ها (بعد از commit تحویل داده می‌شود)"""
+        await conn.execute("SELECT pg_notify($1, $2)", AdminCache.CHANNEL, str(admin_id))
     
     async def get_admin(self, admin_id: int) -> Optional[Admin]:
-        """دریافت اطلاعات ادمین"""
+        """دریافت اطلاعات ادمین (از کش)"""
         try:
-            async with self.pool.acquire() as conn:
-                row = await conn.fetchrow("SELECT * FROM admins WHERE admin_id = $1", admin_id)
-                return Admin(**dict(row)) if row else None
+            return await self.admin_cache.get(admin_id)
         except Exception as e:
             logger.error(f"خطا در دریافت ادمین: {e}")
             return None
     
-    async def get_all_admins(self) -> List[Admin]:
-        """دریافت تمام ادمین‌ها"""
+    async def get_all_admins(self) -> Optional[List[Admin]]:
+        """دریافت تمام ادمین‌ها؛ None در صورت خطا (متفاوت با نبودن ادمین)"""
         try:
-            async with self.pool.acquire() as conn:
-                rows = await conn.fetch("SELECT * FROM admins ORDER BY created_at DESC")
-                return [Admin(**dict(row)) for row in rows]
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"SELECT {Admin.COLUMNS} FROM admins ORDER BY created_at DESC")
+                return [Admin(*row) for row in rows]
         except Exception as e:
             logger.error(f"خطا در دریافت ادمین‌ها: {e}")
+            return None
+    
+    async def log_admin_action(self, admin_id: int, action: str, target_id: Optional[int], details: str, tx=None):
+        """ثبت لاگ فعالیت ادمین
+        
+        بدون tx رویداد فقط در صف writer قرار می‌گیرد؛ با tx در همان تراکنش نوشته
+        می‌شود تا همراه عملیات اصلی commit یا rollback شود.
+        """
+        if tx is None:
+            self.audit_writer.submit(admin_id, action, target_id, details)
+            return
+        await tx.execute("""
+            INSERT INTO logs (user_id, action, target_id, details)
+            VALUES ($1, $2, $3, $4)
+        """, admin_id, action, target_id, details)
+    
+    async def copy_logs(self, records: List[AuditRecord]) -> bool:
+        """نوشتن دسته‌ای لاگ‌ها با COPY؛ created_at از ساعت دیتابیس منهای سن هر رویداد"""
+        try:
+            async with self._acquire() as conn:
+                db_now = await conn.fetchval("SELECT LOCALTIMESTAMP")
+                now = time.monotonic()
+                await conn.copy_records_to_table(
+                    'logs',
+                    records=[
+                        (user_id, action, target_id, details, db_now - timedelta(seconds=now - queued_at))
+                        for user_id, action, target_id, details, queued_at in records
+                    ],
+                    columns=['user_id', 'action', 'target_id', 'details', 'created_at']
+                )
+            return True
+        except Exception as e:
+            logger.error(f"خطا در نوشتن لاگ‌ها: {e}")
+            return False
+    
+    async def get_audit_trail(self, target_id: int, actions: Optional[List[str]] = None,
+                              limit: int = 20) -> List[LogEntry]:
+        """آخرین فعالیت‌های ثبت‌شده روی یک هدف (مثلا یک سفارش)"""
+        try:
+            async with self._acquire() as conn:
+                rows = await conn.fetch(f"""
+                    SELECT {LogEntry.COLUMNS} FROM logs
+                    WHERE target_id = $1 AND ($2::varchar[] IS NULL OR action = ANY($2::varchar[]))
+                    ORDER BY created_at DESC
+                    LIMIT $3
+                """, target_id, actions, limit)
+                return [LogEntry(*row) for row in rows]
+        except Exception as e:
+            logger.error(f"خطا در دریافت تاریخچه فعالیت‌ها: {e}")
             return []
     
-    async def log_admin_action(self, admin_id: int, action: str, target_id: int, details: str):
-        """ثبت لاگ فعالیت ادمین"""
+    async def maintain_log_partitions(self, months_ahead: int,
+                                      retention_months: int) -> Optional[Tuple[List[str], List[str]]]:
+        """ساخت پارتیشن‌های ماهانه آینده و حذف پارتیشن‌های قدیمی‌تر از دوره نگهداری"""
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO logs (user_id, action, details)
-                    VALUES ($1, $2, $3)
-                """, admin_id, action, details)
+            async with self._acquire() as conn:
+                month = await conn.fetchval("SELECT date_trunc('month', LOCALTIMESTAMP)")
+                partitions = []
+                for row in await conn.fetch("""
+                    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+                    FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'logs'::regclass
+                """):
+                    match = LOG_PARTITION_BOUNDS.search(row['bound'])
+                    if match:
+                        partitions.append((
+                            row['relname'],
+                            _parse_partition_bound(match.group(1)) or datetime.min,
+                            _parse_partition_bound(match.group(2)) or datetime.max
+                        ))
+                
+                created = []
+                for offset in range(months_ahead + 1):
+                    start, end = _add_months(month, offset), _add_months(month, offset + 1)
+                    if any(lower < end and start < upper for _, lower, upper in partitions):
+                        continue
+                    name = f"logs_y{start:%Y}m{start:%m}"
+                    try:
+                        await conn.execute(f"""
+                            CREATE TABLE IF NOT EXISTS {name} PARTITION OF logs
+                            FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')
+                        """)
+                        created.append(name)
+                    except Exception as e:
+                        # معمولا یعنی ردیف‌هایی از این بازه در logs_default نوشته شده‌اند
+                        logger.error(f"خطا در ساخت پارتیشن {name}: {e}")
+                
+                dropped = []
+                cutoff = _add_months(month, -retention_months)
+                for name, _, upper in partitions:
+                    if upper <= cutoff:
+                        await conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+                        dropped.append(name)
+                return created, dropped
         except Exception as e:
-            logger.error(f"خطا در ثبت لاگ: {e}")
+            logger.error(f"خطا در نگهداری پارتیشن‌های لاگ: {e}")
+            return None
+
+# عملیات‌هایی که کوئری اجرا نمی‌کنند یا از کش/صف حافظه پاسخ می‌دهند زمان‌سنجی نمی‌شوند
+UNTIMED_OPERATIONS = frozenset({
+    'connect', 'close', 'open_connection', 'add_listener', 'init_db',
+    'get_profile_summary', 'get_admin', 'log_admin_action'
+})
+
+def _timed_operation(name: str, func):
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        # کوئری‌های داخل عملیات با نام آن در profiler ثبت می‌شوند
+        token = current_operation.set(name)
+        start = time.perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        except Exception:
+            # اکثر متدها خطا را لاگ و None برمی‌گردانند؛ اینجا فقط خطاهای بالا رفته (حالت tx) شمرده می‌شوند
+            self.operation_errors.inc(name)
+            raise
+        finally:
+            self.operation_duration.labels(name).observe(time.perf_counter() - start)
+            current_operation.reset(token)
+    return wrapper
+
+# زمان‌سنجی همه متدهای عمومی async، تا عملیات جدید بدون تغییر اضافه پوشش داده شود
+for _name, _func in list(vars(DatabaseRepository).items()):
+    if not _name.startswith('_') and _name not in UNTIMED_OPERATIONS and inspect.iscoroutinefunction(_func):
+        setattr(DatabaseRepository, _name, _timed_operation(_name, _func))
+del _name, _func
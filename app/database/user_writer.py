@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+Fingerprint = Tuple[Optional[str], str, Optional[str]]
+
+class UserWriteBehind:
+    """لایه write-behind برای ثبت پروفایل کاربران
+    
+    پروفایل‌هایی که نسبت به آخرین نسخه نوشته‌شده تغییری نکرده‌اند نادیده گرفته
+    می‌شوند و بقیه به صورت دسته‌ای (بر اساس زمان یا اندازه) در دیتابیس upsert می‌شوند.
+    """
+
+    # کاربرانی که ربات را بلاک کرده‌اند (غیرفعال شده در پیام گروهی)؛ payload شناسه‌ها با ویرگول
+    CHANNEL = "users_deactivated"
+
+    def __init__(self, db, batch_size: int = 500, flush_interval: float = 5, cache_size: int = 100_000):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self._fingerprints: "OrderedDict[int, Fingerprint]" = OrderedDict()
+        self._pending: Dict[int, User] = {}
+        # دسته‌ای که flush در حال نوشتن آن است
+        self._writing: Dict[int, User] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """شروع flush دوره‌ای در پس‌زمینه"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def subscribe(self):
+        """گوش دادن به غیرفعال شدن کاربران تا /start بعدی آن‌ها دوباره نوشته شود"""
+        await self.db.add_listener(self.CHANNEL, self._on_notify)
+
+    def _on_notify(self, payload: Optional[str]):
+        # بعد از قطع اتصال listener ممکن است اعلانی از دست رفته باشد
+        if payload is None:
+            self._fingerprints.clear()
+            return
+        for user_id in payload.split(','):
+            try:
+                self._fingerprints.pop(int(user_id), None)
+            except ValueError:
+                logger.debug(f"Ignoring deactivation notify payload: {payload!r}")
+
+    async def stop(self):
+        """توقف و flush نهایی صف"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def submit(self, user: User):
+        """ثبت پروفایل کاربر؛ فقط در صورت تغییر در صف نوشتن قرار می‌گیرد"""
+        fingerprint = (user.username, user.first_name, user.last_name)
+        if user.user_id not in self._pending and self._fingerprints.get(user.user_id) == fingerprint:
+            self._fingerprints.move_to_end(user.user_id)
+            return
+        
+        self._pending[user.user_id] = user
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush_user(self, user_id: int):
+        """اطمینان از نوشته شدن کاربر قبل از عملیاتی که به ردیف او نیاز دارد"""
+        if user_id in self._writing:
+            # flush همزمان کاربر را برداشته ولی هنوز commit نشده؛ منتظر پایان آن می‌مانیم
+            async with self._flush_lock:
+                pass
+        # در صورت خطای flush قبلی، کاربر دوباره در صف است
+        if user_id in self._pending:
+            await self.flush()
+
+    async def flush(self):
+        """نوشتن تمام پروفایل‌های در صف با یک دستور"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._writing = batch
+            try:
+                written = await self.db.upsert_users(list(batch.values()))
+            finally:
+                self._writing = {}
+            
+            if not written:
+                # برگرداندن به صف بدون بازنویسی نسخه‌های جدیدتر
+                for user_id, user in batch.items():
+                    self._pending.setdefault(user_id, user)
+                return
+            
+            for user_id, user in batch.items():
+                self._fingerprints[user_id] = (user.username, user.first_name, user.last_name)
+                self._fingerprints.move_to_end(user_id)
+            while len(self._fingerprints) > self.cache_size:
+                self._fingerprints.popitem(last=False)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"خطا در flush کاربران: {e}")
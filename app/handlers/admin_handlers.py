@@ -1,38 +1,55 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
+from telegram.helpers import escape_markdown
 import logging
 from app.database.repository import DatabaseRepository
+from app.database.models import Stats
 from app.config import config
-from app.utils.keyboards import get_admin_menu, get_order_actions_keyboard
+from app.services.order_review import OrderReviewService
+from app.services.plan_catalog import PlanCatalog
+from app.utils.keyboards import (
+    get_admin_menu, get_order_actions_keyboard, get_order_browser_keyboard, ORDER_STATUS_FILTERS
+)
+from app.utils.pagination import order_page_callback, parse_order_page_callback
+from app.handlers.text_router import set_awaiting, get_awaiting_data, clear_awaiting
 
 logger = logging.getLogger(__name__)
 
+# اقداماتی که target_id آن‌ها شماره سفارش است
+ORDER_AUDIT_ACTIONS = ['claim_order', 'release_order', 'send_text_config']
+
+ORDER_STATUS_ICONS = {
+    'pending': '🕓',
+    'waiting': '⏳',
+    'processing': '🔒',
+    'completed': '✅'
+}
+
 class AdminHandlers:
-    def __init__(self, db: DatabaseRepository):
+    def __init__(self, db: DatabaseRepository, catalog: PlanCatalog, review: OrderReviewService):
         self.db = db
+        self.catalog = catalog
+        self.review = review
     
     async def admin_panel(self, update: Update, context: CallbackContext):
         """پنل مدیریت"""
         user = update.effective_user
         
         # بررسی دسترسی ادمین
-        if user.id not in config.ADMIN_IDS:
-            admin = await self.db.get_admin(user.id)
-            if not admin or not admin.is_active:
-                await update.message.reply_text("⛔ دسترسی denied!")
-                return
+        if not await self.db.admin_cache.is_admin(user.id):
+            await update.message.reply_text("⛔ دسترسی denied!")
+            return
         
         # دریافت آمار
-        pending_orders = await self.db.get_pending_orders()
-        all_users = await self.db.get_all_users()
+        stats = await self.db.get_stats() or Stats()
         
         stats_text = f"""
 🛠️ **پنل مدیریت**
 
 📊 آمار سریع:
-👥 کاربران کل: {len(all_users)}
-📦 سفارشات در انتظار: {len(pending_orders)}
-💰 پلن‌های فعال: {len(config.PLANS)}
+👥 کاربران کل: {stats.total_users:,}
+📦 سفارشات در انتظار: {stats.pending_orders:,}
+💰 پلن‌های فعال: {len(self.catalog.snapshot.plans)}
 
 لطفا یکی از گزینه‌ها را انتخاب کنید:
 """
@@ -42,25 +59,69 @@ class AdminHandlers:
             parse_mode='Markdown'
         )
     
+    async def show_stats(self, update: Update, context: CallbackContext):
+        """آمار و گزارش‌ها"""
+        query = update.callback_query
+        await query.answer()
+        
+        if not await self.db.admin_cache.is_admin(query.from_user.id):
+            await query.edit_message_text("⛔ دسترسی denied!")
+            return
+        
+        stats = await self.db.get_stats() or Stats()
+        
+        text = f"""
+📊 **آمار و گزارش‌ها**
+
+👥 کاربران کل: {stats.total_users:,}
+📦 سفارشات در انتظار: {stats.pending_orders:,}
+
+💰 **فروش بر اساس پلن:**
+"""
+        if stats.revenue_by_plan:
+            for plan_type, revenue in sorted(stats.revenue_by_plan.items()):
+                completed = stats.completed_by_plan.get(plan_type, 0)
+                text += f"\n📦 {escape_markdown(plan_type)}: {completed:,} سفارش - {revenue:,} تومان"
+            text += f"\n\n💵 مجموع: {sum(stats.revenue_by_plan.values()):,} تومان"
+        else:
+            text += "\nهنوز سفارش تکمیل شده‌ای وجود ندارد."
+        
+        pool = self.db.pool_stats()
+        if pool:
+            text += (
+                f"\n\n🗄 اتصال‌های دیتابیس: {pool['in_use']} در حال استفاده، "
+                f"{pool['idle']} آزاد (حداکثر {pool['max_size']})"
+                f"\n⏱ timeout گرفتن اتصال: {pool['acquire_timeouts']}"
+            )
+        
+        keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="admin_back")]]
+        
+        await query.edit_message_text(
+            text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='Markdown'
+        )
+    
     async def manage_orders(self, update: Update, context: CallbackContext):
         """مدیریت سفارشات"""
         query = update.callback_query
         await query.answer()
         
-        pending_orders = await self.db.get_pending_orders()
+        stats = await self.db.get_stats() or Stats()
+        recent_orders, _ = await self.db.get_orders_page("waiting", limit=5)
         
         orders_text = f"""
 📦 **مدیریت سفارشات**
 
-⏳ سفارشات در انتظار: {len(pending_orders)}
+⏳ سفارشات در انتظار: {stats.pending_orders:,}
 """
-        if pending_orders:
-            for order in pending_orders[:5]:  # نمایش 5 سفارش اول
-                orders_text += f"\n🆔 #{order.order_id} - {order.plan_type} - {order.amount:,} تومان"
+        for order in recent_orders:
+            orders_text += f"\n🆔 #{order.order_id} - {escape_markdown(order.plan_type)} - {order.amount:,} تومان"
         
         keyboard = [
-            [InlineKeyboardButton("📋 مشاهده همه سفارشات", callback_data="all_orders")],
-            [InlineKeyboardButton("⏳ فقط در انتظارها", callback_data="pending_orders")],
+            [InlineKeyboardButton("⏭ سفارش بعدی", callback_data="order_next")],
+            [InlineKeyboardButton("📋 مشاهده همه سفارشات", callback_data=order_page_callback("a", "n"))],
+            [InlineKeyboardButton("⏳ فقط در انتظارها", callback_data=order_page_callback("w", "n"))],
             [InlineKeyboardButton("🔙 بازگشت", callback_data="admin_back")]
         ]
         
@@ -70,13 +131,63 @@ class AdminHandlers:
             parse_mode='Markdown'
         )
     
-    async def send_config_text(self, update: Update, context: CallbackContext):
-        """ارسال متن کانفیگ"""
+    async def browse_orders(self, update: Update, context: CallbackContext):
+        """مرور صفحه‌ای سفارشات"""
         query = update.callback_query
         await query.answer()
         
+        if not await self.db.admin_cache.is_admin(query.from_user.id):
+            await query.edit_message_text("⛔ دسترسی denied!")
+            return
+        
+        try:
+            status_code, direction, cursor = parse_order_page_callback(query.data)
+        except ValueError:
+            return
+        status, label = ORDER_STATUS_FILTERS.get(status_code, ORDER_STATUS_FILTERS["w"])
+        
+        orders, has_more = await self.db.get_orders_page(
+            status, cursor,
+            direction="next" if direction == "n" else "prev",
+            limit=config.ORDER_PAGE_SIZE
+        )
+        
+        if direction == "n":
+            has_newer, has_older = cursor is not None, has_more
+        else:
+            has_newer, has_older = has_more, True
+        
+        text = f"📦 **سفارشات - {label}**\n"
+        if not orders:
+            text += "\nسفارشی یافت نشد."
+        for order in orders:
+            status_icon = ORDER_STATUS_ICONS.get(order.status, "•")
+            text += (
+                f"\n{status_icon} #{order.order_id} - {escape_markdown(order.plan_type)} - {order.amount:,} تومان"
+                f" - {order.created_at:%Y-%m-%d %H:%M}"
+            )
+        
+        await query.edit_message_text(
+            text,
+            reply_markup=get_order_browser_keyboard(
+                orders, status_code,
+                newer_cursor=(orders[0].created_at, orders[0].order_id) if orders and has_newer else None,
+                older_cursor=(orders[-1].created_at, orders[-1].order_id) if orders and has_older else None
+            ),
+            parse_mode='Markdown'
+        )
+    
+    async def send_config_text(self, update: Update, context: CallbackContext):
+        """ارسال متن کانفیگ"""
+        query = update.callback_query
         order_id = int(query.data.replace("config_text_", ""))
         
+        # ارسال کانفیگ نیازمند در اختیار داشتن سفارش است (lease تمدید می‌شود)
+        if await self.review.claim(order_id, query.from_user.id) is None:
+            await query.answer("🔒 این سفارش توسط ادمین دیگری برداشته شده یا دیگر در انتظار نیست.", show_alert=True)
+            return
+        await query.answer()
+        
         text = f"""
 📝 ارسال متن کانفیگ - سفارش #{order_id}
 
@@ -85,12 +196,13 @@ class AdminHandlers:
 (حداکثر 5000 کاراکتر)
 """
         await query.edit_message_text(text)
-        context.user_data['waiting_for_config_text'] = order_id
+        set_awaiting(context, 'config_text', order_id)
     
     async def handle_config_text(self, update: Update, context: CallbackContext):
         """پردازش متن کانفیگ"""
-        order_id = context.user_data.get('waiting_for_config_text')
+        order_id = get_awaiting_data(context)
         if not order_id:
+            clear_awaiting(context)
             return
         
         config_text = update.message.text
@@ -117,7 +229,7 @@ class AdminHandlers:
                     user_id,
                     f"🎉 سفارش شما تکمیل شد!\n\n"
                     f"🆔 شماره سفارش: #{order_id}\n"
-                    f"📦 پلن: {order.plan_type}\n\n"
+                    f"📦 پلن: {escape_markdown(order.plan_type)}\n\n"
                     f"📋 متن کانفیگ VPN:\n\n"
                     f"```\n{config_text}\n```\n\n"
                     f"📝 کپی کرده و در اپلیکیشن OpenVPN استفاده کنید.",
@@ -129,12 +241,85 @@ class AdminHandlers:
             else:
                 await update.message.reply_text("✅ متن کانفیگ با موفقیت ارسال شد!")
             
+            await self.review.completed(order_id, update.effective_user.id)
+            
             # ثبت در لاگ
             await self.db.log_admin_action(
                 update.effective_user.id, "send_text_config", order_id,
                 f"Sent text config for order #{order_id}"
             )
         else:
-            await update.message.reply_text("❌ خطا در ذخیره متن کانفیگ")
+            await update.message.reply_text(
+                "❌ متن کانفیگ ذخیره نشد: سفارش دیگر در اختیار شما نیست یا خطایی رخ داد."
+            )
+        
+        clear_awaiting(context)
+    
+    async def order_log(self, update: Update, context: CallbackContext):
+        """تاریخچه اقدامات ادمین‌ها روی یک سفارش: /orderlog <شماره سفارش>"""
+        if not await self.db.admin_cache.is_admin(update.effective_user.id):
+            await update.message.reply_text("⛔ دسترسی denied!")
+            return
+        
+        try:
+            order_id = int(context.args[0].lstrip('#'))
+        except (IndexError, ValueError):
+            await update.message.reply_text("📝 استفاده: /orderlog <شماره سفارش>")
+            return
+        
+        # رویدادهای همین نمونه که هنوز در صف writer هستند هم دیده شوند
+        await self.db.audit_writer.flush()
+        entries = await self.db.get_audit_trail(order_id, actions=ORDER_AUDIT_ACTIONS)
+        
+        if not entries:
+            await update.message.reply_text(f"📜 اقدامی روی سفارش #{order_id} ثبت نشده است.")
+            return
+        
+        text = f"📜 تاریخچه سفارش #{order_id}\n"
+        for entry in entries:
+            admin = await self.db.admin_cache.get(entry.user_id)
+            name = admin.first_name if admin and admin.first_name else str(entry.user_id)
+            text += f"\n{entry.created_at:%Y-%m-%d %H:%M} - {name} - {entry.action}"
+        
+        await update.message.reply_text(text)
+    
+    async def slow_queries(self, update: Update, context: CallbackContext):
+        """کندترین عملیات‌های دیتابیس این نمونه از زمان شروع: /slowqueries [تعداد]"""
+        if not await self.db.admin_cache.is_admin(update.effective_user.id):
+            await update.message.reply_text("⛔ دسترسی denied!")
+            return
+        
+        try:
+            limit = int(context.args[0]) if context.args else config.SLOW_QUERY_TOP_N
+        except ValueError:
+            await update.message.reply_text("📝 استفاده: /slowqueries [تعداد]")
+            return
+        
+        profiler = self.db.profiler
+        statements = profiler.top(max(1, min(limit, 50)))
+        if not statements:
+            await update.message.reply_text("🐢 هنوز کوئری‌ای ثبت نشده است.")
+            return
+        
+        text = (
+            f"🐢 کندترین عملیات‌ها (آستانه {profiler.slow_threshold * 1000:.0f}ms، "
+            f"{profiler.slow_queries:,} کوئری کند)\n"
+        )
+        for stats in statements:
+            text += (
+                f"\n{stats.name}: max {stats.max * 1000:.1f}ms، avg {stats.average * 1000:.1f}ms، "
+                f"{stats.count:,} بار، {stats.rows:,} ردیف"
+            )
+            if stats.slow:
+                text += f"، {stats.slow:,} کند"
+            if stats.errors:
+                text += f"، {stats.errors:,} خطا"
+        
+        slowest = statements[0]
+        if slowest.plan:
+            text += f"\n\n📋 برنامه اجرای {slowest.name}:\n{slowest.plan}"
+        elif slowest.slowest_query:
+            text += f"\n\n📋 {slowest.name}:\n{' '.join(slowest.slowest_query.split())}"
         
-        context.user_data['waiting_for_config_text'] = None
+        # سقف طول پیام تلگرام
+        await update.message.reply_text(text[:4000])
@@ -3,6 +3,7 @@ from telegram.ext import CallbackContext
 import logging
 from app.database.repository import DatabaseRepository
 from app.database.models import Admin
+from app.handlers.text_router import set_awaiting, clear_awaiting
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,9 @@ class AdminManagementHandlers:
             return
         
         admins = await self.db.get_all_admins()
+        if admins is None:
+            await query.edit_message_text("❌ خطا در دریافت لیست ادمین‌ها.")
+            return
         
         text = "👨‍💼 مدیریت ادمین‌ها\n\n"
         for admin in admins:
@@ -58,15 +62,13 @@ class AdminManagementHandlers:
 `123456789|رضا کریمی|admin`
 """
         await query.edit_message_text(text, parse_mode='Markdown')
-        context.user_data['waiting_for_admin_info'] = True
+        set_awaiting(context, 'admin_info')
     
     async def handle_admin_info(self, update: Update, context: CallbackContext):
         """پردازش اطلاعات ادمین جدید"""
-        if not context.user_data.get('waiting_for_admin_info'):
-            return
-        
         user_id = update.effective_user.id
         if not await self._is_super_admin(user_id):
+            clear_awaiting(context)
             await update.message.reply_text("⛔ دسترسی denied!")
             return
         
@@ -129,7 +131,7 @@ class AdminManagementHandlers:
             await update.message.reply_text("❌ خطا در پردازش اطلاعات.")
         
         finally:
-            context.user_data['waiting_for_admin_info'] = False
+            clear_awaiting(context)
     
     def _get_level_persian(self, level: str) -> str:
         """تبدیل سطح دسترسی به فارسی"""
@@ -142,5 +144,4 @@ class AdminManagementHandlers:
     
     async def _is_super_admin(self, user_id: int) -> bool:
         """بررسی اینکه کاربر Super Admin هست"""
-        admin = await self.db.get_admin(user_id)
-        return admin and admin.level == 'super_admin'
+        return await self.db.admin_cache.is_super_admin(user_id)
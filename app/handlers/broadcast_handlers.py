@@ -0,0 +1,80 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import CallbackContext
+import logging
+from app.database.repository import DatabaseRepository
+from app.handlers.text_router import set_awaiting, clear_awaiting
+from app.services.broadcast import BroadcastEngine, format_progress
+from app.utils.keyboards import get_broadcast_progress_keyboard
+
+logger = logging.getLogger(__name__)
+
+class BroadcastHandlers:
+    def __init__(self, db: DatabaseRepository, engine: BroadcastEngine):
+        self.db = db
+        self.engine = engine
+    
+    async def start_broadcast(self, update: Update, context: CallbackContext):
+        """شروع ارسال پیام گروهی"""
+        query = update.callback_query
+        await query.answer()
+        
+        if not await self.db.admin_cache.is_admin(query.from_user.id):
+            await query.edit_message_text("⛔ دسترسی denied!")
+            return
+        
+        text = """
+📢 ارسال پیام گروهی
+
+لطفا متن پیامی که باید برای همه کاربران ارسال شود را وارد کنید:
+"""
+        keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="admin_back")]]
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+        set_awaiting(context, 'broadcast_text')
+    
+    async def handle_broadcast_text(self, update: Update, context: CallbackContext):
+        """دریافت متن پیام گروهی و شروع ارسال"""
+        clear_awaiting(context)
+        
+        admin_id = update.effective_user.id
+        if not await self.db.admin_cache.is_admin(admin_id):
+            await update.message.reply_text("⛔ دسترسی denied!")
+            return
+        
+        broadcast_id = await self.db.create_broadcast(admin_id, update.message.text)
+        if not broadcast_id:
+            await update.message.reply_text("❌ خطا در ایجاد پیام گروهی.")
+            return
+        
+        broadcast = await self.db.get_broadcast(broadcast_id)
+        progress = await update.message.reply_text(
+            format_progress(broadcast),
+            reply_markup=get_broadcast_progress_keyboard(broadcast_id)
+        )
+        await self.db.set_broadcast_progress_message(broadcast_id, progress.chat_id, progress.message_id)
+        
+        # ارسال فقط روی رهبر؛ در حالت صف مشترک این نمونه ممکن است رهبر نباشد
+        if not await self.engine.submit(broadcast_id):
+            await update.message.reply_text("⚠️ پیام گروهی ثبت شد؛ ارسال آن در بررسی دوره‌ای بعدی شروع می‌شود.")
+        
+        await self.db.log_admin_action(
+            admin_id, "broadcast", broadcast_id,
+            f"Started broadcast #{broadcast_id}"
+        )
+    
+    async def cancel_broadcast(self, update: Update, context: CallbackContext):
+        """توقف پیام گروهی در حال ارسال"""
+        query = update.callback_query
+        
+        if not await self.db.admin_cache.is_admin(query.from_user.id):
+            await query.answer("⛔ دسترسی denied!", show_alert=True)
+            return
+        
+        broadcast_id = int(query.data.replace("broadcast_cancel_", ""))
+        if await self.db.finish_broadcast(broadcast_id, 'cancelled'):
+            await query.answer("⏹ ارسال متوقف شد")
+            await self.db.log_admin_action(
+                query.from_user.id, "cancel_broadcast", broadcast_id,
+                f"Cancelled broadcast #{broadcast_id}"
+            )
+        else:
+            await query.answer("این پیام گروهی در حال ارسال نیست.")
@@ -0,0 +1,95 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+from datetime import datetime
+import asyncio
+import logging
+import os
+from app.config import config
+from app.database.repository import DatabaseRepository, EXPORT_TABLES
+from app.services.export import ExportService, ExportTooLarge, EXPORT_FORMATS
+from app.utils.keyboards import get_export_menu
+
+logger = logging.getLogger(__name__)
+
+class ExportHandlers:
+    def __init__(self, db: DatabaseRepository, exporter: ExportService):
+        self.db = db
+        self.exporter = exporter
+    
+    async def export_menu(self, update: Update, context: CallbackContext):
+        """منوی خروجی داده‌ها"""
+        query = update.callback_query
+        await query.answer()
+        
+        if not await self.db.admin_cache.is_super_admin(query.from_user.id):
+            await query.edit_message_text("⛔ فقط Super Admin می‌تواند از داده‌ها خروجی بگیرد.")
+            return
+        
+        await query.edit_message_text(
+            "📤 خروجی داده‌ها\n\nجدول و فرمت مورد نظر را انتخاب کنید (فایل فشرده gzip):",
+            reply_markup=get_export_menu()
+        )
+    
+    async def run_export(self, update: Update, context: CallbackContext):
+        """شروع خروجی گرفتن در پس‌زمینه"""
+        query = update.callback_query
+        
+        admin_id = query.from_user.id
+        if not await self.db.admin_cache.is_super_admin(admin_id):
+            await query.answer("⛔ دسترسی denied!", show_alert=True)
+            return
+        
+        _, table, fmt = query.data.split(":")
+        if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+            await query.answer("⚠️ خروجی نامعتبر", show_alert=True)
+            return
+        
+        await query.answer("⏳ در حال آماده‌سازی فایل...")
+        context.application.create_task(
+            self._export_and_send(context.bot, query.message.chat_id, table, fmt),
+            update=update
+        )
+        
+        await self.db.log_admin_action(admin_id, "export", None, f"Exported {table} as {fmt}")
+    
+    async def _export_and_send(self, bot, chat_id: int, table: str, fmt: str):
+        try:
+            path = await self.exporter.export(table, fmt)
+        except ExportTooLarge as e:
+            logger.warning(f"خروجی {table} از {e.size} بایت گذشت و متوقف شد")
+            await bot.send_message(
+                chat_id,
+                f"❌ خروجی {table} از محدودیت ارسال تلگرام "
+                f"({config.EXPORT_MAX_DOCUMENT_SIZE / 1024 / 1024:.0f}MB) بیشتر شد و متوقف شد."
+            )
+            return
+        except Exception as e:
+            logger.error(f"خطا در خروجی گرفتن از {table}: {e}")
+            await bot.send_message(chat_id, f"❌ خطا در خروجی گرفتن از {table}")
+            return
+        
+        try:
+            # trailer پایانی gzip بعد از آخرین بررسی sink نوشته می‌شود
+            size = os.path.getsize(path)
+            if size > config.EXPORT_MAX_DOCUMENT_SIZE:
+                await bot.send_message(
+                    chat_id,
+                    f"❌ حجم فایل خروجی ({size / 1024 / 1024:.1f}MB) از محدودیت ارسال تلگرام بیشتر است."
+                )
+                return
+            
+            filename = f"{table}-{datetime.now():%Y%m%d-%H%M%S}.{fmt}.gz"
+            with open(path, 'rb') as document:
+                await bot.send_document(
+                    chat_id,
+                    document=document,
+                    filename=filename,
+                    caption=f"📤 خروجی {table}",
+                    read_timeout=120,
+                    write_timeout=120
+                )
+        except Exception as e:
+            logger.error(f"خطا در ارسال فایل خروجی {table}: {e}")
+            await bot.send_message(chat_id, f"❌ خطا در ارسال فایل خروجی {table}")
+        finally:
+            await asyncio.to_thread(os.remove, path)
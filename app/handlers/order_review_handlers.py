@@ -0,0 +1,60 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+import logging
+from app.database.repository import DatabaseRepository
+from app.services.order_review import OrderReviewService
+
+logger = logging.getLogger(__name__)
+
+class OrderReviewHandlers:
+    def __init__(self, db: DatabaseRepository, review: OrderReviewService):
+        self.db = db
+        self.review = review
+    
+    async def claim_order(self, update: Update, context: CallbackContext):
+        """برداشتن سفارش از پیام اطلاع‌رسانی"""
+        query = update.callback_query
+        admin_id = query.from_user.id
+        
+        if not await self.db.admin_cache.is_admin(admin_id):
+            await query.answer("⛔ دسترسی denied!", show_alert=True)
+            return
+        
+        order_id = int(query.data.replace("claim_", ""))
+        order = await self.review.claim(order_id, admin_id, message_id=query.message.message_id)
+        if order is None:
+            await query.answer("🔒 این سفارش توسط ادمین دیگری برداشته شده یا دیگر در انتظار نیست.", show_alert=True)
+            return
+        
+        await query.answer("✅ سفارش برای شما رزرو شد")
+        await self.db.log_admin_action(admin_id, "claim_order", order_id, f"Claimed order #{order_id}")
+    
+    async def release_order(self, update: Update, context: CallbackContext):
+        """برگرداندن سفارش به صف انتظار"""
+        query = update.callback_query
+        admin_id = query.from_user.id
+        
+        order_id = int(query.data.replace("release_", ""))
+        if not await self.review.release(order_id, admin_id):
+            await query.answer("⚠️ این سفارش در اختیار شما نیست.", show_alert=True)
+            return
+        
+        await query.answer("🔓 سفارش به صف برگشت")
+        await self.db.log_admin_action(admin_id, "release_order", order_id, f"Released order #{order_id}")
+    
+    async def next_order(self, update: Update, context: CallbackContext):
+        """برداشتن قدیمی‌ترین سفارش در انتظار"""
+        query = update.callback_query
+        admin_id = query.from_user.id
+        
+        if not await self.db.admin_cache.is_admin(admin_id):
+            await query.answer("⛔ دسترسی denied!", show_alert=True)
+            return
+        
+        order = await self.review.claim_next(admin_id)
+        if order is None:
+            await query.answer("🎉 سفارشی در انتظار بررسی نیست.", show_alert=True)
+            return
+        
+        await query.answer()
+        await self.db.log_admin_action(admin_id, "claim_order", order.order_id, f"Claimed order #{order.order_id}")
@@ -0,0 +1,144 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+import logging
+import re
+from app.database.repository import DatabaseRepository
+from app.database.models import Plan
+from app.services.plan_catalog import PlanCatalog
+from app.utils.keyboards import get_plan_admin_keyboard
+from app.handlers.text_router import set_awaiting, clear_awaiting
+
+logger = logging.getLogger(__name__)
+
+# شناسه پلن داخل callback_data قرار می‌گیرد (حداکثر 64 بایت)
+PLAN_ID_PATTERN = re.compile(r"^[A-Za-z0-9]{1,32}$")
+
+# نام پلن در پیام‌های Markdown (صفحه پلن‌ها، اطلاع‌رسانی سفارش) نمایش داده می‌شود
+MARKDOWN_CHARS = re.compile(r"[_*`\[\]]")
+
+class PlanHandlers:
+    def __init__(self, db: DatabaseRepository, catalog: PlanCatalog):
+        self.db = db
+        self.catalog = catalog
+    
+    async def manage_plans(self, update: Update, context: CallbackContext):
+        """مدیریت پلن‌ها"""
+        query = update.callback_query
+        await query.answer()
+        
+        if not await self.db.admin_cache.is_super_admin(query.from_user.id):
+            await query.edit_message_text("⛔ فقط Super Admin می‌تواند پلن‌ها را مدیریت کند.")
+            return
+        
+        plans = await self.db.get_plans(include_inactive=True) or []
+        
+        text = f"💳 مدیریت پلن‌ها (نسخه کاتالوگ: {self.catalog.snapshot.version})\n\n"
+        for plan in plans:
+            status_icon = "✅" if plan.is_active else "❌"
+            text += f"{status_icon} {plan.plan_id}: {plan.name} - {plan.price:,} تومان ({plan.duration} روز)\n"
+        if not plans:
+            text += "هیچ پلنی ثبت نشده است.\n"
+        
+        await query.edit_message_text(text, reply_markup=get_plan_admin_keyboard())
+    
+    async def edit_plan(self, update: Update, context: CallbackContext):
+        """افزودن یا ویرایش پلن"""
+        query = update.callback_query
+        await query.answer()
+        
+        if not await self.db.admin_cache.is_super_admin(query.from_user.id):
+            await query.edit_message_text("⛔ دسترسی denied!")
+            return
+        
+        text = """
+✏️ افزودن / ویرایش پلن
+
+📝 فرمت:
+`شناسه|نام|قیمت (تومان)|مدت (روز)`
+
+اگر شناسه موجود باشد پلن ویرایش و فعال می‌شود.
+
+📋 مثال:
+`6month|شش ماهه|149000|180`
+"""
+        await query.edit_message_text(text, parse_mode='Markdown')
+        set_awaiting(context, 'plan_info')
+    
+    async def disable_plan(self, update: Update, context: CallbackContext):
+        """غیرفعال کردن پلن"""
+        query = update.callback_query
+        await query.answer()
+        
+        if not await self.db.admin_cache.is_super_admin(query.from_user.id):
+            await query.edit_message_text("⛔ دسترسی denied!")
+            return
+        
+        await query.edit_message_text("🚫 شناسه پلنی که باید غیرفعال شود را ارسال کنید:")
+        set_awaiting(context, 'plan_disable')
+    
+    async def handle_plan_info(self, update: Update, context: CallbackContext):
+        """پردازش اطلاعات پلن"""
+        user_id = update.effective_user.id
+        if not await self.db.admin_cache.is_super_admin(user_id):
+            clear_awaiting(context)
+            await update.message.reply_text("⛔ دسترسی denied!")
+            return
+        
+        try:
+            data = [part.strip() for part in update.message.text.split('|')]
+            if len(data) != 4:
+                await update.message.reply_text("❌ فرمت اطلاعات نادرست است. لطفا دوباره تلاش کنید.")
+                return
+            
+            plan_id, name = data[0], data[1]
+            price, duration = int(data[2].replace(',', '')), int(data[3])
+            if not PLAN_ID_PATTERN.match(plan_id) or not name or price < 0 or duration <= 0:
+                await update.message.reply_text("❌ اطلاعات پلن نامعتبر است. لطفا دوباره تلاش کنید.")
+                return
+            if MARKDOWN_CHARS.search(name):
+                await update.message.reply_text("❌ نام پلن نباید شامل کاراکترهای _ * ` [ ] باشد.")
+                return
+            
+            plan = Plan(
+                plan_id=plan_id,
+                name=name,
+                price=price,
+                duration=duration,
+                sort_order=len(self.catalog.snapshot.plans)
+            )
+            if await self.catalog.save_plan(plan):
+                clear_awaiting(context)
+                await update.message.reply_text(
+                    f"✅ پلن ذخیره شد!\n"
+                    f"📦 {name} - {price:,} تومان ({duration} روز)\n"
+                    f"🔢 نسخه کاتالوگ: {self.catalog.snapshot.version}"
+                )
+                await self.db.log_admin_action(
+                    user_id, "save_plan", None,
+                    f"Saved plan {plan_id}: {name} {price} / {duration}d"
+                )
+            else:
+                await update.message.reply_text("❌ خطا در ذخیره پلن. لطفا دوباره تلاش کنید.")
+        
+        # در خطاهای اعتبارسنجی حالت انتظار حفظ می‌شود تا ادمین فقط پیام اصلاح‌شده را بفرستد
+        except ValueError:
+            await update.message.reply_text("❌ قیمت و مدت باید عدد باشند.")
+        except Exception as e:
+            clear_awaiting(context)
+            logger.error(f"خطا در ذخیره پلن: {e}")
+            await update.message.reply_text("❌ خطا در پردازش اطلاعات.")
+    
+    async def handle_plan_disable(self, update: Update, context: CallbackContext):
+        """پردازش غیرفعال کردن پلن"""
+        user_id = update.effective_user.id
+        clear_awaiting(context)
+        if not await self.db.admin_cache.is_super_admin(user_id):
+            await update.message.reply_text("⛔ دسترسی denied!")
+            return
+        
+        plan_id = update.message.text.strip()
+        if await self.catalog.disable_plan(plan_id):
+            await update.message.reply_text(f"✅ پلن {plan_id} غیرفعال شد.")
+            await self.db.log_admin_action(user_id, "disable_plan", None, f"Disabled plan {plan_id}")
+        else:
+            await update.message.reply_text("❌ پلن فعالی با این شناسه پیدا نشد.")
@@ -0,0 +1,50 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# کلیدهای user_data برای جریان‌هایی که منتظر پیام متنی هستند
+AWAITING_KEY = 'awaiting'
+AWAITING_DATA_KEY = 'awaiting_data'
+
+TextHandler = Callable[[Update, CallbackContext], Awaitable[Any]]
+
+def set_awaiting(context: CallbackContext, state: str, data: Any = None):
+    """ثبت اینکه پیام متنی بعدی کاربر مربوط به کدام جریان است"""
+    context.user_data[AWAITING_KEY] = state
+    context.user_data[AWAITING_DATA_KEY] = data
+
+def get_awaiting_data(context: CallbackContext) -> Any:
+    """داده همراه وضعیت فعلی (مثلا شماره سفارش)"""
+    return context.user_data.get(AWAITING_DATA_KEY)
+
+def clear_awaiting(context: CallbackContext):
+    """پایان انتظار برای پیام متنی"""
+    context.user_data.pop(AWAITING_KEY, None)
+    context.user_data.pop(AWAITING_DATA_KEY, None)
+
+class TextRouter:
+    """مسیریابی پیام‌های متنی بر اساس وضعیت انتظار کاربر با یک lookup در dict"""
+
+    def __init__(self):
+        self._handlers: Dict[str, TextHandler] = {}
+        self.dispatch_counts: Counter = Counter()
+
+    def register(self, state: str, handler: TextHandler):
+        """ثبت هندلر برای یک وضعیت؛ جریان جدید نیازی به فیلتر سراسری جدید ندارد"""
+        if state in self._handlers:
+            raise ValueError(f"Text state already registered: {state}")
+        self._handlers[state] = handler
+
+    async def dispatch(self, update: Update, context: CallbackContext):
+        """خواندن وضعیت کاربر و اجرای هندلر مربوط"""
+        state = context.user_data.get(AWAITING_KEY)
+        handler = self._handlers.get(state)
+        if handler is None:
+            self.dispatch_counts['unrouted'] += 1
+            return
+        self.dispatch_counts[state] += 1
+        await handler(update, context)
@@ -1,29 +1,37 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
+from telegram.helpers import escape_markdown
 import logging
 from app.database.repository import DatabaseRepository
-from app.database.models import User, Order
+from app.database.models import User, Order, OrderWithUser
+from app.database.user_writer import UserWriteBehind
 from app.config import config
-from app.utils.keyboards import get_main_menu, get_plans_keyboard
+from app.services.order_review import OrderReviewService
+from app.services.plan_catalog import PlanCatalog
+from app.utils.keyboards import get_main_menu
 
 logger = logging.getLogger(__name__)
 
 class UserHandlers:
-    def __init__(self, db: DatabaseRepository):
+    def __init__(self, db: DatabaseRepository, user_writer: UserWriteBehind, catalog: PlanCatalog,
+                 review: OrderReviewService):
         self.db = db
+        self.user_writer = user_writer
+        self.catalog = catalog
+        self.review = review
     
     async def start(self, update: Update, context: CallbackContext):
         """شروع ربات و ثبت کاربر"""
         user = update.effective_user
         
-        # ثبت کاربر در دیتابیس
+        # ثبت کاربر در دیتابیس (در صورت تغییر، به صورت دسته‌ای)
         new_user = User(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name,
             last_name=user.last_name
         )
-        await self.db.add_user(new_user)
+        self.user_writer.submit(new_user)
         
         message = (
             f"🎉 **به ربات فروش VPN خوش آمدید!**\n\n"
@@ -50,9 +58,10 @@ class UserHandlers:
         query = update.callback_query
         await query.answer()
         
+        snapshot = self.catalog.snapshot
         await query.edit_message_text(
-            "📦 **پلن‌های VPN موجود:**\n\nلطفا یکی از پلن‌های زیر را انتخاب کنید:",
-            reply_markup=get_plans_keyboard(),
+            snapshot.price_text,
+            reply_markup=snapshot.keyboard,
             parse_mode='Markdown'
         )
     
@@ -62,17 +71,23 @@ class UserHandlers:
         await query.answer()
         
         plan_id = query.data.replace("plan_", "")
-        plan_info = config.PLANS.get(plan_id)
+        plan = self.catalog.get(plan_id)
         
-        if not plan_info:
+        if not plan:
             await query.edit_message_text("⚠️ پلن انتخاب شده معتبر نیست!")
             return
         
-        # ذخیره اطلاعات پلن در context کاربر
+        # ذخیره اطلاعات پلن در context کاربر (قیمت در لحظه انتخاب ثابت می‌شود)
+        plan_info = {
+            'plan_id': plan.plan_id,
+            'name': plan.name,
+            'price': plan.price,
+            'duration': plan.duration
+        }
         context.user_data['selected_plan'] = plan_info
         
         message = f"""
-✅ **پلن انتخاب شده:** {plan_info['name']}
+✅ **پلن انتخاب شده:** {escape_markdown(plan_info['name'])}
 💰 **مبلغ قابل پرداخت:** {plan_info['price']:,} تومان
 ⏰ **مدت زمان:** {plan_info['duration']} روز
 
@@ -80,10 +95,13 @@ class UserHandlers:
 1. واریز به شماره کارت: `{config.CARD_NUMBER}`
 2. سپس عکس رسید پرداخت را ارسال کنید
 
+یا در صورت داشتن موجودی کافی، از کیف پول پرداخت کنید.
+
 📸 لطفا بعد از پرداخت، عکس رسید را ارسال کنید.
 """
         
         keyboard = [
+            [InlineKeyboardButton("💰 پرداخت از کیف پول", callback_data="pay_wallet")],
             [InlineKeyboardButton("🔙 بازگشت به پلن‌ها", callback_data="buy_vpn")],
             [InlineKeyboardButton("🏠 منوی اصلی", callback_data="main_menu")]
         ]
@@ -110,26 +128,27 @@ class UserHandlers:
         photo_file = await update.message.photo[-1].get_file()
         file_id = photo_file.file_id
         
-        # ایجاد سفارش در دیتابیس
+        # ردیف کاربر باید قبل از سفارش (foreign key) نوشته شده باشد
+        await self.user_writer.flush_user(user.id)
+        
+        # ایجاد سفارش همراه با رسید در یک دستور
         new_order = Order(
+            order_id=None,
             user_id=user.id,
             plan_type=plan_info['name'],
             amount=plan_info['price']
         )
         
-        order_id = await self.db.create_order(new_order)
+        order_id = await self.db.create_order_with_receipt(new_order, file_id)
         
         if order_id:
-            # بروزرسانی سفارش با آدرس عکس
-            await self.db.update_order_receipt(order_id, file_id)
-            
             # پاک کردن اطلاعات پلن انتخاب شده
             del context.user_data['selected_plan']
             
             message = f"""
 ✅ **رسید پرداخت دریافت شد**
 
-📦 پلن: {plan_info['name']}
+📦 پلن: {escape_markdown(plan_info['name'])}
 💰 مبلغ: {plan_info['price']:,} تومان
 🆔 شماره سفارش: `{order_id}`
 
@@ -142,69 +161,57 @@ class UserHandlers:
                 parse_mode='Markdown'
             )
             
-            # اطلاع به ادمین‌ها
-            await self._notify_admins(context.bot, order_id, user, plan_info)
+            # اطلاع به ادمین‌ها در پس‌زمینه تا پاسخ کاربر منتظر نماند
+            context.application.create_task(
+                self._notify_admins(order_id, user, plan_info),
+                update=update
+            )
         else:
             await update.message.reply_text(
                 "❌ خطا در ثبت سفارش. لطفا با پشتیبانی تماس بگیرید.",
                 reply_markup=get_main_menu()
             )
     
-    async def _notify_admins(self, bot, order_id: int, user, plan_info: dict):
+    async def _notify_admins(self, order_id: int, user, plan_info: dict):
         """اطلاع‌رسانی به ادمین‌ها برای سفارش جدید"""
-        from app.utils.keyboards import get_order_actions_keyboard
-        
-        message = f"""
-🚨 **سفارش جدید**
-
-👤 کاربر: {user.first_name} (@{user.username})
-🆔 کاربری: `{user.id}`
-📦 پلن: {plan_info['name']}
-💰 مبلغ: {plan_info['price']:,} تومان
-🆔 شماره سفارش: `{order_id}`
-"""
-        for admin_id in config.ADMIN_IDS:
-            try:
-                await bot.send_message(
-                    admin_id, 
-                    message, 
-                    parse_mode='Markdown',
-                    reply_markup=get_order_actions_keyboard(order_id)
-                )
-            except Exception as e:
-                logger.error(f"خطا در اطلاع‌رسانی به ادمین {admin_id}: {e}")
+        await self.review.announce(OrderWithUser(
+            order_id=order_id,
+            user_id=user.id,
+            plan_type=plan_info['name'],
+            amount=plan_info['price'],
+            status='waiting',
+            receipt_file_id=None,
+            created_at=None,
+            username=user.username,
+            first_name=user.first_name
+        ))
     
     async def profile(self, update: Update, context: CallbackContext):
         """نمایش پروفایل کاربر"""
         user = update.effective_user
         
-        user_data = await self.db.get_user(user.id)
-        user_orders = await self.db.get_user_orders(user.id)
+        await self.user_writer.flush_user(user.id)
+        profile = await self.db.get_profile_summary(user.id)
         
-        if not user_data:
+        if not profile:
             if update.callback_query:
                 await update.callback_query.message.reply_text("⚠️ خطا در دریافت اطلاعات کاربر")
             else:
                 await update.message.reply_text("⚠️ خطا در دریافت اطلاعات کاربر")
             return
         
-        # محاسبه آمار
-        total_orders = len(user_orders)
-        completed_orders = len([o for o in user_orders if o.status == 'completed'])
-        pending_orders = len([o for o in user_orders if o.status == 'waiting'])
-        
         profile_text = f"""
 👤 **پروفایل کاربری**
 
 🆔 شناسه: `{user.id}`
-👤 نام: {user_data.first_name}
-📧 نام کاربری: @{user_data.username or 'ندارد'}
-💰 اعتبار: {user_data.balance:,} تومان
+👤 نام: {profile.first_name}
+📧 نام کاربری: @{profile.username or 'ندارد'}
+💰 اعتبار: {profile.balance:,} تومان
 
 📊 **آمار سفارشات:**
-✅ تکمیل شده: {completed_orders}
-⏳ در انتظار: {pending_orders}
-📦 مجموع: {total_orders}
+✅ تکمیل شده: {profile.orders_completed}
+⏳ در انتظار: {profile.orders_pending}
+📦 مجموع: {profile.orders_total}
 """
         keyboard = [
             [InlineKeyboardButton("📋 تاریخچه سفارشات", callback_data="order_history")],
@@ -223,3 +230,30 @@ class UserHandlers:
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode='Markdown'
             )
+    
+    async def help_command(self, update: Update, context: CallbackContext):
+        """راهنمای استفاده از ربات"""
+        help_text = """
+ℹ️ **راهنما**
+
+🛒 خرید VPN: یک پلن انتخاب کنید، مبلغ را کارت به کارت کنید و عکس رسید را بفرستید.
+💰 کیف پول: در صورت داشتن موجودی، پلن را مستقیما از کیف پول بخرید.
+📋 /profile: مشاهده اعتبار و آمار سفارشات
+
+⏳ سفارش‌ها پس از بررسی رسید توسط پشتیبانی تکمیل و کانفیگ برای شما ارسال می‌شود.
+"""
+        keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")]]
+        
+        if update.callback_query:
+            await update.callback_query.answer()
+            await update.callback_query.edit_message_text(
+                help_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='Markdown'
+            )
+        else:
+            await update.message.reply_text(
+                help_text,
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                parse_mode='Markdown'
+            )
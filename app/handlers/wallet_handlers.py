@@ -0,0 +1,150 @@
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import CallbackContext
+from telegram.helpers import escape_markdown
+import logging
+from app.config import config
+from app.database.repository import DatabaseRepository
+from app.database.models import OrderWithUser
+from app.database.user_writer import UserWriteBehind
+from app.services.order_review import OrderReviewService
+from app.services.plan_catalog import PlanCatalog
+from app.utils.keyboards import get_main_menu
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = {
+    'topup': '➕ شارژ',
+    'purchase': '🛒 خرید',
+    'refund': '↩️ بازگشت وجه'
+}
+
+class WalletHandlers:
+    def __init__(self, db: DatabaseRepository, user_writer: UserWriteBehind, catalog: PlanCatalog,
+                 review: OrderReviewService):
+        self.db = db
+        self.user_writer = user_writer
+        self.catalog = catalog
+        self.review = review
+    
+    async def show_wallet(self, update: Update, context: CallbackContext):
+        """کیف پول: موجودی و آخرین تراکنش‌ها"""
+        query = update.callback_query
+        await query.answer()
+        user_id = query.from_user.id
+        
+        await self.user_writer.flush_user(user_id)
+        user = await self.db.get_user(user_id)
+        history = await self.db.get_wallet_history(user_id, limit=config.WALLET_HISTORY_SIZE)
+        
+        text = f"💰 **کیف پول**\n\n💵 موجودی: {user.balance if user else 0:,} تومان\n"
+        if history:
+            text += "\n📜 آخرین تراکنش‌ها:\n"
+        for transaction in history:
+            label = TRANSACTION_TYPES.get(transaction.type, transaction.type)
+            text += (
+                f"\n{label}: {transaction.amount:+,} تومان"
+                f" ← {transaction.balance_after:,}"
+                f" ({transaction.created_at:%Y-%m-%d %H:%M})"
+            )
+        text += "\n\nبرای شارژ کیف پول با پشتیبانی در تماس باشید."
+        
+        keyboard = [[InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")]]
+        await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='Markdown')
+    
+    async def pay_with_balance(self, update: Update, context: CallbackContext):
+        """پرداخت پلن انتخاب‌شده از موجودی کیف پول"""
+        query = update.callback_query
+        user = query.from_user
+        
+        plan_info = context.user_data.get('selected_plan')
+        if not plan_info:
+            await query.answer("⚠️ لطفا ابتدا یک پلن انتخاب کنید.", show_alert=True)
+            return
+        
+        # پرداخت از کیف پول فوری است؛ پلنی که بعد از انتخاب ویرایش یا غیرفعال شده با قیمت قدیم فروخته نمی‌شود
+        plan = self.catalog.get(plan_info['plan_id'])
+        if not plan or plan.name != plan_info['name'] or plan.price != plan_info['price']:
+            del context.user_data['selected_plan']
+            await query.answer("⚠️ این پلن تغییر کرده است. لطفا دوباره پلن را انتخاب کنید.", show_alert=True)
+            return
+        
+        await self.user_writer.flush_user(user.id)
+        result = await self.db.purchase_with_balance(
+            user.id,
+            plan_type=plan.name,
+            amount=plan.price,
+            description=f"Plan {plan.name}"
+        )
+        if result is False:
+            await query.answer("❌ موجودی کیف پول کافی نیست.", show_alert=True)
+            return
+        if result is None:
+            await query.answer("❌ خطا در ثبت سفارش. لطفا دوباره تلاش کنید.", show_alert=True)
+            return
+        
+        await query.answer()
+        order_id, balance = result
+        del context.user_data['selected_plan']
+        
+        await query.edit_message_text(
+            f"✅ **سفارش شما با موفقیت ثبت شد!**\n\n"
+            f"🆔 شماره سفارش: #{order_id}\n"
+            f"📦 پلن: {escape_markdown(plan_info['name'])}\n"
+            f"💰 مبلغ: {plan_info['price']:,} تومان (از کیف پول)\n"
+            f"💵 موجودی جدید: {balance:,} تومان\n\n"
+            f"⏳ سفارش شما در صف بررسی قرار گرفت.",
+            reply_markup=get_main_menu(),
+            parse_mode='Markdown'
+        )
+        
+        context.application.create_task(
+            self.review.announce(OrderWithUser(
+                order_id=order_id,
+                user_id=user.id,
+                plan_type=plan_info['name'],
+                amount=plan_info['price'],
+                status='waiting',
+                receipt_file_id=None,
+                created_at=None,
+                username=user.username,
+                first_name=user.first_name
+            )),
+            update=update
+        )
+    
+    async def topup(self, update: Update, context: CallbackContext):
+        """شارژ کیف پول کاربر توسط ادمین: /topup <شناسه کاربر> <مبلغ> [توضیح]"""
+        admin_id = update.effective_user.id
+        if not await self.db.admin_cache.is_super_admin(admin_id):
+            await update.message.reply_text("⛔ فقط Super Admin می‌تواند کیف پول را شارژ کند.")
+            return
+        
+        try:
+            user_id = int(context.args[0])
+            amount = int(context.args[1].replace(',', ''))
+        except (IndexError, ValueError):
+            await update.message.reply_text("📝 استفاده: /topup <شناسه کاربر> <مبلغ> [توضیح]")
+            return
+        if amount <= 0 or amount > config.WALLET_MAX_TOPUP:
+            await update.message.reply_text(f"❌ مبلغ باید بین 1 و {config.WALLET_MAX_TOPUP:,} تومان باشد.")
+            return
+        
+        description = " ".join(context.args[2:]) or f"Top-up by admin {admin_id}"
+        transaction = await self.db.apply_ledger_entry(user_id, amount, 'topup', description)
+        if transaction is None:
+            await update.message.reply_text("❌ شارژ انجام نشد (کاربر یافت نشد یا خطا در ثبت).")
+            return
+        
+        await update.message.reply_text(
+            f"✅ کیف پول کاربر {user_id} به مبلغ {amount:,} تومان شارژ شد.\n"
+            f"💵 موجودی جدید: {transaction.balance_after:,} تومان"
+        )
+        await self.db.log_admin_action(admin_id, "wallet_topup", user_id, f"+{amount} ({description})")
+        
+        try:
+            await context.bot.send_message(
+                user_id,
+                f"💰 کیف پول شما {amount:,} تومان شارژ شد.\n💵 موجودی: {transaction.balance_after:,} تومان"
+            )
+        except Exception as e:
+            logger.error(f"خطا در اطلاع‌رسانی شارژ به کاربر {user_id}: {e}")
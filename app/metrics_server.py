@@ -0,0 +1,46 @@
+import logging
+from typing import Awaitable, Callable
+from aiohttp import web
+from app.utils.metrics import PrometheusText
+
+logger = logging.getLogger(__name__)
+
+class MetricsServer:
+    """سرور aiohttp جدا برای /metrics (هم در حالت polling و هم webhook)
+
+    collect در هر scrape صدا زده می‌شود و مقادیر لحظه‌ای را به خروجی اضافه می‌کند؛
+    ثبت نمونه‌ها در مسیر اصلی فقط افزایش شمارنده‌های حافظه است.
+    """
+
+    def __init__(self, collect: Callable[[PrometheusText], Awaitable[None]], listen: str, port: int,
+                 path: str = "/metrics", prefix: str = ""):
+        self.collect = collect
+        self.listen = listen
+        self.port = port
+        self.prefix = prefix
+        self._runner = None
+        
+        self.app = web.Application()
+        self.app.router.add_get(path, self.handle_metrics)
+
+    async def start(self):
+        """شروع سرور"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(f"✅ Metrics server listening on {self.listen}:{self.port}")
+
+    async def stop(self):
+        """توقف سرور"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        output = PrometheusText(self.prefix)
+        try:
+            await self.collect(output)
+        except Exception as e:
+            logger.error(f"خطا در جمع‌آوری متریک‌ها: {e}")
+            return web.Response(status=500)
+        return web.Response(body=output.render().encode(), headers={"Content-Type": PrometheusText.CONTENT_TYPE})
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from app.config import config
+from app.database.models import Broadcast
+from app.database.repository import DatabaseRepository, BROADCASTS_CHANNEL
+from app.utils.keyboards import get_broadcast_progress_keyboard
+from app.utils.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DeliveryResult = Tuple[int, str, Optional[str]]
+
+class BroadcastEngine:
+    """موتور ارسال پیام گروهی با محدودیت نرخ و قابلیت ادامه بعد از ری‌استارت
+    
+    گیرندگان به صورت دسته‌ای با صفحه‌بندی keyset از جدول users خوانده می‌شوند و
+    وضعیت هر گیرنده در broadcast_deliveries ثبت می‌شود. ارسال at-least-once است:
+    اگر پروسه وسط یک دسته متوقف شود، گیرندگان ثبت‌نشده همان دسته دوباره ارسال می‌گیرند.
+    
+    ارسال فقط روی رهبر انجام می‌شود (بین resume_all و stop). نمونه‌های دیگر پیام
+    گروهی جدید را با NOTIFY روی BROADCASTS_CHANNEL به رهبر می‌سپارند و رهبر هر
+    BROADCAST_RESUME_INTERVAL ثانیه هم پیام‌های running را دوباره بررسی می‌کند.
+    """
+
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, db: DatabaseRepository, bot: Bot):
+        self.db = db
+        self.bot = bot
+        self.bucket = TokenBucket(config.BROADCAST_RATE)
+        self.batch_size = config.BROADCAST_BATCH_SIZE
+        self.concurrency = config.BROADCAST_CONCURRENCY
+        self.progress_interval = config.BROADCAST_PROGRESS_INTERVAL
+        self.resume_interval = config.BROADCAST_RESUME_INTERVAL
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._active = False
+        self._watch_task: Optional[asyncio.Task] = None
+
+    async def subscribe(self):
+        """گوش دادن به پیام‌های گروهی که روی نمونه‌های دیگر ثبت شده‌اند"""
+        await self.db.add_listener(BROADCASTS_CHANNEL, self._on_notify)
+
+    def _on_notify(self, payload: Optional[str]):
+        if not self._active:
+            return
+        # بعد از قطع اتصال listener ممکن است اعلانی از دست رفته باشد
+        if payload is None:
+            asyncio.create_task(self._resume_running())
+            return
+        try:
+            self.start(int(payload))
+        except ValueError:
+            logger.debug(f"Ignoring broadcast notify payload: {payload!r}")
+
+    async def submit(self, broadcast_id: int) -> bool:
+        """سپردن پیام گروهی تازه به رهبر؛ روی خود رهبر مستقیما شروع می‌شود"""
+        if self._active:
+            self.start(broadcast_id)
+            return True
+        return await self.db.notify_broadcast_started(broadcast_id)
+
+    def start(self, broadcast_id: int):
+        """شروع (یا ادامه) ارسال در پس‌زمینه"""
+        if broadcast_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast_id))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def resume_all(self):
+        """شروع نقش ارسال‌کننده (رهبر) و ادامه پیام‌های گروهی نیمه‌کاره"""
+        self._active = True
+        await self._resume_running()
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def _resume_running(self):
+        for broadcast in await self.db.get_running_broadcasts():
+            if self._active and broadcast.broadcast_id not in self._tasks:
+                logger.info(f"📢 Resuming broadcast #{broadcast.broadcast_id}")
+                self.start(broadcast.broadcast_id)
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.resume_interval)
+            await self._resume_running()
+
+    async def stop(self):
+        """توقف ارسال‌ها (مثلا با از دست دادن رهبری)؛ وضعیت running می‌ماند تا رهبر بعدی ادامه دهد"""
+        self._active = False
+        if self._watch_task:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, broadcast_id: int):
+        broadcast = await self.db.get_broadcast(broadcast_id)
+        if not broadcast or broadcast.status != 'running':
+            return
+        
+        last_report = time.monotonic()
+        try:
+            # ابتدا گیرندگان دسته‌ای که قبل از توقف کامل نشده بود
+            user_ids = await self.db.get_pending_broadcast_deliveries(broadcast_id)
+            while True:
+                if not user_ids:
+                    user_ids = await self.db.claim_broadcast_batch(broadcast_id, self.batch_size)
+                    if user_ids is None:
+                        await asyncio.sleep(5)
+                        continue
+                    if not user_ids:
+                        break
+                
+                results = await self._send_batch(broadcast.message_text, user_ids)
+                while not await self.db.record_broadcast_deliveries(broadcast_id, results):
+                    await asyncio.sleep(5)
+                self._apply_results(broadcast, results)
+                user_ids = None
+                
+                if time.monotonic() - last_report >= self.progress_interval:
+                    await self._report_progress(broadcast)
+                    last_report = time.monotonic()
+            
+            if await self.db.finish_broadcast(broadcast_id, 'completed'):
+                broadcast.status = 'completed'
+            else:
+                broadcast.status = 'cancelled'
+            await self._report_progress(broadcast)
+            logger.info(f"📢 Broadcast #{broadcast_id} finished: {broadcast.sent_count} sent")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"خطا در اجرای پیام گروهی #{broadcast_id}: {e}")
+
+    async def _send_batch(self, text: str, user_ids: List[int]) -> List[DeliveryResult]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._deliver(semaphore, text, user_id) for user_id in user_ids))
+
+    async def _deliver(self, semaphore: asyncio.Semaphore, text: str, user_id: int) -> DeliveryResult:
+        async with semaphore:
+            error = None
+            for attempt in range(self.MAX_ATTEMPTS):
+                await self.bucket.acquire()
+                try:
+                    await self.bot.send_message(user_id, text)
+                    return user_id, 'sent', None
+                except RetryAfter as e:
+                    # محدودیت سراسری تلگرام: کل bucket متوقف می‌شود
+                    self.bucket.pause(e.retry_after)
+                    error = str(e)
+                except Forbidden as e:
+                    return user_id, 'blocked', str(e)
+                except BadRequest as e:
+                    return user_id, 'failed', str(e)
+                except NetworkError as e:
+                    error = str(e)
+                    await asyncio.sleep(2 ** attempt)
+                except TelegramError as e:
+                    return user_id, 'failed', str(e)
+            return user_id, 'failed', error
+
+    def _apply_results(self, broadcast: Broadcast, results: List[DeliveryResult]):
+        for _, status, _ in results:
+            if status == 'sent':
+                broadcast.sent_count += 1
+            elif status == 'blocked':
+                broadcast.blocked_count += 1
+            else:
+                broadcast.failed_count += 1
+
+    async def _report_progress(self, broadcast: Broadcast):
+        """ویرایش پیام گزارش پیشرفت ادمین"""
+        if not broadcast.progress_chat_id or not broadcast.progress_message_id:
+            return
+        
+        try:
+            await self.bot.edit_message_text(
+                format_progress(broadcast),
+                chat_id=broadcast.progress_chat_id,
+                message_id=broadcast.progress_message_id,
+                reply_markup=get_broadcast_progress_keyboard(broadcast.broadcast_id)
+                if broadcast.status == 'running' else None
+            )
+        except BadRequest as e:
+            if "not modified" not in str(e):
+                logger.warning(f"خطا در بروزرسانی پیشرفت پیام گروهی: {e}")
+        except TelegramError as e:
+            logger.warning(f"خطا در بروزرسانی پیشرفت پیام گروهی: {e}")
+
+def format_progress(broadcast: Broadcast) -> str:
+    """متن گزارش پیشرفت پیام گروهی"""
+    done = broadcast.sent_count + broadcast.failed_count + broadcast.blocked_count
+    status = {
+        'running': '⏳ در حال ارسال',
+        'completed': '✅ تکمیل شد',
+        'cancelled': '⏹ متوقف شد'
+    }.get(broadcast.status, broadcast.status)
+    return (
+        f"📢 پیام گروهی #{broadcast.broadcast_id}\n\n"
+        f"وضعیت: {status}\n"
+        f"📊 پیشرفت: {done:,} از ~{broadcast.total_count:,}\n"
+        f"✅ ارسال شده: {broadcast.sent_count:,}\n"
+        f"🚫 ربات را بلاک کرده‌اند: {broadcast.blocked_count:,}\n"
+        f"❌ ناموفق: {broadcast.failed_count:,}"
+    )
@@ -0,0 +1,90 @@
+import asyncio
+import gzip
+import logging
+import os
+import tempfile
+from typing import List, Optional
+from app.database.repository import DatabaseRepository, EXPORT_TABLES
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+class ExportTooLarge(Exception):
+    """حجم فایل فشرده از max_size گذشته است؛ خروجی نیمه‌کاره متوقف می‌شود"""
+
+    def __init__(self, size: int):
+        super().__init__(f"Export exceeded {size} bytes")
+        self.size = size
+
+class _GzipSink:
+    """نوشتن تدریجی داده در فایل gzip؛ فشرده‌سازی و I/O در thread جدا انجام می‌شود"""
+
+    def __init__(self, path: str, flush_size: int = 1024 * 1024, max_size: Optional[int] = None):
+        self.path = path
+        self.flush_size = flush_size
+        self.max_size = max_size
+        self._file = None
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+
+    async def open(self):
+        self._file = await asyncio.to_thread(gzip.open, self.path, 'wb')
+
+    async def write(self, chunk: bytes):
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered >= self.flush_size:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        await asyncio.to_thread(self._file.write, data)
+        # بایت‌های فشرده نوشته‌شده در فایل (بدون بافر داخلی compressor)
+        written = self._file.fileobj.tell()
+        if self.max_size is not None and written > self.max_size:
+            raise ExportTooLarge(written)
+
+    async def close(self):
+        if self._file is None:
+            return
+        try:
+            await self._flush()
+        finally:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+class ExportService:
+    """خروجی گرفتن جریانی از جداول در فایل فشرده موقت با مصرف حافظه ثابت"""
+
+    def __init__(self, db: DatabaseRepository, max_concurrent: int = 1, max_size: Optional[int] = None):
+        self.db = db
+        self.max_size = max_size
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def export(self, table: str, fmt: str) -> str:
+        """خروجی یک جدول؛ مسیر فایل gzip موقت را برمی‌گرداند (حذف با فراخواننده)"""
+        if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export: {table}/{fmt}")
+        
+        fd, path = tempfile.mkstemp(prefix=f"{table}-", suffix=f".{fmt}.gz")
+        os.close(fd)
+        sink = _GzipSink(path, max_size=self.max_size)
+        try:
+            async with self._semaphore:
+                await sink.open()
+                try:
+                    if fmt == 'csv':
+                        await self.db.export_table_csv(table, sink.write)
+                    else:
+                        await self.db.export_table_jsonl(table, sink.write)
+                finally:
+                    await sink.close()
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+from app.database.repository import DatabaseRepository
+
+logger = logging.getLogger(__name__)
+
+# کلید advisory lock رهبری (migration از 727_001 استفاده می‌کند)
+LEADER_LOCK_ID = 727_002
+
+class LeaderElection:
+    """انتخاب یک نمونه برای وظایف تک‌نمونه‌ای با advisory lock سطح session
+    
+    قفل روی یک اتصال اختصاصی نگه داشته می‌شود و با بسته شدن آن اتصال (توقف یا
+    قطعی پروسه) خودکار آزاد می‌شود تا نمونه دیگری در بررسی بعدی رهبر شود.
+    """
+
+    def __init__(self, db: DatabaseRepository, check_interval: float,
+                 on_elected: Callable[[], Awaitable[None]], on_demoted: Callable[[], Awaitable[None]]):
+        self.db = db
+        self.check_interval = check_interval
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """کنار رفتن از رهبری و آزاد کردن قفل"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._demote()
+
+    async def _run(self):
+        while True:
+            try:
+                await self._check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"خطا در بررسی رهبری: {e}")
+                await self._demote()
+            await asyncio.sleep(self.check_interval)
+
+    async def _check(self):
+        if self._conn is None or self._conn.is_closed():
+            if self.is_leader:
+                # اتصال قفل از دست رفته؛ ممکن است نمونه دیگری رهبر شده باشد
+                await self._demote()
+            self._conn = await self.db.open_connection()
+        
+        if self.is_leader:
+            await self._conn.fetchval("SELECT 1")
+            return
+        
+        if await self._conn.fetchval("SELECT pg_try_advisory_lock($1)", LEADER_LOCK_ID):
+            self.is_leader = True
+            logger.info("👑 Elected leader")
+            try:
+                await self.on_elected()
+            except Exception as e:
+                logger.error(f"خطا در شروع وظایف رهبر: {e}")
+
+    async def _demote(self):
+        was_leader, self.is_leader = self.is_leader, False
+        if was_leader:
+            logger.info("👑 Leadership released")
+            try:
+                await self.on_demoted()
+            except Exception as e:
+                logger.error(f"خطا در توقف وظایف رهبر: {e}")
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            if not conn.is_closed():
+                try:
+                    await conn.close(timeout=5)
+                except Exception:
+                    conn.terminate()
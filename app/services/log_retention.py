@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from typing import Optional
+from app.database.repository import DatabaseRepository
+
+logger = logging.getLogger(__name__)
+
+class LogRetention:
+    """نگهداری پارتیشن‌های ماهانه جدول logs (وظیفه تک‌نمونه‌ای)
+    
+    پارتیشن ماه‌های آینده از قبل ساخته می‌شوند تا هیچ لاگی به logs_default نرود،
+    و پارتیشن‌های قدیمی‌تر از دوره نگهداری یکجا drop می‌شوند (بدون DELETE و vacuum).
+    """
+
+    def __init__(self, db: DatabaseRepository, months_ahead: int, retention_months: int,
+                 interval: float = 6 * 3600):
+        self.db = db
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run_once(self):
+        result = await self.db.maintain_log_partitions(self.months_ahead, self.retention_months)
+        if result is None:
+            return
+        created, dropped = result
+        if created:
+            logger.info(f"🗂 Created log partitions: {', '.join(created)}")
+        if dropped:
+            logger.info(f"🗑 Dropped expired log partitions: {', '.join(dropped)}")
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from typing import Optional
+from telegram import Bot
+from telegram.helpers import escape_markdown
+from app.config import config
+from app.database.models import OrderWithUser
+from app.database.repository import DatabaseRepository
+from app.utils.fanout import fan_out
+from app.utils.keyboards import get_order_actions_keyboard, get_order_claim_keyboard
+
+logger = logging.getLogger(__name__)
+
+def format_order_notification(order: OrderWithUser, status_line: str) -> str:
+    """متن پیام سفارش برای ادمین‌ها (فیلدهای کاربر برای Markdown escape می‌شوند)"""
+    return f"""
+🚨 **سفارش جدید**
+
+👤 کاربر: {escape_markdown(order.first_name or '')} (@{escape_markdown(order.username or '')})
+🆔 کاربری: `{order.user_id}`
+📦 پلن: {escape_markdown(order.plan_type or '')}
+💰 مبلغ: {order.amount:,} تومان
+🆔 شماره سفارش: `{order.order_id}`
+
+{status_line}
+"""
+
+class OrderReviewService:
+    """صف بررسی سفارشات بر اساس claim
+    
+    هر سفارش در هر لحظه فقط در اختیار یک ادمین است (status = 'processing' با
+    lease). با هر تغییر وضعیت، پیام اطلاع‌رسانی همه ادمین‌ها ویرایش می‌شود تا
+    دکمه‌ها فقط برای ادمینی که سفارش را برداشته فعال بمانند.
+    """
+
+    def __init__(self, db: DatabaseRepository, bot: Bot):
+        self.db = db
+        self.bot = bot
+        self.lease = config.ORDER_CLAIM_LEASE
+        self.release_interval = config.ORDER_CLAIM_RELEASE_INTERVAL
+        self._task: Optional[asyncio.Task] = None
+
+    async def announce(self, order: OrderWithUser):
+        """ارسال سفارش جدید به همه ادمین‌های فعال و ثبت پیام‌ها برای ویرایش بعدی"""
+        admin_ids = await self.db.admin_cache.active_admin_ids()
+        text = format_order_notification(order, await self._status_line(order))
+        
+        result = await fan_out(
+            admin_ids,
+            lambda admin_id: self.bot.send_message(
+                admin_id,
+                text,
+                parse_mode='Markdown',
+                reply_markup=get_order_claim_keyboard(order.order_id)
+            ),
+            concurrency=config.ADMIN_NOTIFY_CONCURRENCY,
+            timeout=config.ADMIN_NOTIFY_TIMEOUT
+        )
+        
+        for admin_id, error in result.failed.items():
+            logger.error(f"خطا در اطلاع‌رسانی به ادمین {admin_id}: {error!r}")
+        if result.failed:
+            logger.warning(
+                f"Order #{order.order_id}: notified {len(result.succeeded)}/{result.total} admins"
+            )
+        if result.succeeded:
+            await self.db.save_order_notifications(
+                order.order_id,
+                [(admin_id, message.message_id) for admin_id, message in result.succeeded.items()]
+            )
+
+    async def claim(self, order_id: int, admin_id: int, message_id: Optional[int] = None) -> Optional[OrderWithUser]:
+        """برداشتن سفارش (یا تمدید lease)؛ None اگر در اختیار ادمین دیگری باشد"""
+        order = await self.db.claim_order(order_id, admin_id, self.lease)
+        if order is None:
+            return None
+        if message_id is not None:
+            await self.db.save_order_notifications(order_id, [(admin_id, message_id)])
+        await self.refresh(order)
+        return order
+
+    async def claim_next(self, admin_id: int) -> Optional[OrderWithUser]:
+        """برداشتن قدیمی‌ترین سفارش در انتظار و ارسال آن برای ادمین"""
+        order = await self.db.claim_next_order(admin_id, self.lease)
+        if order is None:
+            return None
+        try:
+            message = await self.bot.send_message(
+                admin_id,
+                format_order_notification(order, await self._status_line(order)),
+                parse_mode='Markdown',
+                reply_markup=get_order_actions_keyboard(order.order_id)
+            )
+        except Exception:
+            # سفارش تا پایان lease بی‌دلیل قفل نماند
+            await self.db.release_order(order.order_id, admin_id)
+            raise
+        await self.db.save_order_notifications(order.order_id, [(admin_id, message.message_id)])
+        await self.refresh(order, skip_admin_id=admin_id)
+        return order
+
+    async def release(self, order_id: int, admin_id: int) -> bool:
+        """برگرداندن سفارش به صف توسط ادمینی که آن را برداشته"""
+        if not await self.db.release_order(order_id, admin_id):
+            return False
+        order = await self.db.get_order_with_user(order_id)
+        if order:
+            await self.refresh(order)
+        return True
+
+    async def completed(self, order_id: int, admin_id: int):
+        """به‌روزرسانی پیام‌ها بعد از تکمیل سفارش"""
+        order = await self.db.get_order_with_user(order_id)
+        if order:
+            await self.refresh(order, actor_id=admin_id)
+
+    async def refresh(self, order: OrderWithUser, actor_id: Optional[int] = None,
+                      skip_admin_id: Optional[int] = None):
+        """ویرایش پیام سفارش نزد همه ادمین‌ها مطابق وضعیت فعلی"""
+        message_ids = {
+            admin_id: message_id
+            for admin_id, message_id in await self.db.get_order_notifications(order.order_id)
+            if admin_id != skip_admin_id
+        }
+        if not message_ids:
+            return
+        text = format_order_notification(order, await self._status_line(order, actor_id))
+        
+        def markup(admin_id: int):
+            if order.status == 'waiting':
+                return get_order_claim_keyboard(order.order_id)
+            if order.status == 'processing' and admin_id == order.claimed_by:
+                return get_order_actions_keyboard(order.order_id)
+            return None
+        
+        result = await fan_out(
+            message_ids,
+            lambda admin_id: self.bot.edit_message_text(
+                text,
+                chat_id=admin_id,
+                message_id=message_ids[admin_id],
+                parse_mode='Markdown',
+                reply_markup=markup(admin_id)
+            ),
+            concurrency=config.ADMIN_NOTIFY_CONCURRENCY,
+            timeout=config.ADMIN_NOTIFY_TIMEOUT
+        )
+        for admin_id, error in result.failed.items():
+            # پیام حذف‌شده یا بدون تغییر؛ وضعیت اصلی در دیتابیس است
+            logger.debug(f"Order #{order.order_id}: could not update message of admin {admin_id}: {error!r}")
+
+    async def _status_line(self, order: OrderWithUser, actor_id: Optional[int] = None) -> str:
+        if order.status == 'processing':
+            return f"🔒 در حال بررسی توسط {await self._admin_name(order.claimed_by)}"
+        if order.status == 'completed':
+            if actor_id is not None:
+                return f"✅ تکمیل شده توسط {await self._admin_name(actor_id)}"
+            return "✅ تکمیل شده"
+        return "⏳ در انتظار بررسی"
+
+    async def _admin_name(self, admin_id: int) -> str:
+        admin = await self.db.admin_cache.get(admin_id)
+        return escape_markdown(admin.first_name) if admin and admin.first_name else str(admin_id)
+
+    # --- آزادسازی lease های منقضی (وظیفه تک‌نمونه‌ای) ---
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._release_expired_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _release_expired_loop(self):
+        while True:
+            await asyncio.sleep(self.release_interval)
+            released = await self.db.release_expired_claims()
+            if not released:
+                continue
+            logger.info(f"🔓 Released {len(released)} expired order claims")
+            for order_id in released:
+                order = await self.db.get_order_with_user(order_id)
+                if order:
+                    await self.refresh(order)
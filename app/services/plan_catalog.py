@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+from telegram import InlineKeyboardMarkup
+from telegram.helpers import escape_markdown
+from app.config import config
+from app.database.models import Plan
+from app.database.repository import DatabaseRepository, PLANS_CHANNEL
+from app.utils.keyboards import get_plans_keyboard
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True, slots=True)
+class PlanSnapshot:
+    """نسخه تغییرناپذیر کاتالوگ؛ کیبورد و متن قیمت‌ها یک بار ساخته می‌شوند"""
+    version: int
+    plans: Mapping[str, Plan]
+    ordered: Tuple[Plan, ...]
+    keyboard: InlineKeyboardMarkup
+    price_text: str
+
+def render_price_text(plans) -> str:
+    """متن صفحه انتخاب پلن"""
+    lines = ["📦 **پلن‌های VPN موجود:**", ""]
+    for plan in plans:
+        lines.append(f"• {escape_markdown(plan.name)}: {plan.price:,} تومان ({plan.duration} روز)")
+    if not plans:
+        lines.append("⚠️ در حال حاضر پلنی برای فروش موجود نیست.")
+    else:
+        lines.extend(["", "لطفا یکی از پلن‌های زیر را انتخاب کنید:"])
+    return "\n".join(lines)
+
+def build_snapshot(version: int, plans) -> PlanSnapshot:
+    ordered = tuple(plans)
+    return PlanSnapshot(
+        version=version,
+        plans=MappingProxyType({plan.plan_id: plan for plan in ordered}),
+        ordered=ordered,
+        keyboard=get_plans_keyboard(ordered),
+        price_text=render_price_text(ordered)
+    )
+
+class PlanCatalog:
+    """کاتالوگ پلن‌ها در حافظه با بارگذاری مجدد از طریق LISTEN/NOTIFY
+    
+    خواننده‌ها همیشه یک snapshot کامل می‌بینند: نسخه جدید کاملا ساخته می‌شود و
+    سپس با یک انتساب جایگزین نسخه قبلی می‌شود. مسیر کلیک کاربر هیچ I/O ندارد.
+    """
+
+    def __init__(self, db: DatabaseRepository):
+        self.db = db
+        self._version = 0
+        self._snapshot = build_snapshot(0, ())
+        self._lock = asyncio.Lock()
+        self._reload_task: Optional[asyncio.Task] = None
+        self._reload_again = False
+
+    @property
+    def snapshot(self) -> PlanSnapshot:
+        return self._snapshot
+
+    def get(self, plan_id: str) -> Optional[Plan]:
+        """دریافت پلن فعال از آخرین snapshot"""
+        return self._snapshot.plans.get(plan_id)
+
+    async def start(self):
+        """پر کردن جدول از config در اولین اجرا، بارگذاری و گوش دادن به تغییرات"""
+        await self.db.seed_plans([
+            Plan(plan_id=plan_id, name=info['name'], price=info['price'],
+                 duration=info['duration'], sort_order=index)
+            for index, (plan_id, info) in enumerate(config.PLANS.items())
+        ])
+        if not await self.reload():
+            # تا بارگذاری موفق نشود هیچ پلنی برای فروش نیست؛ با backoff دوباره تلاش می‌کنیم
+            self._reload_task = asyncio.create_task(self._reload_loop(failed=True))
+        await self.db.add_listener(PLANS_CHANNEL, self._on_notify)
+
+    async def stop(self):
+        if self._reload_task:
+            self._reload_task.cancel()
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+
+    def _on_notify(self, payload: Optional[str]):
+        # چند اعلان پشت سر هم در یک بارگذاری مجدد ادغام می‌شوند
+        logger.debug(f"Plan catalog changed: {payload}")
+        if self._reload_task and not self._reload_task.done():
+            self._reload_again = True
+            return
+        self._reload_task = asyncio.create_task(self._reload_loop())
+
+    async def _reload_loop(self, failed: bool = False):
+        delay = 1
+        while True:
+            if failed:
+                logger.warning(f"⚠️ Plan catalog load failed, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+            self._reload_again = False
+            # بارگذاری ناموفق تکرار می‌شود تا snapshot از دیتابیس عقب نماند
+            failed = not await self.reload()
+            if not failed and not self._reload_again:
+                return
+
+    async def reload(self) -> bool:
+        """ساخت snapshot جدید از دیتابیس؛ در صورت خطا نسخه قبلی حفظ می‌شود"""
+        async with self._lock:
+            plans = await self.db.get_plans()
+            if plans is None:
+                return False
+            self._version += 1
+            self._snapshot = build_snapshot(self._version, plans)
+            logger.info(f"💳 Plan catalog v{self._version} loaded ({len(plans)} plans)")
+            return True
+
+    async def save_plan(self, plan: Plan) -> bool:
+        """ذخیره پلن؛ نمونه فعلی بلافاصله و بقیه با NOTIFY به‌روز می‌شوند"""
+        if not await self.db.save_plan(plan):
+            return False
+        await self.reload()
+        return True
+
+    async def disable_plan(self, plan_id: str) -> bool:
+        if not await self.db.set_plan_active(plan_id, False):
+            return False
+        await self.reload()
+        return True
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+from telegram import Bot, Update
+from telegram.error import TelegramError
+from telegram.ext import Application
+from app.database.persistence import PostgresPersistence
+from app.database.repository import DatabaseRepository
+from app.utils.update_processor import update_key
+
+logger = logging.getLogger(__name__)
+
+# کانالی که trigger جدول update_queue بعد از هر insert روی آن NOTIFY می‌کند
+UPDATES_CHANNEL = "updates_queued"
+
+class UpdateQueueIngress:
+    """نوشتن آپدیت‌های ورودی (webhook) در صف مشترک"""
+
+    def __init__(self, db: DatabaseRepository):
+        self.db = db
+
+    async def put(self, update: Update) -> bool:
+        return await self.db.enqueue_updates([(update.update_id, update_key(update), update.to_json())])
+
+class UpdateQueuePoller:
+    """long polling تک‌نمونه‌ای (فقط روی رهبر) که آپدیت‌ها را در صف مشترک می‌نویسد
+    
+    offset فقط بعد از commit شدن آپدیت‌ها در صف جلو می‌رود، پس با توقف یا تعویض
+    رهبر آپدیتی گم نمی‌شود؛ آپدیت‌های تکراری را کلید اصلی صف حذف می‌کند.
+    """
+
+    def __init__(self, db: DatabaseRepository, bot: Bot, timeout: int = 50):
+        self.db = db
+        self.bot = bot
+        self.timeout = timeout
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        logger.info("📥 Update queue poller started")
+        webhook_deleted = False
+        offset = None
+        delay = 1
+        while True:
+            try:
+                # با همان backoff؛ خطای شبکه در شروع نباید task را (بی‌صدا) از کار بیندازد
+                if not webhook_deleted:
+                    await self.bot.delete_webhook(drop_pending_updates=False)
+                    webhook_deleted = True
+                updates = await self.bot.get_updates(
+                    offset=offset,
+                    timeout=self.timeout,
+                    read_timeout=self.timeout + 10,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            except TelegramError as e:
+                logger.warning(f"خطا در دریافت آپدیت‌ها: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            except Exception as e:
+                logger.error(f"خطای غیرمنتظره در دریافت آپدیت‌ها: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+            delay = 1
+            if not updates:
+                continue
+            
+            rows = [(update.update_id, update_key(update), update.to_json()) for update in updates]
+            if not await self.db.enqueue_updates(rows):
+                # offset جلو نمی‌رود تا همین آپدیت‌ها دوباره دریافت شوند
+                await asyncio.sleep(1)
+                continue
+            offset = updates[-1].update_id + 1
+
+class UpdateQueueReaper:
+    """نگهداری صف (فقط روی رهبر): انتقال آپدیت‌های شکست‌خورده و حذف آپدیت‌های قدیمی"""
+
+    def __init__(self, db: DatabaseRepository, max_attempts: int, retention: float, interval: float = 30):
+        self.db = db
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            result = await self.db.reap_update_queue(self.max_attempts, self.retention)
+            if result:
+                dead, purged = result
+                if dead:
+                    logger.warning(f"⚠️ {dead} updates exceeded {self.max_attempts} attempts, moved to update_queue_dead")
+                if purged:
+                    logger.debug(f"Purged {purged} processed updates")
+            await asyncio.sleep(self.interval)
+
+class UpdateQueueWorker:
+    """مصرف‌کننده صف مشترک؛ روی همه نمونه‌ها اجرا می‌شود
+    
+    آپدیت‌ها با lease برداشته می‌شوند و بعد از پردازش کامل (شامل ذخیره user_data
+    و chat_data) تایید می‌شوند. اگر worker وسط کار از بین برود، بعد از پایان lease
+    آپدیت توسط worker دیگری دوباره پردازش می‌شود (at-least-once).
+    """
+
+    def __init__(self, db: DatabaseRepository, application: Application, worker_id: str,
+                 batch_size: int, poll_interval: float, lease: float, max_attempts: int):
+        self.db = db
+        self.application = application
+        self.worker_id = worker_id
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._in_flight: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self):
+        await self.db.add_listener(UPDATES_CHANNEL, self._on_notify)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"✅ Update queue worker {self.worker_id} started")
+
+    async def stop(self, timeout: float = 30):
+        """توقف برداشتن آپدیت جدید و صبر برای آپدیت‌های در حال پردازش"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._in_flight:
+            await asyncio.wait(self._in_flight, timeout=timeout)
+
+    def _on_notify(self, payload: Optional[str]):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            free = self.batch_size - len(self._in_flight)
+            claimed = []
+            if free > 0:
+                claimed = await self.db.claim_updates(self.worker_id, free, self.lease, self.max_attempts)
+            for update_id, payload in claimed or []:
+                task = asyncio.create_task(self._process(update_id, payload))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            if claimed and len(claimed) == free:
+                # احتمالا آپدیت‌های بیشتری آماده‌اند
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, update_id: int, payload: dict):
+        try:
+            update = Update.de_json(payload, self.application.bot)
+            await self.application.update_processor.process_update(
+                update, self.application.process_update(update)
+            )
+            await self._persist(update)
+        except Exception as e:
+            # تایید نمی‌شود؛ بعد از پایان lease دوباره تلاش می‌شود
+            self.failed += 1
+            logger.error(f"خطا در پردازش آپدیت {update_id}: {e}")
+            return
+        finally:
+            # ظرفیت آزاد شد و آپدیت بعدی همین کاربر ممکن است آماده باشد
+            self._wakeup.set()
+        
+        if await self.db.ack_update(update_id, self.worker_id):
+            self.processed += 1
+        else:
+            logger.warning(f"⚠️ Lease of update {update_id} expired before ack")
+
+    async def _persist(self, update: Update):
+        """ذخیره داده کاربر/چت قبل از تایید، تا worker بعدی نسخه تازه را ببیند"""
+        persistence = self.application.persistence
+        if not isinstance(persistence, PostgresPersistence):
+            return
+        if update.effective_user:
+            user_id = update.effective_user.id
+            await persistence.update_user_data(user_id, self.application.user_data.get(user_id, {}))
+        if update.effective_chat:
+            chat_id = update.effective_chat.id
+            await persistence.update_chat_data(chat_id, self.application.chat_data.get(chat_id, {}))
+        await persistence.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'in_flight': len(self._in_flight),
+            'processed': self.processed,
+            'failed': self.failed
+        }
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Optional
+from app.database.repository import DatabaseRepository
+
+logger = logging.getLogger(__name__)
+
+class BalanceSnapshots:
+    """تطبیق و ثبت دوره‌ای موجودی کاربران در balance_snapshots (وظیفه تک‌نمونه‌ای)
+    
+    هر دوره ابتدا موجودی users با snapshot قبلی به علاوه تراکنش‌های بعد از آن
+    مقایسه می‌شود (تغییر موجودی خارج از دفتر)، سپس snapshot جلو می‌رود. اولین
+    اجرا همه کاربران را ثبت می‌کند و اجراهای بعدی فقط کاربرانی که در دو دوره
+    اخیر تراکنش داشته‌اند.
+    """
+
+    def __init__(self, db: DatabaseRepository, interval: float):
+        self.db = db
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # تعداد اختلاف‌های آخرین تطبیق
+        self.mismatches = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def reconcile(self):
+        mismatches = await self.db.reconcile_balances()
+        if mismatches is None:
+            return
+        self.mismatches = len(mismatches)
+        for user_id, balance, expected in mismatches:
+            logger.error(f"❌ Wallet balance mismatch for user {user_id}: {balance:,} in users, {expected:,} in ledger")
+
+    async def _run(self):
+        lookback = None
+        while True:
+            await self.reconcile()
+            count = await self.db.snapshot_balances(lookback)
+            if count is not None:
+                if count:
+                    logger.info(f"💰 Snapshotted {count} wallet balances")
+                lookback = self.interval * 2
+            await asyncio.sleep(self.interval)
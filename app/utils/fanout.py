@@ -0,0 +1,35 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+class FanOutResult:
+    """نتیجه ارسال موازی به چند گیرنده"""
+
+    def __init__(self):
+        self.succeeded: Dict[int, Any] = {}
+        self.failed: Dict[int, BaseException] = {}
+
+    @property
+    def total(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+async def fan_out(chat_ids: Iterable[int], send: Callable[[int], Awaitable[Any]],
+                  concurrency: int = 10, timeout: float = 10) -> FanOutResult:
+    """اجرای send برای هر گیرنده به صورت موازی و محدود
+    
+    هر گیرنده timeout جداگانه دارد، پس یک چت کند یا بلاک شده بقیه را معطل نمی‌کند.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    result = FanOutResult()
+
+    async def _send_one(chat_id: int):
+        async with semaphore:
+            try:
+                result.succeeded[chat_id] = await asyncio.wait_for(send(chat_id), timeout)
+            except Exception as e:
+                result.failed[chat_id] = e
+
+    await asyncio.gather(*(_send_one(chat_id) for chat_id in dict.fromkeys(chat_ids)))
+    return result
@@ -1,5 +1,12 @@
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from app.config import config
+from app.utils.pagination import order_page_callback
+
+# فیلترهای مرورگر سفارشات: کد داخل callback_data -> (status، برچسب)
+ORDER_STATUS_FILTERS = {
+    "w": ("waiting", "⏳ در انتظار"),
+    "c": ("completed", "✅ تکمیل شده"),
+    "a": (None, "📋 همه")
+}
 
 def get_main_menu():
     """منوی اصلی"""
@@ -12,14 +19,14 @@ def get_main_menu():
     ]
     return InlineKeyboardMarkup(keyboard)
 
-def get_plans_keyboard():
-    """کیبورد پلن‌ها"""
+def get_plans_keyboard(plans):
+    """کیبورد پلن‌ها (یک بار به ازای هر نسخه کاتالوگ ساخته می‌شود)"""
     keyboard = []
-    for plan_id, plan_info in config.PLANS.items():
+    for plan in plans:
         keyboard.append([
             InlineKeyboardButton(
-                f"{plan_info['name']} - {plan_info['price']:,} تومان", 
-                callback_data=f"plan_{plan_id}"
+                f"{plan.name} - {plan.price:,} تومان", 
+                callback_data=f"plan_{plan.plan_id}"
             )
         ])
     keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")])
@@ -33,7 +40,8 @@ def get_admin_menu():
         [InlineKeyboardButton("👨‍💼 مدیریت ادمین‌ها", callback_data="admin_management")],
         [InlineKeyboardButton("💳 مدیریت پلن‌ها", callback_data="admin_plans")],
         [InlineKeyboardButton("📢 ارسال پیام گروهی", callback_data="admin_broadcast")],
-        [InlineKeyboardButton("📊 آمار و گزارش‌ها", callback_data="admin_stats")]
+        [InlineKeyboardButton("📊 آمار و گزارش‌ها", callback_data="admin_stats")],
+        [InlineKeyboardButton("📤 خروجی داده‌ها", callback_data="admin_export")]
     ]
     return InlineKeyboardMarkup(keyboard)
 
@@ -52,6 +60,72 @@ def get_order_actions_keyboard(order_id: int):
             InlineKeyboardButton("🔗 ارسال لینک", callback_data=f"config_link_{order_id}"),
             InlineKeyboardButton("💬 یادداشت", callback_data=f"note_{order_id}")
         ],
+        [InlineKeyboardButton("🔓 آزاد کردن سفارش", callback_data=f"release_{order_id}")],
         [InlineKeyboardButton("🔙 بازگشت", callback_data="admin_orders")]
     ]
     return InlineKeyboardMarkup(keyboard)
+
+def get_order_claim_keyboard(order_id: int):
+    """برداشتن سفارش برای بررسی (پیام اطلاع‌رسانی ادمین‌ها)"""
+    keyboard = [
+        [InlineKeyboardButton("🙋 برداشتن سفارش", callback_data=f"claim_{order_id}")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_broadcast_progress_keyboard(broadcast_id: int):
+    """دکمه توقف پیام گروهی در حال ارسال"""
+    keyboard = [
+        [InlineKeyboardButton("⏹ توقف ارسال", callback_data=f"broadcast_cancel_{broadcast_id}")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_order_browser_keyboard(orders, status_code: str, newer_cursor=None, older_cursor=None):
+    """کیبورد مرورگر سفارشات با ناوبری keyset و فیلتر وضعیت"""
+    keyboard = []
+    for order in orders:
+        if order.status == 'waiting':
+            keyboard.append([
+                InlineKeyboardButton(f"📝 ارسال کانفیگ #{order.order_id}", callback_data=f"config_text_{order.order_id}")
+            ])
+    
+    navigation = []
+    if newer_cursor:
+        navigation.append(InlineKeyboardButton("◀️ جدیدتر", callback_data=order_page_callback(status_code, "p", newer_cursor)))
+    if older_cursor:
+        navigation.append(InlineKeyboardButton("قدیمی‌تر ▶️", callback_data=order_page_callback(status_code, "n", older_cursor)))
+    if navigation:
+        keyboard.append(navigation)
+    
+    keyboard.append([
+        InlineKeyboardButton(("• " if code == status_code else "") + label, callback_data=order_page_callback(code, "n"))
+        for code, (_, label) in ORDER_STATUS_FILTERS.items()
+    ])
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_orders")])
+    return InlineKeyboardMarkup(keyboard)
+
+def get_plan_admin_keyboard():
+    """منوی مدیریت پلن‌ها"""
+    keyboard = [
+        [InlineKeyboardButton("✏️ افزودن / ویرایش پلن", callback_data="admin_plan_edit")],
+        [InlineKeyboardButton("🚫 غیرفعال کردن پلن", callback_data="admin_plan_disable")],
+        [InlineKeyboardButton("🔙 بازگشت", callback_data="admin_back")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_export_menu():
+    """انتخاب جدول و فرمت خروجی"""
+    tables = [
+        ("users", "👥 کاربران"),
+        ("orders", "📦 سفارشات"),
+        ("transactions", "💳 تراکنش‌ها"),
+        ("logs", "📜 لاگ‌ها")
+    ]
+    keyboard = [
+        [
+            InlineKeyboardButton(f"{label} CSV", callback_data=f"export:{table}:csv"),
+            InlineKeyboardButton(f"{label} JSONL", callback_data=f"export:{table}:jsonl")
+        ]
+        for table, label in tables
+    ]
+    keyboard.append([InlineKeyboardButton("🔙 بازگشت", callback_data="admin_back")])
+    return InlineKeyboardMarkup(keyboard)
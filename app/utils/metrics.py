@@ -0,0 +1,144 @@
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+# مرزهای پیش‌فرض bucket ها بر حسب ثانیه
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """هیستوگرام با bucket های از پیش تخصیص‌یافته؛ ثبت هر نمونه O(log n) و بدون تخصیص حافظه"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # خانه آخر: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict:
+        """مقادیر تجمعی bucket ها به سبک Prometheus (le)"""
+        cumulative = {}
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative[bound] = total
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+class HistogramFamily:
+    """هیستوگرام‌ها به تفکیک یک برچسب (نام هندلر، متد API، ...)؛ هر برچسب یک بار ساخته می‌شود"""
+
+    __slots__ = ("buckets", "children")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.children: Dict[str, Histogram] = {}
+
+    def labels(self, value: str) -> Histogram:
+        histogram = self.children.get(value)
+        if histogram is None:
+            histogram = self.children[value] = Histogram(self.buckets)
+        return histogram
+
+class CounterFamily:
+    """شمارنده‌ها به تفکیک یک برچسب
+
+    همه چیز در یک thread (event loop) اجرا می‌شود، پس افزایش بدون قفل امن است.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values: Dict[str, int] = {}
+
+    def inc(self, label: str, amount: int = 1):
+        self.values[label] = self.values.get(label, 0) + amount
+
+def timed(name: str, durations: HistogramFamily, errors: CounterFamily,
+          func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """پوشاندن یک تابع async برای ثبت مدت اجرا و خطاهای آن با برچسب name"""
+    histogram = durations.labels(name)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            errors.inc(name)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Optional[Dict[str, Any]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + "}"
+
+class PrometheusText:
+    """ساخت خروجی متنی Prometheus (نسخه 0.0.4)
+
+    نمونه‌های یک متریک باید پشت سر هم اضافه شوند؛ HELP و TYPE فقط بار اول نوشته می‌شوند.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._lines: List[str] = []
+        self._declared = set()
+
+    def _declare(self, name: str, kind: str, help_text: str) -> str:
+        name = self.prefix + name
+        if name not in self._declared:
+            self._declared.add(name)
+            self._lines.append(f"# HELP {name} {help_text}")
+            self._lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def gauge(self, name: str, help_text: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        name = self._declare(name, "gauge", help_text)
+        self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter(self, name: str, help_text: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        name = self._declare(name, "counter", help_text)
+        self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def counter_family(self, name: str, help_text: str, label: str, family: CounterFamily):
+        self._declare(name, "counter", help_text)
+        for value, count in sorted(family.values.items()):
+            self.counter(name, help_text, count, {label: value})
+
+    def histogram(self, name: str, help_text: str, histogram: Histogram,
+                  labels: Optional[Dict[str, Any]] = None):
+        name = self._declare(name, "histogram", help_text)
+        labels = labels or {}
+        total = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            total += count
+            self._lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {total}")
+        self._lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+        self._lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+    def histogram_family(self, name: str, help_text: str, label: str, family: HistogramFamily):
+        self._declare(name, "histogram", help_text)
+        for value, histogram in sorted(family.children.items()):
+            self.histogram(name, help_text, histogram, {label: value})
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
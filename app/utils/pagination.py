@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+# callback_data تلگرام حداکثر 64 بایت است
+MAX_CALLBACK_DATA = 64
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_EPOCH = datetime(1970, 1, 1)
+
+Cursor = Tuple[datetime, int]
+
+def _to_base36(value: int) -> str:
+    if value < 0:
+        return "-" + _to_base36(-value)
+    digits = ""
+    while True:
+        value, remainder = divmod(value, 36)
+        digits = _DIGITS[remainder] + digits
+        if not value:
+            return digits
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    """تبدیل cursor (created_at, order_id) به رشته فشرده base36"""
+    micros = (created_at.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+    return f"{_to_base36(micros)}.{_to_base36(order_id)}"
+
+def decode_cursor(value: str) -> Optional[Cursor]:
+    """تبدیل رشته cursor به (created_at, order_id)؛ رشته خالی یعنی صفحه اول"""
+    if not value:
+        return None
+    micros, order_id = value.split(".")
+    return _EPOCH + timedelta(microseconds=int(micros, 36)), int(order_id, 36)
+
+def order_page_callback(status_code: str, direction: str, cursor: Optional[Cursor] = None) -> str:
+    """callback_data صفحه‌ای از مرورگر سفارشات: ob:<status>:<n|p>:<cursor>"""
+    data = f"ob:{status_code}:{direction}:{encode_cursor(*cursor) if cursor else ''}"
+    assert len(data.encode()) <= MAX_CALLBACK_DATA, data
+    return data
+
+def parse_order_page_callback(data: str) -> Tuple[str, str, Optional[Cursor]]:
+    """تجزیه callback_data مرورگر سفارشات"""
+    _, status_code, direction, cursor = data.split(":", 3)
+    return status_code, direction, decode_cursor(cursor)
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine, Dict, Optional, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from app.utils.metrics import CounterFamily, Histogram, HistogramFamily
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket برای محدود کردن نرخ درخواست‌ها در asyncio
+    
+    درخواست‌ها به ترتیب ورود (FIFO) سرویس می‌گیرند؛ pause برای احترام به
+    retry_after تلگرام کل bucket را برای مدتی متوقف می‌کند.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """توقف bucket برای چند ثانیه (مثلا بعد از RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """گرفتن توکن؛ مدت انتظار (ثانیه) را برمی‌گرداند"""
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return time.monotonic() - start
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+class BotRateLimiter(BaseRateLimiter):
+    """محدودکننده نرخ درخواست‌های خروجی Bot API
+    
+    درخواست‌هایی که chat_id دارند از یک bucket سراسری و یک bucket مخصوص همان چت
+    عبور می‌کنند؛ درخواست‌ها صف می‌شوند و دور ریخته نمی‌شوند. در صورت RetryAfter
+    کل ارسال‌ها به اندازه مدت اعلام‌شده متوقف و درخواست دوباره ارسال می‌شود.
+    """
+
+    def __init__(self, overall_rate: float = 30, private_rate: float = 1, private_burst: float = 3,
+                 group_rate: float = 20 / 60, max_retries: int = 3, max_tracked_chats: int = 10_000):
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_tracked_chats = max_tracked_chats
+        self._overall = TokenBucket(overall_rate)
+        self._chats: "OrderedDict[Union[int, str], TokenBucket]" = OrderedDict()
+        
+        # آمار
+        self.throttle_delay = Histogram()
+        self.request_duration = HistogramFamily()  # زمان پاسخ Bot API به تفکیک متد، بدون انتظار محدودیت نرخ
+        self.request_errors = CounterFamily()
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # شناسه منفی یا @username یعنی گروه/کانال با محدودیت سخت‌تر
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self.group_rate, capacity=1) if is_group \
+                else TokenBucket(self.private_rate, capacity=self.private_burst)
+            self._chats[chat_id] = bucket
+            # bucket های قدیمی که مدتی استفاده نشده‌اند پر هستند و حذفشان بی‌خطر است
+            while len(self._chats) > self.max_tracked_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def process_request(self, callback: Callable[..., Coroutine[Any, Any, Any]], args: Any,
+                              kwargs: Dict[str, Any], endpoint: str, data: Dict[str, Any],
+                              rate_limit_args: Optional[Any]):
+        chat_id = data.get('chat_id')
+        self.requests += 1
+        
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                waited = await self._chat_bucket(chat_id).acquire()
+                waited += await self._overall.acquire()
+                self.throttle_delay.observe(waited)
+                if waited > 0.001:
+                    self.throttled += 1
+            
+            start = time.perf_counter()
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._observe(endpoint, start, failed=True)
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning(f"Flood control on {endpoint}, retrying in {e.retry_after}s")
+                self._overall.pause(e.retry_after)
+                if chat_id is None:
+                    await asyncio.sleep(e.retry_after)
+                continue
+            except Exception:
+                self._observe(endpoint, start, failed=True)
+                raise
+            self._observe(endpoint, start)
+            return result
+
+    def _observe(self, endpoint: str, start: float, failed: bool = False):
+        self.request_duration.labels(endpoint).observe(time.perf_counter() - start)
+        if failed:
+            self.request_errors.inc(endpoint)
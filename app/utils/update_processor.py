@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, ContextManager, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+def update_key(update: object) -> Optional[int]:
+    """کلید ترتیب آپدیت: کاربر، و در نبود کاربر چت"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user:
+        return update.effective_user.id
+    if update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """پردازش همزمان آپدیت‌ها با حفظ ترتیب برای هر کاربر/چت
+    
+    آپدیت‌های کاربران مختلف تا سقف max_concurrent_updates همزمان اجرا می‌شوند،
+    اما آپدیت‌های یک کاربر از طریق قفل همان کاربر به ترتیب ورود اجرا می‌شوند تا
+    روی context.user_data رقابت نکنند. آپدیت‌های ادمین‌ها ظرفیت جدای خود را دارند
+    و پشت صف کاربران نمی‌مانند. update_scope (اختیاری) دور اجرای هر آپدیت قرار
+    می‌گیرد، مثلا برای شمارش کوئری‌های آن.
+    """
+
+    def __init__(self, max_concurrent_updates: int, admin_slots: int, is_admin=None,
+                 update_scope: Optional[Callable[[object], ContextManager]] = None):
+        super().__init__(max_concurrent_updates)
+        self._update_scope = update_scope or (lambda update: nullcontext())
+        self._user_semaphore = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._admin_semaphore = asyncio.BoundedSemaphore(admin_slots)
+        self._is_admin = is_admin or (lambda user_id: False)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._depths: Dict[int, int] = {}
+        self.queued = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.max_key_depth = 0
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]):
+        key = update_key(update)
+        semaphore = self._admin_semaphore if key is not None and self._is_admin(key) else self._user_semaphore
+        
+        self.queued += 1
+        if key is None:
+            try:
+                async with semaphore:
+                    self.queued -= 1
+                    await self._run(update, coroutine)
+            finally:
+                self.processed += 1
+            return
+        
+        # قفل قبل از هر await گرفته می‌شود تا ترتیب ورود آپدیت‌های یک کاربر حفظ شود
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        depth = self._depths[key] = self._depths.get(key, 0) + 1
+        self.max_key_depth = max(self.max_key_depth, depth)
+        try:
+            async with lock:
+                async with semaphore:
+                    self.queued -= 1
+                    await self._run(update, coroutine)
+        finally:
+            self.processed += 1
+            self._depths[key] -= 1
+            if not self._depths[key]:
+                del self._depths[key]
+                del self._locks[key]
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]):
+        self.in_flight += 1
+        try:
+            await self.do_process_update(update, coroutine)
+        finally:
+            self.in_flight -= 1
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        with self._update_scope(update):
+            await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        """آمار صف‌ها برای مانیتورینگ"""
+        return {
+            'queued': self.queued,
+            'in_flight': self.in_flight,
+            'active_keys': len(self._locks),
+            'deepest_key_queue': max(self._depths.values(), default=0),
+            'max_key_depth': self.max_key_depth,
+            'processed': self.processed
+        }
@@ -0,0 +1,86 @@
+import asyncio
+import hmac
+import json
+import logging
+from typing import Awaitable, Callable, Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+class WebhookServer:
+    """سرور aiohttp برای دریافت آپدیت‌ها از طریق webhook
+    
+    به طور پیش‌فرض آپدیت‌ها در صف Application قرار می‌گیرند؛ با sink (مثلا صف
+    مشترک دیتابیس) به جای آن به sink داده می‌شوند و در صورت شکست، پاسخ 500 باعث
+    ارسال مجدد توسط تلگرام می‌شود.
+    """
+
+    SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+    def __init__(self, application: Application, listen: str, port: int, path: str,
+                 secret_token: str, max_connections: int = 40,
+                 sink: Optional[Callable[[Update], Awaitable[bool]]] = None):
+        self.application = application
+        self.sink = sink
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._runner = None
+        
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get("/health", self.handle_health)
+
+    async def start(self):
+        """شروع سرور"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port, backlog=self.max_connections * 4)
+        await site.start()
+        logger.info(f"✅ Webhook server listening on {self.listen}:{self.port}{self.path}")
+
+    async def stop(self):
+        """توقف سرور"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """دریافت یک آپدیت و قرار دادن آن در صف Application"""
+        token = request.headers.get(self.SECRET_HEADER, "")
+        # مقایسه بایتی؛ compare_digest روی str غیر ASCII خطا می‌دهد
+        if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            return web.Response(status=403)
+        
+        async with self._semaphore:
+            try:
+                data = await request.json(loads=json.loads)
+                update = Update.de_json(data, self.application.bot)
+            except Exception as e:
+                logger.warning(f"آپدیت نامعتبر دریافت شد: {e}")
+                return web.Response(status=400)
+            
+            if update is None:
+                return web.Response(status=400)
+            if self.sink is not None:
+                if not await self.sink(update):
+                    return web.Response(status=500)
+            else:
+                await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """وضعیت سلامت برای load balancer"""
+        running = self.application.running
+        return web.json_response(
+            {
+                "status": "ok" if running else "starting",
+                "update_queue": self.application.update_queue.qsize()
+            },
+            status=200 if running else 503
+        )
@@ -0,0 +1,4 @@
+"""بنچمارک بار ربات با Bot API ساختگی و repository حافظه‌ای (یا Postgres محلی)
+
+اجرا: python -m benchmarks.run --help
+"""
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1000000001, "is_bot": True, "first_name": "Bench Bot", "username": "bench_bot"}
+
+# متدهایی که Message برمی‌گردانند
+MESSAGE_METHODS = {"sendMessage", "sendPhoto", "sendDocument", "copyMessage", "forwardMessage"}
+EDIT_METHODS = {"editMessageText", "editMessageReplyMarkup", "editMessageCaption"}
+
+class FakeBotApi:
+    """سرور ساختگی Bot API تلگرام با پاسخ‌های آماده و تاخیر قابل تنظیم
+
+    هر مسیر /bot<token>/<method> پاسخ می‌دهد؛ تاخیر هر درخواست latency به علاوه
+    مقدار تصادفی تا jitter است. تعداد و مجموع زمان درخواست‌ها به تفکیک متد شمرده می‌شود.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8799, latency: float = 0.03,
+                 jitter: float = 0.01, error_rate: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._runner = None
+        
+        self.app = web.Application()
+        self.app.router.add_route("*", "/bot{token}/{method}", self.handle)
+
+    @property
+    def base_url(self) -> str:
+        """مقدار TELEGRAM_API_URL برای ربات"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Fake Bot API listening on {self.base_url}")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, Any]:
+        # PTB پارامترها را به صورت فرم (یا multipart) با مقادیر JSON می‌فرستد
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if not isinstance(value, str):
+                continue
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+        
+        if method == "getUpdates":
+            # long polling بدون آپدیت؛ آپدیت‌ها مستقیما به ربات داده می‌شوند
+            await asyncio.sleep(min(float(params.get("timeout") or 0), 1.0))
+            return self._ok([])
+        
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors[method] += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                 "parameters": {"retry_after": 1}},
+                status=429
+            )
+        return self._ok(self._result(method, params))
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    def _message(self, params: Dict[str, Any], message_id: Optional[int] = None) -> Dict[str, Any]:
+        chat_id = params.get("chat_id", 0)
+        message = {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if isinstance(chat_id, int) and chat_id > 0 else "group"},
+            "from": BOT_USER
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        return message
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            return BOT_USER
+        if method in MESSAGE_METHODS:
+            return self._message(params)
+        if method in EDIT_METHODS:
+            # ویرایش پیام inline نتیجه True دارد
+            if "inline_message_id" in params:
+                return True
+            return self._message(params, message_id=params.get("message_id"))
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            return {
+                "file_id": file_id,
+                "file_unique_id": f"u{next(self._file_ids)}",
+                "file_size": 64 * 1024,
+                "file_path": f"photos/{file_id}.jpg"
+            }
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        # answerCallbackQuery، setWebhook، deleteWebhook، setMyCommands، ...
+        return True
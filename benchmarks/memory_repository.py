@@ -0,0 +1,339 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from app.database.audit_writer import AuditRecord
+from app.database.models import (
+    User, Admin, Order, OrderSummary, OrderWithUser, Transaction, Stats, Plan, LogEntry, ProfileSummary
+)
+from app.database.repository import DatabaseRepository
+
+PENDING_STATUSES = ('waiting', 'processing')
+
+class InMemoryRepository(DatabaseRepository):
+    """پیاده‌سازی حافظه‌ای بخشی از DatabaseRepository که سناریوهای بنچمارک استفاده می‌کنند
+
+    کش‌ها، writer لاگ‌ها و آمار همان کلاس اصلی استفاده می‌شوند؛ فقط دسترسی به
+    دیتابیس با dict جایگزین شده است. هر عملیات latency ثانیه صبر می‌کند تا
+    رفت و برگشت شبکه به دیتابیس شبیه‌سازی شود (0: فقط یک بار واگذاری event loop).
+    متدهایی که اینجا پیاده‌سازی نشده‌اند به pool خالی می‌رسند و مثل خطای دیتابیس None برمی‌گردانند.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__("memory://")
+        self.latency = latency
+        self.users: Dict[int, User] = {}
+        self.admins: Dict[int, Admin] = {}
+        self.plans: Dict[str, Plan] = {}
+        self.orders: Dict[int, Order] = {}
+        self.transactions: List[Transaction] = []
+        self.logs: List[LogEntry] = []
+        self.states: Dict[Tuple[str, int], str] = {}
+        self.notifications: Dict[int, Dict[int, int]] = defaultdict(dict)
+        self._order_ids = itertools.count(1)
+        self._transaction_ids = itertools.count(1)
+        self._log_ids = itertools.count(1)
+
+    async def _io(self):
+        await asyncio.sleep(self.latency)
+
+    # --- اتصال ---
+
+    async def connect(self):
+        self.audit_writer.start()
+
+    async def close(self):
+        await self.audit_writer.stop()
+
+    async def add_listener(self, channel: str, callback: Callable[[Optional[str]], None]):
+        self._listeners.setdefault(channel, []).append(callback)
+
+    # --- کاربران ---
+
+    async def add_user(self, user: User) -> bool:
+        return await self.upsert_users([user])
+
+    async def upsert_users(self, users: List[User], tx=None) -> bool:
+        await self._io()
+        now = datetime.now()
+        for user in users:
+            existing = self.users.get(user.user_id)
+            if existing is None:
+                self.users[user.user_id] = User(
+                    user.user_id, user.username, user.first_name, user.last_name, created_at=now, updated_at=now
+                )
+            else:
+                existing.username = user.username
+                existing.first_name = user.first_name
+                existing.last_name = user.last_name
+                existing.is_active = True
+                existing.updated_at = now
+            self.profile_cache.invalidate(user.user_id)
+        return True
+
+    async def get_user(self, user_id: int, tx=None) -> Optional[User]:
+        await self._io()
+        return self.users.get(user_id)
+
+    async def load_profile_summary(self, user_id: int) -> Optional[ProfileSummary]:
+        await self._io()
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        orders = [order for order in self.orders.values() if order.user_id == user_id]
+        return ProfileSummary(
+            user.user_id, user.username, user.first_name, user.balance,
+            orders_total=len(orders),
+            orders_pending=sum(order.status in PENDING_STATUSES for order in orders),
+            orders_completed=sum(order.status == 'completed' for order in orders)
+        )
+
+    # --- وضعیت مکالمه ---
+
+    async def load_state(self, scope: str, entity_id: int) -> Optional[Dict]:
+        await self._io()
+        data = self.states.get((scope, entity_id))
+        return json.loads(data) if data else {}
+
+    async def save_states(self, upserts: List[Tuple[str, int, str]], deletes: List[Tuple[str, int]]) -> bool:
+        await self._io()
+        for scope, entity_id, data in upserts:
+            self.states[(scope, entity_id)] = data
+        for key in deletes:
+            self.states.pop(key, None)
+        return True
+
+    # --- پلن‌ها ---
+
+    async def get_plans(self, include_inactive: bool = False) -> Optional[List[Plan]]:
+        await self._io()
+        plans = [plan for plan in self.plans.values() if plan.is_active or include_inactive]
+        return sorted(plans, key=lambda plan: (plan.sort_order, plan.price, plan.plan_id))
+
+    async def seed_plans(self, plans: List[Plan]) -> bool:
+        await self._io()
+        if not self.plans:
+            self.plans = {plan.plan_id: plan for plan in plans}
+        return True
+
+    async def save_plan(self, plan: Plan) -> bool:
+        await self._io()
+        self.plans[plan.plan_id] = plan
+        return True
+
+    async def set_plan_active(self, plan_id: str, is_active: bool) -> bool:
+        await self._io()
+        plan = self.plans.get(plan_id)
+        if plan is None or plan.is_active == is_active:
+            return False
+        plan.is_active = is_active
+        return True
+
+    # --- سفارشات ---
+
+    def _with_user(self, order: Order) -> OrderWithUser:
+        user = self.users.get(order.user_id)
+        return OrderWithUser(
+            order.order_id, order.user_id, order.plan_type, order.amount, order.status,
+            order.receipt_file_id, order.created_at,
+            user.username if user else None, user.first_name if user else "", order.claimed_by
+        )
+
+    def _insert_order(self, user_id: int, plan_type: str, amount: int, status: str,
+                      receipt_file_id: Optional[str] = None) -> Order:
+        now = datetime.now()
+        order = Order(
+            next(self._order_ids), user_id, plan_type, amount, status,
+            receipt_file_id=receipt_file_id, created_at=now, updated_at=now
+        )
+        self.orders[order.order_id] = order
+        self.profile_cache.invalidate(user_id)
+        return order
+
+    async def create_order(self, order: Order, tx=None) -> Optional[int]:
+        await self._io()
+        return self._insert_order(order.user_id, order.plan_type, order.amount, 'pending').order_id
+
+    async def create_order_with_receipt(self, order: Order, receipt_file_id: str, tx=None) -> Optional[int]:
+        await self._io()
+        if order.user_id not in self.users:
+            return None  # foreign key
+        return self._insert_order(order.user_id, order.plan_type, order.amount, 'waiting', receipt_file_id).order_id
+
+    async def update_order_receipt(self, order_id: int, receipt_file_id: str, tx=None) -> bool:
+        await self._io()
+        order = self.orders.get(order_id)
+        if order:
+            order.receipt_file_id, order.status, order.updated_at = receipt_file_id, 'waiting', datetime.now()
+        return True
+
+    async def update_order_config(self, order_id: int, config_text: str, config_type: str, processed_by: int,
+                                  tx=None) -> bool:
+        await self._io()
+        order = self.orders.get(order_id)
+        if order is None or order.status != 'processing' or order.claimed_by != processed_by:
+            return False
+        order.vpn_config_text, order.config_type, order.processed_by = config_text, config_type, processed_by
+        order.status, order.claimed_by, order.claim_expires_at = 'completed', None, None
+        order.updated_at = datetime.now()
+        self.profile_cache.invalidate(order.user_id)
+        return True
+
+    async def get_order(self, order_id: int, tx=None) -> Optional[Order]:
+        await self._io()
+        return self.orders.get(order_id)
+
+    async def get_user_orders(self, user_id: int, limit: int = 10) -> List[OrderSummary]:
+        await self._io()
+        orders = sorted(
+            (order for order in self.orders.values() if order.user_id == user_id),
+            key=lambda order: order.created_at, reverse=True
+        )[:limit]
+        return [OrderSummary(o.order_id, o.plan_type, o.amount, o.status, o.created_at) for o in orders]
+
+    async def get_pending_orders(self, limit: int = 100) -> List[OrderWithUser]:
+        await self._io()
+        orders = sorted(
+            (order for order in self.orders.values() if order.status == 'waiting'),
+            key=lambda order: order.created_at, reverse=True
+        )[:limit]
+        return [self._with_user(order) for order in orders]
+
+    async def get_order_with_user(self, order_id: int) -> Optional[OrderWithUser]:
+        await self._io()
+        order = self.orders.get(order_id)
+        return self._with_user(order) if order else None
+
+    def _claim(self, order: Order, admin_id: int, lease: float) -> OrderWithUser:
+        order.status, order.claimed_by = 'processing', admin_id
+        order.claim_expires_at = datetime.now() + timedelta(seconds=lease)
+        order.updated_at = datetime.now()
+        return self._with_user(order)
+
+    async def claim_order(self, order_id: int, admin_id: int, lease: float) -> Optional[OrderWithUser]:
+        await self._io()
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        claimable = order.status == 'waiting' or (order.status == 'processing' and (
+            order.claimed_by == admin_id or order.claim_expires_at < datetime.now()
+        ))
+        return self._claim(order, admin_id, lease) if claimable else None
+
+    async def claim_next_order(self, admin_id: int, lease: float) -> Optional[OrderWithUser]:
+        await self._io()
+        waiting = [order for order in self.orders.values() if order.status == 'waiting']
+        if not waiting:
+            return None
+        return self._claim(min(waiting, key=lambda order: (order.created_at, order.order_id)), admin_id, lease)
+
+    async def release_order(self, order_id: int, admin_id: int) -> bool:
+        await self._io()
+        order = self.orders.get(order_id)
+        if order is None or order.status != 'processing' or order.claimed_by != admin_id:
+            return False
+        order.status, order.claimed_by, order.claim_expires_at = 'waiting', None, None
+        return True
+
+    async def release_expired_claims(self) -> Optional[List[int]]:
+        await self._io()
+        now = datetime.now()
+        released = []
+        for order in self.orders.values():
+            if order.status == 'processing' and order.claim_expires_at < now:
+                order.status, order.claimed_by, order.claim_expires_at = 'waiting', None, None
+                released.append(order.order_id)
+        return released
+
+    async def save_order_notifications(self, order_id: int, messages: List[Tuple[int, int]]) -> bool:
+        await self._io()
+        self.notifications[order_id].update(messages)
+        return True
+
+    async def get_order_notifications(self, order_id: int) -> List[Tuple[int, int]]:
+        await self._io()
+        return list(self.notifications.get(order_id, {}).items())
+
+    # --- کیف پول ---
+
+    def _ledger(self, user: User, amount: int, type: str, description: str,
+                order_id: Optional[int] = None) -> Transaction:
+        user.balance += amount
+        transaction = Transaction(
+            next(self._transaction_ids), user.user_id, amount, type, description,
+            created_at=datetime.now(), order_id=order_id, balance_after=user.balance
+        )
+        self.transactions.append(transaction)
+        self.profile_cache.invalidate(user.user_id)
+        return transaction
+
+    async def apply_ledger_entry(self, user_id: int, amount: int, type: str, description: str,
+                                 order_id: Optional[int] = None, tx=None) -> Optional[Transaction]:
+        await self._io()
+        user = self.users.get(user_id)
+        if user is None or user.balance + amount < 0:
+            return None
+        return self._ledger(user, amount, type, description, order_id)
+
+    async def purchase_with_balance(self, user_id: int, plan_type: str, amount: int,
+                                    description: str) -> Union[Tuple[int, int], bool, None]:
+        await self._io()
+        user = self.users.get(user_id)
+        if user is None or user.balance < amount:
+            return False
+        order = self._insert_order(user_id, plan_type, amount, 'waiting')
+        transaction = self._ledger(user, -amount, 'purchase', description, order.order_id)
+        return order.order_id, transaction.balance_after
+
+    async def get_wallet_history(self, user_id: int, limit: int = 10) -> List[Transaction]:
+        await self._io()
+        return [t for t in reversed(self.transactions) if t.user_id == user_id][:limit]
+
+    # --- آمار، ادمین‌ها و لاگ ---
+
+    async def get_stats(self) -> Optional[Stats]:
+        await self._io()
+        stats = Stats(total_users=len(self.users))
+        for order in self.orders.values():
+            if order.status in PENDING_STATUSES:
+                stats.pending_orders += 1
+            elif order.status == 'completed':
+                stats.completed_by_plan[order.plan_type] = stats.completed_by_plan.get(order.plan_type, 0) + 1
+                stats.revenue_by_plan[order.plan_type] = stats.revenue_by_plan.get(order.plan_type, 0) + order.amount
+        return stats
+
+    async def get_all_admins(self) -> Optional[List[Admin]]:
+        await self._io()
+        return list(self.admins.values())
+
+    async def add_admin(self, admin: Admin) -> bool:
+        await self._io()
+        self.admins[admin.admin_id] = admin
+        self.admin_cache.invalidate()
+        return True
+
+    async def copy_logs(self, records: List[AuditRecord]) -> bool:
+        await self._io()
+        now, monotonic = datetime.now(), time.monotonic()
+        for user_id, action, target_id, details, queued_at in records:
+            created_at = now - timedelta(seconds=monotonic - queued_at)
+            self.logs.append(LogEntry(next(self._log_ids), user_id, action, target_id, details, created_at))
+        return True
+
+    async def get_audit_trail(self, target_id: int, actions: Optional[List[str]] = None,
+                              limit: int = 20) -> List[LogEntry]:
+        await self._io()
+        entries = [
+            entry for entry in reversed(self.logs)
+            if entry.target_id == target_id and (actions is None or entry.action in actions)
+        ]
+        return entries[:limit]
+
+    async def update_queue_depth(self) -> Optional[int]:
+        return 0
+
+    def completed_orders(self) -> int:
+        return sum(order.status == 'completed' for order in self.orders.values())
@@ -0,0 +1,65 @@
+import json
+import math
+from typing import Dict, List, Optional
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """percentile به روش nearest-rank روی نمونه‌های مرتب‌شده"""
+    if not samples:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(samples)))
+    return samples[rank - 1]
+
+def summarize(samples: Dict[str, List[float]], elapsed: float) -> Dict:
+    """خلاصه p50/p95/p99 (میلی‌ثانیه) هر مرحله و کل، و تعداد آپدیت در ثانیه"""
+    steps = dict(samples)
+    steps["all"] = [value for values in samples.values() for value in values]
+    result = {"elapsed": elapsed, "steps": {}}
+    for step, values in steps.items():
+        values = sorted(values)
+        result["steps"][step] = {
+            "count": len(values),
+            "p50": percentile(values, 0.50) * 1000,
+            "p95": percentile(values, 0.95) * 1000,
+            "p99": percentile(values, 0.99) * 1000,
+            "max": (values[-1] if values else 0.0) * 1000
+        }
+    total = result["steps"]["all"]["count"]
+    result["updates"] = total
+    result["updates_per_second"] = total / elapsed if elapsed else 0.0
+    return result
+
+def _delta(current: float, baseline: Optional[float]) -> str:
+    if not baseline:
+        return ""
+    return f" ({(current - baseline) / baseline * 100:+.1f}%)"
+
+def format_report(summary: Dict, baseline: Optional[Dict] = None) -> str:
+    base_steps = (baseline or {}).get("steps", {})
+    lines = [f"{'step':<14}{'count':>8}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}{'max ms':>10}"]
+    for step, stats in summary["steps"].items():
+        base = base_steps.get(step, {})
+        lines.append(
+            f"{step:<14}{stats['count']:>8}"
+            + "".join(
+                f"{stats[key]:>9.1f}{_delta(stats[key], base.get(key)):<9}" for key in ("p50", "p95", "p99")
+            )
+            + f"{stats['max']:>10.1f}"
+        )
+    lines.append("")
+    lines.append(
+        f"{summary['updates']} updates in {summary['elapsed']:.2f}s = "
+        f"{summary['updates_per_second']:.1f} updates/sec"
+        + _delta(summary['updates_per_second'], (baseline or {}).get("updates_per_second"))
+    )
+    for key in ("handler_errors", "bot_api_calls", "completed_orders"):
+        if summary.get(key):
+            lines.append(f"{key}: {summary[key]}")
+    return "\n".join(lines)
+
+def save(summary: Dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+def load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
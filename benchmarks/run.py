@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import logging
+import os
+
+ADMIN_ID_BASE = 9_000_001
+USER_ID_BASE = 100_001
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the bot against a fake Telegram Bot API")
+    parser.add_argument("--users", type=int, default=200, help="number of simulated buyers")
+    parser.add_argument("--admins", type=int, default=2, help="number of admins completing orders")
+    parser.add_argument("--concurrency", type=int, default=50, help="buyers active at the same time")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's steps (s)")
+    parser.add_argument("--api-latency", type=float, default=0.03, help="fake Bot API latency (s)")
+    parser.add_argument("--api-jitter", type=float, default=0.01, help="extra random Bot API latency (s)")
+    parser.add_argument("--db", choices=("memory", "postgres"), default="memory")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="in-memory repository latency per call (s)")
+    parser.add_argument("--database-url", help="Postgres URL for --db postgres (use a throwaway database)")
+    parser.add_argument("--port", type=int, default=8799, help="fake Bot API port")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --json")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    if args.db == "postgres" and not (args.database_url or os.getenv("DATABASE_URL")):
+        parser.error("--db postgres needs --database-url or DATABASE_URL")
+    return args
+
+def configure_env(args: argparse.Namespace):
+    """تنظیم متغیرهای محیطی پیش از import شدن app.config"""
+    os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", "memory://")
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{args.port}/bot"
+    os.environ["ADMIN_IDS"] = ",".join(str(ADMIN_ID_BASE + i) for i in range(args.admins))
+    os.environ["BOT_MODE"] = "polling"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ["UPDATE_QUEUE_ENABLED"] = "false"
+
+async def run(args: argparse.Namespace):
+    from benchmarks import report
+    from benchmarks.fake_bot_api import FakeBotApi
+    from benchmarks.memory_repository import InMemoryRepository
+    from benchmarks.scenarios import LatencyRecorder, ScenarioRunner
+    from main import TelegramBot
+
+    logging.getLogger().setLevel(args.log_level.upper())
+
+    api = FakeBotApi(port=args.port, latency=args.api_latency, jitter=args.api_jitter)
+    await api.start()
+    db = InMemoryRepository(latency=args.db_latency) if args.db == "memory" else None
+    bot = TelegramBot(db=db)
+    try:
+        await bot.initialize()
+        await bot.application.initialize()
+        await bot.application.start()
+
+        recorder = LatencyRecorder()
+        runner = ScenarioRunner(bot, recorder, think_time=args.think_time)
+        await runner.run(
+            [USER_ID_BASE + i for i in range(args.users)],
+            [ADMIN_ID_BASE + i for i in range(args.admins)],
+            args.concurrency
+        )
+        recorder.stop()
+    finally:
+        await bot.stop()
+        await api.stop()
+
+    summary = report.summarize(recorder.samples, recorder.elapsed)
+    summary["handler_errors"] = dict(bot.handler_errors.values)
+    summary["bot_api_calls"] = dict(api.calls)
+    if isinstance(db, InMemoryRepository):
+        summary["completed_orders"] = db.completed_orders()
+    summary["params"] = {
+        key: getattr(args, key)
+        for key in ("users", "admins", "concurrency", "think_time", "api_latency", "api_jitter", "db", "db_latency")
+    }
+
+    baseline = report.load(args.baseline) if args.baseline else None
+    print(report.format_report(summary, baseline))
+    if args.json:
+        report.save(summary, args.json)
+
+def main():
+    args = parse_args()
+    configure_env(args)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Set
+from telegram import Update
+from benchmarks.fake_bot_api import BOT_USER
+
+class UpdateFactory:
+    """ساخت آپدیت‌های تلگرام (dict خام Bot API) برای سناریوها"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+        self._callback_ids = itertools.count(1)
+
+    @staticmethod
+    def user(user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"bench{user_id}"}
+
+    def _message(self, user_id: int, **fields) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self.user(user_id),
+            **fields
+        }
+
+    def command(self, user_id: int, command: str) -> Dict[str, Any]:
+        return {
+            "update_id": next(self._update_ids),
+            "message": self._message(
+                user_id, text=command,
+                entities=[{"type": "bot_command", "offset": 0, "length": len(command.split()[0])}]
+            )
+        }
+
+    def text(self, user_id: int, text: str) -> Dict[str, Any]:
+        return {"update_id": next(self._update_ids), "message": self._message(user_id, text=text)}
+
+    def photo(self, user_id: int) -> Dict[str, Any]:
+        file_id = f"receipt-{user_id}-{next(self._message_ids)}"
+        return {
+            "update_id": next(self._update_ids),
+            "message": self._message(user_id, photo=[
+                {"file_id": f"{file_id}-s", "file_unique_id": f"{file_id}-s", "width": 90, "height": 160},
+                {"file_id": file_id, "file_unique_id": file_id, "width": 720, "height": 1280}
+            ])
+        }
+
+    def callback(self, user_id: int, data: str) -> Dict[str, Any]:
+        # پیام ربات که دکمه روی آن زده شده
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": BOT_USER,
+            "text": "..."
+        }
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._callback_ids)),
+                "from": self.user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": message
+            }
+        }
+
+class LatencyRecorder:
+    """زمان پردازش هر آپدیت (از تحویل به update processor تا پایان هندلر) به تفکیک مرحله"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, step: str, seconds: float):
+        self.samples[step].append(seconds)
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+class ScenarioRunner:
+    """اجرای سناریوها روی یک TelegramBot مقداردهی‌شده
+
+    آپدیت‌ها از همان مسیر صف مشترک (update_processor.process_update) به ربات داده
+    می‌شوند تا محدودیت همزمانی و ترتیب هر کاربر مثل حالت واقعی اعمال شود.
+    """
+
+    def __init__(self, bot, recorder: LatencyRecorder, think_time: float = 0.0):
+        self.bot = bot
+        self.recorder = recorder
+        self.think_time = think_time
+        self.factory = UpdateFactory()
+
+    async def send(self, step: str, data: Dict[str, Any]):
+        application = self.bot.application
+        update = Update.de_json(data, application.bot)
+        start = time.perf_counter()
+        await application.update_processor.process_update(update, application.process_update(update))
+        self.recorder.record(step, time.perf_counter() - start)
+
+    async def _think(self):
+        if self.think_time:
+            await asyncio.sleep(random.uniform(0, 2 * self.think_time))
+
+    async def user_purchase(self, user_id: int):
+        """/start ← buy_vpn ← plan_* ← عکس رسید"""
+        plan_ids = list(self.bot.plan_catalog.snapshot.plans)
+        await self.send("start", self.factory.command(user_id, "/start"))
+        await self._think()
+        await self.send("buy_vpn", self.factory.callback(user_id, "buy_vpn"))
+        await self._think()
+        await self.send("select_plan", self.factory.callback(user_id, f"plan_{random.choice(plan_ids)}"))
+        await self._think()
+        await self.send("receipt", self.factory.photo(user_id))
+
+    async def run_users(self, user_ids: List[int], concurrency: int):
+        """اجرای سناریوی خرید برای همه کاربران با حداکثر concurrency کاربر همزمان"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(user_id: int):
+            async with semaphore:
+                await self.user_purchase(user_id)
+        await asyncio.gather(*(run(user_id) for user_id in user_ids))
+
+    async def admin_review(self, admin_id: int, taken: Set[int], users_done: asyncio.Event):
+        """برداشتن سفارش‌های در انتظار و ارسال کانفیگ تا وقتی سفارشی باقی نمانده باشد"""
+        while True:
+            pending = await self.bot.db.get_pending_orders(limit=50)
+            # قدیمی‌ترین سفارش که ادمین دیگری برنداشته
+            todo = [order.order_id for order in reversed(pending) if order.order_id not in taken]
+            if not todo:
+                if users_done.is_set():
+                    return
+                await asyncio.sleep(0.05)
+                continue
+            order_id = todo[0]
+            taken.add(order_id)
+            await self.send("admin_claim", self.factory.callback(admin_id, f"config_text_{order_id}"))
+            await self._think()
+            await self.send("admin_config", self.factory.text(admin_id, f"vless://bench-{order_id}@example.com:443"))
+            await self._think()
+
+    async def run(self, user_ids: List[int], admin_ids: List[int], concurrency: int):
+        users_done = asyncio.Event()
+        taken: Set[int] = set()
+        admins = [asyncio.create_task(self.admin_review(admin_id, taken, users_done)) for admin_id in admin_ids]
+        try:
+            await self.run_users(user_ids, concurrency)
+        finally:
+            users_done.set()
+        await asyncio.gather(*admins)
@@ -3,18 +3,42 @@ import asyncio
 import logging
 import sys
 import signal
+import time
+from typing import Optional
 
 # اضافه کردن مسیر فعلی به Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from telegram import Update
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 
 # Import از ماژول‌های داخلی
 from app.config import config
 from app.database.repository import DatabaseRepository
+from app.database.persistence import PostgresPersistence
+from app.database.user_writer import UserWriteBehind
 from app.handlers.user_handlers import UserHandlers
 from app.handlers.admin_handlers import AdminHandlers
 from app.handlers.admin_management import AdminManagementHandlers
+from app.handlers.broadcast_handlers import BroadcastHandlers
+from app.handlers.export_handlers import ExportHandlers
+from app.handlers.plan_handlers import PlanHandlers
+from app.handlers.order_review_handlers import OrderReviewHandlers
+from app.handlers.wallet_handlers import WalletHandlers
+from app.handlers.text_router import TextRouter
+from app.services.broadcast import BroadcastEngine
+from app.services.export import ExportService
+from app.services.leader import LeaderElection
+from app.services.log_retention import LogRetention
+from app.services.order_review import OrderReviewService
+from app.services.plan_catalog import PlanCatalog
+from app.services.wallet import BalanceSnapshots
+from app.services.update_queue import UpdateQueueIngress, UpdateQueuePoller, UpdateQueueReaper, UpdateQueueWorker
+from app.utils.metrics import CounterFamily, HistogramFamily, PrometheusText, timed
+from app.utils.rate_limiter import BotRateLimiter
+from app.utils.update_processor import KeyedUpdateProcessor
+from app.metrics_server import MetricsServer
+from app.webhook import WebhookServer
 
 # تنظیمات لاگ
 logging.basicConfig(
@@ -24,19 +48,86 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TelegramBot:
-    def __init__(self):
+    def __init__(self, db: Optional[DatabaseRepository] = None):
         self.application = None
-        self.db = None
+        # repository جایگزین (مثلا نسخه حافظه‌ای در benchmark ها)؛ پیش‌فرض Postgres
+        self.db = db
+        self.webhook_server = None
+        self.broadcast_engine = None
+        self.order_review = None
+        self.log_retention = None
+        self.balance_snapshots = None
+        self.user_writer = None
+        self.plan_catalog = None
+        self.text_router = TextRouter()
+        self.update_processor = None
+        self.rate_limiter = None
+        self.leader = None
+        self.update_worker = None
+        self.update_poller = None
+        self.queue_reaper = None
+        self.metrics_server = None
+        # عمق صف مشترک با COUNT(*) خوانده می‌شود؛ بین scrape ها کش می‌شود
+        self.queue_depth: Optional[int] = None
+        self.queue_depth_at = 0.0
+        self.handler_duration = HistogramFamily()
+        self.handler_errors = CounterFamily()
     
     async def initialize(self):
         """مقداردهی اولیه ربات"""
         try:
             # راه‌اندازی دیتابیس
-            self.db = DatabaseRepository(config.DATABASE_URL)
+            if self.db is None:
+                self.db = DatabaseRepository(config.DATABASE_URL)
             await self.db.connect()
             
+            self.user_writer = UserWriteBehind(
+                self.db,
+                batch_size=config.USER_WRITE_BATCH_SIZE,
+                flush_interval=config.USER_WRITE_FLUSH_INTERVAL,
+                cache_size=config.USER_FINGERPRINT_CACHE_SIZE
+            )
+            self.user_writer.start()
+            await self.user_writer.subscribe()
+            
+            # کاتالوگ پلن‌ها قبل از ثبت هندلرها بارگذاری می‌شود
+            self.plan_catalog = PlanCatalog(self.db)
+            await self.plan_catalog.start()
+            
             # ایجاد application
-            self.application = Application.builder().token(config.BOT_TOKEN).build()
+            self.rate_limiter = BotRateLimiter(
+                overall_rate=config.RATE_LIMIT_OVERALL,
+                private_rate=config.RATE_LIMIT_PRIVATE_CHAT,
+                group_rate=config.RATE_LIMIT_GROUP_PER_MINUTE / 60,
+                max_retries=config.RATE_LIMIT_MAX_RETRIES
+            )
+            self.update_processor = KeyedUpdateProcessor(
+                config.MAX_CONCURRENT_UPDATES,
+                admin_slots=config.ADMIN_UPDATE_SLOTS,
+                is_admin=self.db.admin_cache.is_admin_cached,
+                update_scope=self.db.profiler.track_update
+            )
+            builder = Application.builder().token(config.BOT_TOKEN).persistence(
+                PostgresPersistence(
+                    self.db,
+                    update_interval=config.PERSISTENCE_UPDATE_INTERVAL,
+                    cache_size=config.PERSISTENCE_CACHE_SIZE,
+                    shared=config.UPDATE_QUEUE_ENABLED
+                )
+            ).concurrent_updates(self.update_processor).rate_limiter(self.rate_limiter)
+            if config.TELEGRAM_API_URL:
+                builder = builder.base_url(config.TELEGRAM_API_URL)
+            self.application = builder.build()
+            
+            self.broadcast_engine = BroadcastEngine(self.db, self.application.bot)
+            await self.broadcast_engine.subscribe()
+            self.order_review = OrderReviewService(self.db, self.application.bot)
+            self.log_retention = LogRetention(
+                self.db,
+                months_ahead=config.LOG_PARTITIONS_AHEAD,
+                retention_months=config.LOG_RETENTION_MONTHS
+            )
+            self.balance_snapshots = BalanceSnapshots(self.db, interval=config.WALLET_SNAPSHOT_INTERVAL)
             
             # ذخیره دیتابیس در bot_data
             self.application.bot_data['db'] = self.db
@@ -53,9 +144,14 @@ class TelegramBot:
     
     async def _setup_handlers(self):
         """تنظیم هندلرها"""
-        user_handlers = UserHandlers(self.db)
-        admin_handlers = AdminHandlers(self.db)
+        user_handlers = UserHandlers(self.db, self.user_writer, self.plan_catalog, self.order_review)
+        admin_handlers = AdminHandlers(self.db, self.plan_catalog, self.order_review)
+        order_review_handlers = OrderReviewHandlers(self.db, self.order_review)
+        wallet_handlers = WalletHandlers(self.db, self.user_writer, self.plan_catalog, self.order_review)
         admin_management = AdminManagementHandlers(self.db)
+        broadcast_handlers = BroadcastHandlers(self.db, self.broadcast_engine)
+        export_handlers = ExportHandlers(self.db, ExportService(self.db, max_size=config.EXPORT_MAX_DOCUMENT_SIZE))
+        plan_handlers = PlanHandlers(self.db, self.plan_catalog)
         
         # دستورات کاربران
         self.application.add_handler(CommandHandler("start", user_handlers.start))
@@ -67,6 +163,12 @@ class TelegramBot:
         self.application.add_handler(CallbackQueryHandler(user_handlers.show_plans, pattern="^buy_vpn$"))
         self.application.add_handler(CallbackQueryHandler(user_handlers.select_plan, pattern="^plan_"))
         self.application.add_handler(CallbackQueryHandler(user_handlers.profile, pattern="^order_history$"))
+        self.application.add_handler(CallbackQueryHandler(user_handlers.help_command, pattern="^help$"))
+        
+        # کیف پول
+        self.application.add_handler(CallbackQueryHandler(wallet_handlers.show_wallet, pattern="^wallet$"))
+        self.application.add_handler(CallbackQueryHandler(wallet_handlers.pay_with_balance, pattern="^pay_wallet$"))
+        self.application.add_handler(CommandHandler("topup", wallet_handlers.topup))
         
         # مدیریت رسید پرداخت
         self.application.add_handler(MessageHandler(
@@ -76,25 +178,57 @@ class TelegramBot:
         
         # هندلرهای ادمین
         self.application.add_handler(CommandHandler("admin", admin_handlers.admin_panel))
+        self.application.add_handler(CommandHandler("orderlog", admin_handlers.order_log))
+        self.application.add_handler(CommandHandler("slowqueries", admin_handlers.slow_queries))
         self.application.add_handler(CallbackQueryHandler(admin_handlers.manage_orders, pattern="^admin_orders$"))
+        self.application.add_handler(CallbackQueryHandler(admin_handlers.browse_orders, pattern="^ob:"))
         self.application.add_handler(CallbackQueryHandler(admin_handlers.send_config_text, pattern="^config_text_"))
+        self.application.add_handler(CallbackQueryHandler(order_review_handlers.claim_order, pattern="^claim_"))
+        self.application.add_handler(CallbackQueryHandler(order_review_handlers.release_order, pattern="^release_"))
+        self.application.add_handler(CallbackQueryHandler(order_review_handlers.next_order, pattern="^order_next$"))
+        self.application.add_handler(CallbackQueryHandler(admin_handlers.show_stats, pattern="^admin_stats$"))
         
         # مدیریت ادمین‌ها
         self.application.add_handler(CallbackQueryHandler(admin_management.manage_admins, pattern="^admin_management$"))
         self.application.add_handler(CallbackQueryHandler(admin_management.add_admin, pattern="^add_admin$"))
         
-        # هندلرهای متن برای ادمین
-        self.application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND, 
-            admin_management.handle_admin_info
-        ))
+        # مدیریت پلن‌ها
+        self.application.add_handler(CallbackQueryHandler(plan_handlers.manage_plans, pattern="^admin_plans$"))
+        self.application.add_handler(CallbackQueryHandler(plan_handlers.edit_plan, pattern="^admin_plan_edit$"))
+        self.application.add_handler(CallbackQueryHandler(plan_handlers.disable_plan, pattern="^admin_plan_disable$"))
+        
+        # پیام گروهی
+        self.application.add_handler(CallbackQueryHandler(broadcast_handlers.start_broadcast, pattern="^admin_broadcast$"))
+        self.application.add_handler(CallbackQueryHandler(broadcast_handlers.cancel_broadcast, pattern="^broadcast_cancel_"))
+        
+        # خروجی داده‌ها
+        self.application.add_handler(CallbackQueryHandler(export_handlers.export_menu, pattern="^admin_export$"))
+        self.application.add_handler(CallbackQueryHandler(export_handlers.run_export, pattern="^export:"))
+        
+        # پیام‌های متنی بر اساس وضعیت انتظار کاربر مسیریابی می‌شوند
+        self.text_router.register('admin_info', admin_management.handle_admin_info)
+        self.text_router.register('config_text', admin_handlers.handle_config_text)
+        self.text_router.register('broadcast_text', broadcast_handlers.handle_broadcast_text)
+        self.text_router.register('plan_info', plan_handlers.handle_plan_info)
+        self.text_router.register('plan_disable', plan_handlers.handle_plan_disable)
         self.application.add_handler(MessageHandler(
             filters.TEXT & ~filters.COMMAND, 
-            admin_handlers.handle_config_text
+            self.text_router.dispatch
         ))
         
         # هندلر بازگشت
         self.application.add_handler(CallbackQueryHandler(admin_handlers.admin_panel, pattern="^admin_back$"))
+        
+        self._instrument_handlers()
+    
+    def _instrument_handlers(self):
+        """ثبت زمان اجرا و خطاهای هر هندلر با نام آن (مثلا UserHandlers.start)"""
+        for handlers in self.application.handlers.values():
+            for handler in handlers:
+                callback = handler.callback
+                handler.callback = timed(
+                    callback.__qualname__, self.handler_duration, self.handler_errors, callback
+                )
     
     async def start(self):
         """شروع ربات"""
@@ -107,12 +241,35 @@ class TelegramBot:
             await self.application.start()
             logger.info("✅ Bot started successfully")
             
+            if config.METRICS_PORT:
+                self.metrics_server = MetricsServer(
+                    self._collect_metrics,
+                    listen=config.METRICS_LISTEN,
+                    port=config.METRICS_PORT,
+                    path=config.METRICS_PATH,
+                    prefix="vbot_"
+                )
+                await self.metrics_server.start()
+            
             # اجرای ربات تا زمانی که متوقف شود
-            await self.application.updater.start_polling(
-                drop_pending_updates=True,
-                timeout=60,
-                pool_timeout=60
-            )
+            if config.UPDATE_QUEUE_ENABLED:
+                # ادامه پیام‌های گروهی و سایر وظایف تک‌نمونه‌ای روی رهبر اجرا می‌شوند
+                await self._start_update_queue()
+            else:
+                # وظایف تک‌نمونه‌ای: پیام‌های گروهی نیمه‌کاره، lease سفارش‌ها و پارتیشن‌های لاگ
+                await self.broadcast_engine.resume_all()
+                self.order_review.start()
+                self.log_retention.start()
+                self.balance_snapshots.start()
+                if config.BOT_MODE == "webhook":
+                    await self._start_webhook_server()
+                    await self._register_webhook()
+                else:
+                    await self.application.updater.start_polling(
+                        drop_pending_updates=True,
+                        timeout=60,
+                        pool_timeout=60
+                    )
             
             # نگه داشتن ربات در حال اجرا
             await self._keep_alive()
@@ -121,6 +278,142 @@ class TelegramBot:
             logger.error(f"❌ Failed to start bot: {e}")
             raise
     
+    async def _start_update_queue(self):
+        """حالت چند worker: همه نمونه‌ها از صف مشترک مصرف می‌کنند و فقط رهبر poll می‌کند"""
+        self.update_worker = UpdateQueueWorker(
+            self.db,
+            self.application,
+            worker_id=config.INSTANCE_ID,
+            batch_size=config.UPDATE_QUEUE_BATCH_SIZE,
+            poll_interval=config.UPDATE_QUEUE_POLL_INTERVAL,
+            lease=config.UPDATE_QUEUE_LEASE,
+            max_attempts=config.UPDATE_QUEUE_MAX_ATTEMPTS
+        )
+        await self.update_worker.start()
+        
+        self.queue_reaper = UpdateQueueReaper(
+            self.db,
+            max_attempts=config.UPDATE_QUEUE_MAX_ATTEMPTS,
+            retention=config.UPDATE_QUEUE_RETENTION
+        )
+        if config.BOT_MODE == "webhook":
+            # هر نمونه پشت load balancer آپدیت دریافت و در صف ثبت می‌کند
+            await self._start_webhook_server(sink=UpdateQueueIngress(self.db).put)
+        else:
+            self.update_poller = UpdateQueuePoller(self.db, self.application.bot)
+        
+        self.leader = LeaderElection(
+            self.db,
+            check_interval=config.LEADER_CHECK_INTERVAL,
+            on_elected=self._on_elected,
+            on_demoted=self._on_demoted
+        )
+        self.leader.start()
+    
+    async def _on_elected(self):
+        """وظایف تک‌نمونه‌ای رهبر"""
+        await self.broadcast_engine.resume_all()
+        self.order_review.start()
+        self.log_retention.start()
+        self.balance_snapshots.start()
+        self.queue_reaper.start()
+        if self.update_poller:
+            self.update_poller.start()
+        else:
+            await self._register_webhook()
+    
+    async def _on_demoted(self):
+        if self.update_poller:
+            await self.update_poller.stop()
+        await self.queue_reaper.stop()
+        await self.broadcast_engine.stop()
+        await self.order_review.stop()
+        await self.log_retention.stop()
+        await self.balance_snapshots.stop()
+    
+    async def _start_webhook_server(self, sink=None):
+        """شروع سرور aiohttp"""
+        self.webhook_server = WebhookServer(
+            self.application,
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            path=config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            sink=sink
+        )
+        await self.webhook_server.start()
+    
+    async def _register_webhook(self):
+        """ثبت آدرس webhook در تلگرام"""
+        await self.application.bot.set_webhook(
+            url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info("✅ Webhook registered")
+    
+    async def _collect_metrics(self, out: PrometheusText):
+        """مقادیر لحظه‌ای اجزای ربات برای /metrics"""
+        out.histogram_family("handler_duration_seconds", "Handler latency", "handler", self.handler_duration)
+        out.counter_family("handler_errors_total", "Handler exceptions", "handler", self.handler_errors)
+        
+        out.histogram_family(
+            "db_operation_duration_seconds", "Repository operation latency", "operation", self.db.operation_duration
+        )
+        out.counter_family("db_operation_errors_total", "Repository operations that raised", "operation",
+                           self.db.operation_errors)
+        pool = self.db.pool_stats()
+        if pool:
+            for key in ('size', 'idle', 'in_use', 'min_size', 'max_size'):
+                out.gauge("db_pool_connections", "Connection pool usage", pool[key], {'state': key})
+            out.counter("db_pool_acquire_timeouts_total", "Pool acquire timeouts", pool['acquire_timeouts'])
+        out.histogram("db_pool_acquire_wait_seconds", "Time waiting for a pool connection", self.db.acquire_wait)
+        profiler = self.db.profiler
+        out.histogram("db_queries_per_update", "Queries issued while handling one update", profiler.queries_per_update)
+        out.counter("db_slow_queries_total", "Queries slower than SLOW_QUERY_THRESHOLD", profiler.slow_queries)
+        for stats in profiler.statements.values():
+            out.counter("db_statement_errors_total", "Failed queries by repository operation", stats.errors,
+                        {'operation': stats.name})
+        cache_stats = self.db.profile_cache.stats()
+        out.gauge("profile_cache_size", "Profiles currently cached", cache_stats['size'])
+        out.counter("profile_cache_hits_total", "Profile cache lookups served from memory", cache_stats['hits'])
+        out.counter("profile_cache_misses_total", "Profile cache lookups that went to the database",
+                    cache_stats['misses'])
+        for key, value in self.db.audit_writer.stats().items():
+            out.gauge("audit_log_writer", "Audit log write-behind queue", value, {'stat': key})
+        out.gauge("wallet_balance_mismatches", "Users whose balance disagreed with the ledger at the last check",
+                  self.balance_snapshots.mismatches)
+        
+        limiter = self.rate_limiter
+        out.histogram_family("bot_api_duration_seconds", "Bot API call latency", "method", limiter.request_duration)
+        out.counter_family("bot_api_errors_total", "Failed Bot API calls", "method", limiter.request_errors)
+        out.histogram("bot_api_throttle_seconds", "Time waiting for the outbound rate limiter", limiter.throttle_delay)
+        out.counter("bot_api_retries_total", "Requests retried after flood control", limiter.retries)
+        
+        for key, value in self.update_processor.stats().items():
+            out.gauge("update_processor", "Update processor state", value, {'stat': key})
+        out.gauge("application_update_queue", "Updates waiting in the in-memory queue",
+                  self.application.update_queue.qsize())
+        if self.update_worker:
+            for key, value in self.update_worker.stats().items():
+                out.gauge("update_queue_worker", "Shared update queue worker", value, {'stat': key})
+            now = time.monotonic()
+            if now - self.queue_depth_at >= config.METRICS_QUEUE_DEPTH_TTL:
+                self.queue_depth_at = now
+                depth = await self.db.update_queue_depth()
+                if depth is not None:
+                    self.queue_depth = depth
+            if self.queue_depth is not None:
+                out.gauge("update_queue_depth", "Unprocessed updates in the shared queue", self.queue_depth)
+        out.gauge("leader", "Whether this instance runs single-instance duties",
+                  int(self.leader.is_leader) if self.leader else 1)
+        
+        for state, count in self.text_router.dispatch_counts.items():
+            out.counter("text_router_dispatch_total", "Text messages routed by awaiting state", count,
+                        {'state': state})
+    
     async def _keep_alive(self):
         """نگه داشتن ربات در حال اجرا"""
         try:
@@ -131,9 +424,38 @@ class TelegramBot:
     
     async def stop(self):
         """توقف ربات"""
+        if self.leader:
+            await self.leader.stop()
+            self.leader = None
+        if self.update_worker:
+            await self.update_worker.stop()
+            self.update_worker = None
+        if self.broadcast_engine:
+            await self.broadcast_engine.stop()
+        if self.order_review:
+            await self.order_review.stop()
+        if self.log_retention:
+            await self.log_retention.stop()
+        if self.balance_snapshots:
+            await self.balance_snapshots.stop()
+        if self.webhook_server:
+            await self.webhook_server.stop()
+            self.webhook_server = None
+        if self.metrics_server:
+            await self.metrics_server.stop()
+            self.metrics_server = None
         if self.application:
-            await self.application.stop()
+            if self.application.updater and self.application.updater.running:
+                await self.application.updater.stop()
+            if self.application.running:
+                await self.application.stop()
             await self.application.shutdown()
+        if self.user_writer:
+            await self.user_writer.stop()
+        if self.plan_catalog:
+            await self.plan_catalog.stop()
+        if self.db:
+            await self.db.close()
         logger.info("✅ Bot stopped successfully")
 
 # ایجاد global instance